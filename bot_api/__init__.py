@@ -4,3 +4,9 @@ from . import models
 from . import structs
 from . import utils
 from .models import BotCallingAPIError
+from . import async_app
+from .async_app import AsyncBotApp
+from . import async_api
+from .async_api import AsyncBotApi
+from . import commands
+from .commands import CommandRouter
@@ -1,14 +1,22 @@
 import requests
-import json
+import time
+import concurrent.futures
 from . import structs
+from . import codec
 import typing as t
 from . import models
 from .logger import BotLogger
+from . import transport
+from . import ratelimit
+from . import retry
+from . import cache
+from . import singleflight
+from . import outbox
 
 
 class BotApi(BotLogger):
     def __init__(self, appid: int, token: str, secret: str, debug: bool, sandbox: bool, api_return_pydantic=False,
-                 output_log=True, log_path="", raise_api_error=False):
+                 output_log=True, log_path="", raise_api_error=False, http_pool_size=16, http_timeout=(5, 30)):
         super().__init__(debug=debug, write_out_log=output_log, log_path=log_path)
         self.appid = appid
         self.token = token
@@ -24,6 +32,121 @@ class BotApi(BotLogger):
         }
 
         self._cache = {}
+        self._http_pool_size = http_pool_size
+        self._http_timeout = http_timeout
+        self.rate_limiter = ratelimit.RateLimiter()  # 可通过 rate_limiter.set_limit() 调整, enabled = False 关闭
+        self.retry_policy = retry.RetryPolicy()  # 发送消息等非幂等请求默认不重试, 见 retry_policy.retry_sends
+        self.circuit_breakers = retry.CircuitBreakerGroup()
+        # 频道/子频道/成员信息及频道列表分页缓存, 收到对应的更新事件时失效. entity_cache.ttl = 0 关闭
+        self.entity_cache = cache.TTLCache(maxsize=4096, ttl=60)
+        self.single_flight = singleflight.SingleFlight()  # 合并相同的并发GET请求, single_flight.enabled = False 关闭
+        self._init_transport()
+
+    def _init_transport(self):
+        """
+        创建同步请求使用的连接池与发送队列, AsyncBotApi 不需要
+        """
+        self.transport = transport.HttpTransport(pool_maxsize=self._http_pool_size, timeout=self._http_timeout)
+        # 按子频道区分的有序发送队列, outbox.enabled = True 后发送消息默认进入队列
+        self.outbox = outbox.OutboundQueue(self._api_send_message)
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        所有REST请求的统一入口: (合并相同的并发GET) -> 限频 -> 熔断检查 -> 请求 -> 失败重试
+        """
+        if method.upper() == "GET":
+            return self.single_flight.do((method.upper(), url), lambda: self._send_request(method, url, **kwargs))
+        return self._send_request(method, url, **kwargs)
+
+    def _send_request(self, method: str, url: str, **kwargs) -> requests.Response:
+        route = ratelimit.route_key(method, url)[0]
+        breaker = self.circuit_breakers.get(route)
+        can_retry = self.retry_policy.can_retry(method)
+        attempt = 0
+        while True:
+            if not self.circuit_breakers.allow(route):
+                self._tlogger(f"接口熔断中, 跳过请求: {route}", warning=True)
+                return self._circuit_open_response(url, route)
+
+            try:
+                self.rate_limiter.acquire(method, url)
+                response = self.transport.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as sb:
+                breaker.record_failure()
+                if can_retry and attempt < self.retry_policy.max_retries:
+                    self._tlogger(f"请求失败, 准备重试({attempt + 1}): {route} - {sb}", warning=True)
+                    time.sleep(self.retry_policy.backoff(attempt))
+                    attempt += 1
+                    continue
+                raise
+            except Exception:  # 如 ChunkedEncodingError, 同样计入失败, 否则半开状态的探测名额不会释放
+                breaker.record_failure()
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            if response.status_code == 429:
+                retry_after = response.headers.get("Retry-After")
+                try:
+                    retry_after = float(retry_after) if retry_after is not None else 1.0
+                except ValueError:
+                    retry_after = 1.0
+                self.rate_limiter.penalize(method, url, retry_after)
+                self._tlogger(f"请求被限频, {retry_after}s内暂停该接口: {method} {url}", warning=True,
+                              traceid=response.headers.get("X-Tps-trace-ID"))
+
+            if response.status_code in self.retry_policy.retry_statuses and can_retry \
+                    and attempt < self.retry_policy.max_retries:
+                self._tlogger(f"请求失败({response.status_code}), 准备重试({attempt + 1}): {route}", warning=True,
+                              traceid=response.headers.get("X-Tps-trace-ID"))
+                time.sleep(self.retry_policy.backoff(attempt))
+                attempt += 1
+                continue
+            return response
+
+    @staticmethod
+    def _circuit_open_response(url: str, route: str) -> requests.Response:
+        """
+        熔断时返回的伪造响应, 由各接口按普通的请求失败处理
+        """
+        response = requests.Response()
+        response.status_code = 503
+        response.url = url
+        response._content = codec.dumps_bytes({"code": -1, "message": f"circuit breaker open: {route}"})
+        response.headers["Content-Type"] = "application/json"
+        response.encoding = "utf-8"
+        return response
+
+    def get_circuit_breaker_state(self) -> dict:
+        """
+        获取各接口熔断器状态
+        """
+        return self.circuit_breakers.get_state()
+
+    def get_coalesce_stats(self) -> dict:
+        """
+        获取GET请求合并统计
+        :return: calls-GET请求数; shared-与其他请求合并的次数; in_flight-正在进行的请求数
+        """
+        return self.single_flight.get_stats()
+
+    def get_rate_limit_state(self) -> dict:
+        """
+        获取客户端限频令牌桶状态
+        """
+        return self.rate_limiter.get_state()
+
+    def get_http_stats(self) -> dict:
+        """
+        获取HTTP连接复用统计
+        """
+        return self.transport.get_stats()
 
     def _throwerr(self, error_response: str, error_message="", trace_id=None):
         """
@@ -35,9 +158,13 @@ class BotApi(BotLogger):
         if self.raise_api_error:
             raise models.BotCallingAPIError(error_response, error_message, x_tps_trace_id=trace_id)
 
-    def _tlogger(self, msg: str, debug=False, warning=False, error=False, error_resp=None, traceid=None):
+    def _tlogger(self, msg, debug=False, warning=False, error=False, error_resp=None, traceid=None, args: tuple = (),
+                 **fields):
+        if not self._log_enabled(debug, warning, error):
+            return
+        msg = self._format_log(msg, args, fields)
         smsg = f"{msg}\nX-Tps-trace-ID: {traceid}\n" if traceid is not None else msg
-        super().logger(msg=smsg, debug=debug, warning=warning, error=error)
+        super().logger(smsg, debug=debug, warning=warning, error=error)
         if error_resp is not None and error:
             self._throwerr(error_response=error_resp, error_message=smsg, trace_id=traceid)
 
@@ -51,9 +178,15 @@ class BotApi(BotLogger):
         :param data_type: pydantic_model类型: 0-str, 1-List
         :return:
         """
-        get_response = response.text
-        trace_id = response.headers.get("X-Tps-trace-ID")
-        data = json.loads(get_response)
+        return self._retter_text(response.text, response.headers.get("X-Tps-trace-ID"), wrong_text, data_model,
+                                 retstr, data_type)
+
+    def _retter_text(self, get_response: str, trace_id: t.Optional[str], wrong_text: str, data_model, retstr: bool,
+                     data_type=0):
+        """
+        返回器, 处理已取得的返回文本(如缓存), 参数同 _retter
+        """
+        data = codec.loads(get_response)
         if "code" in data:
             self._tlogger(f"{wrong_text}: {get_response}", error=True, error_resp=get_response, traceid=trace_id)
             # if retstr:
@@ -71,7 +204,7 @@ class BotApi(BotLogger):
                     return get_response
             except Exception as sb:
                 self._tlogger("请求转换为 Basemodel 失败, 将原样返回", error=True)
-                self._tlogger(f"请求原文: {get_response}", debug=True, traceid=trace_id)
+                self._tlogger("请求原文: %s", debug=True, traceid=trace_id, args=(get_response,))
                 print(sb)
                 return get_response
         else:
@@ -90,7 +223,7 @@ class BotApi(BotLogger):
             "recipient_id": recipient_id,
             "source_guild_id": source_guild_id
         }
-        response = requests.request("POST", url, data=json.dumps(payload), headers=self.__headers)
+        response = self._request("POST", url, data=codec.dumps_bytes(payload), headers=self.__headers)
         return self._retter(response, "创建私信会话失败", structs.DMS, retstr, data_type=0)
 
     def api_reply_message(self, event: structs.Message, content="", image_url="", retstr=False,
@@ -177,8 +310,9 @@ class BotApi(BotLogger):
 
     def _api_send_message(self, channel_id, msg_id="", content="", image_url="", retstr=False,
                           embed=None, ark=None, others_parameter: t.Optional[t.Dict] = None, guild_id=None,
-                          message_reference_type=0, message_reference_id=None, is_markdown=False) \
-            -> t.Union[str, structs.Message, None]:
+                          message_reference_type=0, message_reference_id=None, is_markdown=False,
+                          queued: t.Optional[bool] = None) \
+            -> t.Union[str, structs.Message, None, concurrent.futures.Future]:
         """
         发送消息
         :param channel_id: 子频道ID
@@ -192,10 +326,99 @@ class BotApi(BotLogger):
         :param guild_id: 填写该字段后将发送私聊消息
         :param message_reference_type: 引用消息, 0-不引用; 1-引用消息, 不忽略获取引用消息详情错误; 2- 引用消息, 忽略获取引用消息详情错误
         :param message_reference_id: 引用消息的ID, 若为空, 则使用"msg_id"字段的值
+        :param queued: 放入该子频道的发送队列(按顺序发送, 可合并纯文本消息), 返回 Future; None 时取决于 outbox.enabled
         """
+        if queued or (queued is None and self.outbox.enabled):
+            key = ("channel", channel_id) if guild_id is None else ("dms", guild_id)
+            return self.outbox.submit(key, channel_id=channel_id, msg_id=msg_id, content=content, image_url=image_url,
+                                      retstr=retstr, embed=embed, ark=ark, others_parameter=others_parameter,
+                                      guild_id=guild_id, message_reference_type=message_reference_type,
+                                      message_reference_id=message_reference_id, is_markdown=is_markdown,
+                                      queued=False)
 
         url = f"{self.base_api}/channels/{channel_id}/messages" if guild_id is None else \
             f"{self.base_api}/dms/{guild_id}/messages"
+        payload = self._build_message_payload(msg_id=msg_id, content=content, image_url=image_url, embed=embed,
+                                              ark=ark, others_parameter=others_parameter,
+                                              message_reference_type=message_reference_type,
+                                              message_reference_id=message_reference_id, is_markdown=is_markdown)
+        if payload is None:
+            return None
+
+        response = self._request("POST", url, headers=self.__headers, data=payload)
+        return self._retter(response, "发送信息失败", structs.Message, retstr)
+
+    def api_send_message_bulk(self, channel_ids: t.Iterable[str], msg_id="", content="", image_url="",
+                              embed=None, ark=None, message_reference_type=0, message_reference_id=None,
+                              others_parameter: t.Optional[t.Dict] = None,
+                              dms_guild_ids: t.Optional[t.Iterable[str]] = None,
+                              max_workers=16) -> t.List[structs.BulkSendResult]:
+        """
+        向多个子频道(及私信会话)发送同一条消息, 消息体只生成一次, 并发发送, 仍受客户端限频约束
+        :param channel_ids: 子频道ID列表
+        :param dms_guild_ids: 私信会话的 guild_id 列表, 可空
+        :param max_workers: 最大并发数
+        其余参数同 api_send_message
+        :return: 与目标顺序一致的发送结果, channel_ids 在前, dms_guild_ids 在后
+        """
+        targets = self._bulk_targets(channel_ids, dms_guild_ids)
+        payload = self._build_message_payload(msg_id=msg_id, content=content, image_url=image_url, embed=embed,
+                                              ark=ark, others_parameter=others_parameter,
+                                              message_reference_type=message_reference_type,
+                                              message_reference_id=message_reference_id)
+        if payload is None:
+            return [structs.BulkSendResult(target_id=tid, is_dms=is_dms, error="消息为空") for tid, is_dms in targets]
+
+        def _send(target: t.Tuple[str, bool]) -> structs.BulkSendResult:
+            target_id, is_dms = target
+            url = f"{self.base_api}/dms/{target_id}/messages" if is_dms else \
+                f"{self.base_api}/channels/{target_id}/messages"
+            try:
+                response = self._request("POST", url, headers=self.__headers, data=payload)
+            except requests.RequestException as sb:
+                return structs.BulkSendResult(target_id=target_id, is_dms=is_dms, error=repr(sb))
+            return self._bulk_send_result(target_id, is_dms, response)
+
+        if not targets:
+            return []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(targets)))) as pool:
+            results = list(pool.map(_send, targets))
+        self._log_bulk_send(results)
+        return results
+
+    @staticmethod
+    def _bulk_targets(channel_ids: t.Iterable[str], dms_guild_ids: t.Optional[t.Iterable[str]]) \
+            -> t.List[t.Tuple[str, bool]]:
+        return [(str(c), False) for c in channel_ids] + [(str(g), True) for g in (dms_guild_ids or [])]
+
+    @staticmethod
+    def _bulk_send_result(target_id: str, is_dms: bool, response) -> structs.BulkSendResult:
+        trace_id = response.headers.get("X-Tps-trace-ID")
+        message_id = None
+        if response.status_code == 200:
+            try:
+                message_id = codec.loads(response.content).get("id")
+            except (ValueError, AttributeError):
+                pass
+        ok = message_id is not None
+        return structs.BulkSendResult(target_id=target_id, is_dms=is_dms, ok=ok, status_code=response.status_code,
+                                      message_id=message_id, trace_id=trace_id,
+                                      error=None if ok else response.text)
+
+    def _log_bulk_send(self, results: t.List[structs.BulkSendResult]):
+        failed = [r for r in results if not r.ok]
+        if failed:
+            self._tlogger(f"批量发送消息: {len(results) - len(failed)}/{len(results)} 成功, 失败目标: "
+                          f"{', '.join(f'{r.target_id}(trace_id: {r.trace_id})' for r in failed[:20])}"
+                          f"{' ...' if len(failed) > 20 else ''}", warning=True)
+
+    def _build_message_payload(self, msg_id="", content="", image_url="", embed=None, ark=None,
+                               others_parameter: t.Optional[t.Dict] = None, message_reference_type=0,
+                               message_reference_id=None, is_markdown=False) -> t.Optional[bytes]:
+        """
+        生成发送消息的请求体, 参数同 _api_send_message
+        :return: json(UTF-8 bytes), 消息为空时返回None
+        """
         if content == "" and image_url == "" and embed is None and ark is None and others_parameter is None:
             self._tlogger("消息为空, 请检查", error=True)
             return None
@@ -225,10 +448,7 @@ class BotApi(BotLogger):
                     merged = {**merged, **_d}
             return merged
 
-        payload = json.dumps(merge_dict(_c, _im, _msgid, _embed, _ark, _ref, others_parameter))
-
-        response = requests.request("POST", url, headers=self.__headers, data=payload)
-        return self._retter(response, "发送信息失败", structs.Message, retstr)
+        return codec.dumps_bytes(merge_dict(_c, _im, _msgid, _embed, _ark, _ref, others_parameter))
 
     def api_mute_guild(self, guild_id, mute_seconds="", mute_end_timestamp="",
                        user_ids: t.Optional[t.List[str]] = None) -> t.Union[str, dict, t.List[str]]:
@@ -244,7 +464,7 @@ class BotApi(BotLogger):
         _body = {"mute_end_timestamp": f"{mute_end_timestamp}"} if mute_end_timestamp != "" else \
             {"mute_seconds": f"{mute_seconds}"}
         if user_ids is None:
-            response = requests.request("PATCH", url, data=json.dumps(_body), headers=self.__headers)
+            response = self._request("PATCH", url, data=codec.dumps_bytes(_body), headers=self.__headers)
             if response.status_code != 204:
                 data = response.text
                 self._tlogger(f"禁言频道失败: {data}", error=True, error_resp=data,
@@ -254,13 +474,13 @@ class BotApi(BotLogger):
                 return ""
         else:
             _body["user_ids"] = user_ids
-            response = requests.request("PATCH", url, data=json.dumps(_body), headers=self.__headers)
+            response = self._request("PATCH", url, data=codec.dumps_bytes(_body), headers=self.__headers)
             if response.status_code != 200:
                 self._tlogger(f"批量禁言失败: {response.text}", error=True, error_resp=response.text,
                               traceid=response.headers.get("X-Tps-trace-ID"))
                 return response.text
             else:
-                udata = json.loads(response.text)
+                udata = codec.loads(response.content)
                 return udata["user_ids"] if f"{user_ids}" in udata else udata
 
     def api_mute_member(self, guild_id, member_id, mute_seconds="", mute_end_timestamp="") -> str:
@@ -275,7 +495,7 @@ class BotApi(BotLogger):
         url = f"{self.base_api}/guilds/{guild_id}/members/{member_id}/mute"
         _body = {"mute_end_timestamp": f"{mute_end_timestamp}"} if mute_end_timestamp != "" else \
             {"mute_seconds": f"{mute_seconds}"}
-        response = requests.request("PATCH", url, data=json.dumps(_body), headers=self.__headers)
+        response = self._request("PATCH", url, data=codec.dumps_bytes(_body), headers=self.__headers)
         if response.status_code != 204:
             data = response.text
             self._tlogger(f"禁言成员失败: {data}", error=True, error_resp=data,
@@ -292,7 +512,7 @@ class BotApi(BotLogger):
         :return: 频道身份组信息
         """
         url = f"{self.base_api}/guilds/{guild_id}/roles"
-        response = requests.request("GET", url, headers=self.__headers)
+        response = self._request("GET", url, headers=self.__headers)
         return self._retter(response, "获取频道身份组列表失败", structs.RetModel.GetGuildRole, retstr, data_type=0)
 
     def api_guild_role_create(self, guild_id, name="", color=-1, hoist=1, retstr=False) \
@@ -307,7 +527,7 @@ class BotApi(BotLogger):
         """
         url = f"{self.base_api}/guilds/{guild_id}/roles"
         body = models.role_body(name, color, hoist)
-        response = requests.request("POST", url, data=json.dumps(body), headers=self.__headers)
+        response = self._request("POST", url, data=codec.dumps_bytes(body), headers=self.__headers)
         return self._retter(response, "创建频道身份组失败", structs.RetModel.CreateGuildRole, retstr, data_type=0)
 
     def api_guild_role_change(self, guild_id, role_id, name="", color=-1, hoist=1, retstr=False) \
@@ -323,7 +543,7 @@ class BotApi(BotLogger):
         """
         url = f"{self.base_api}/guilds/{guild_id}/roles/{role_id}"
         body = models.role_body(name, color, hoist)
-        response = requests.request("PATCH", url, data=json.dumps(body), headers=self.__headers)
+        response = self._request("PATCH", url, data=codec.dumps_bytes(body), headers=self.__headers)
         return self._retter(response, "修改频道身份组失败", structs.RetModel.ChangeGuildRole, retstr, data_type=0)
 
     def api_guild_role_remove(self, guild_id, role_id):
@@ -334,7 +554,7 @@ class BotApi(BotLogger):
         :return: 成功返回空字符串, 失败返回报错
         """
         url = f"{self.base_api}/guilds/{guild_id}/roles/{role_id}"
-        response = requests.request("DELETE", url, headers=self.__headers)
+        response = self._request("DELETE", url, headers=self.__headers)
         if response.status_code != 204:
             self._tlogger(f"删除频道身份组失败: {response.text}", error=True, error_resp=response.text,
                           traceid=response.headers.get("X-Tps-trace-ID"))
@@ -391,7 +611,7 @@ class BotApi(BotLogger):
                 tl.append({"channel_id": channel_id, "introduce": introduce})
             body[recommend_channels] = tl
 
-        response = requests.request("POST", url, data=json.dumps(body), headers=self.__headers)
+        response = self._request("POST", url, data=codec.dumps_bytes(body), headers=self.__headers)
         return self._retter(response, "创建频道公告失败", structs.Announces, retstr, data_type=0)
 
     def api_announces_global_remove(self, guild_id, message_id="all"):
@@ -402,7 +622,7 @@ class BotApi(BotLogger):
         :return: 成功返回空字符串, 失败返回错误信息
         """
         url = f"{self.base_api}/guilds/{guild_id}/announces/{message_id}"
-        response = requests.request("DELETE", url, headers=self.__headers)
+        response = self._request("DELETE", url, headers=self.__headers)
         if response.status_code != 204:
             self._tlogger(f"删除频道公告失败: {response.text}", error_resp=response.text,
                           traceid=response.headers.get("X-Tps-trace-ID"))
@@ -420,7 +640,7 @@ class BotApi(BotLogger):
         :return: ChannelPermissions, role_id必为None
         """
         url = f"{self.base_api}/channels/{channel_id}/members/{user_id}/permissions"
-        response = requests.request("GET", url, headers=self.__headers)
+        response = self._request("GET", url, headers=self.__headers)
         return self._retter(response, "获取指定子频道的权限失败", structs.ChannelPermissions, retstr, data_type=0)
 
     def api_permissions_change_channel(self, channel_id, user_id, add: str, remove: str, **kwargs):
@@ -439,7 +659,7 @@ class BotApi(BotLogger):
             url = f"{self.base_api}/channels/{channel_id}/roles/{user_id}/permissions"
             ft = "修改指定子频道的权限失败"
         body = {"add": add, "remove": remove}
-        response = requests.request("PUT", url, data=json.dumps(body), headers=self.__headers)
+        response = self._request("PUT", url, data=codec.dumps_bytes(body), headers=self.__headers)
         if response.status_code != 204:
             self._tlogger(f"{ft}: {response.text}", error_resp=response.text,
                           traceid=response.headers.get("X-Tps-trace-ID"))
@@ -457,7 +677,7 @@ class BotApi(BotLogger):
         :return: ChannelPermissions, user_id必为None
         """
         url = f"{self.base_api}/channels/{channel_id}/roles/{role_id}/permissions"
-        response = requests.request("GET", url, headers=self.__headers)
+        response = self._request("GET", url, headers=self.__headers)
         return self._retter(response, "获取指定子频道身份组的权限失败", structs.ChannelPermissions, retstr, data_type=0)
 
     def api_permissions_change_channel_group(self, channel_id, role_id, add: str, remove: str):
@@ -482,7 +702,7 @@ class BotApi(BotLogger):
         """
         url = f"{self.base_api}/channels/{channel_id}/audio"
         body = models.audio_control(audio_url, status, text)
-        response = requests.request("POST", url, data=json.dumps(body), headers=self.__headers)
+        response = self._request("POST", url, data=codec.dumps_bytes(body), headers=self.__headers)
         if response.text != "{}":
             self._tlogger(f"音频控制失败: {response.text}", error_resp=response.text,
                           traceid=response.headers.get("X-Tps-trace-ID"))
@@ -515,38 +735,42 @@ class BotApi(BotLogger):
         """
         return self.get_message(channel_id=channel_id, message_id=message_id, retstr=retstr)
 
-    def api_get_guild_channel_list(self, guild_id, retstr=False) -> t.Union[str, t.List[structs.Channel], None]:
+    def api_get_guild_channel_list(self, guild_id, retstr=False, use_cache=True) -> t.Union[str, t.List[structs.Channel], None]:
         """
         获取频道内子频道列表
         :param guild_id: 频道id
         :param retstr: 强制返回纯文本
+        :param use_cache: 使用缓存, 缓存会在收到对应的更新事件后失效
         """
-        return self.get_guild_channel_list(guild_id=guild_id, retstr=retstr)
+        return self.get_guild_channel_list(guild_id=guild_id, retstr=retstr, use_cache=use_cache)
 
-    def api_get_channel_info(self, channel_id, retstr=False) -> t.Union[str, structs.Channel, None]:
+    def api_get_channel_info(self, channel_id, retstr=False, use_cache=True) -> t.Union[str, structs.Channel, None]:
         """
         获取子频道信息
         :param channel_id: 频道id
         :param retstr: 强制返回纯文本
+        :param use_cache: 使用缓存, 缓存会在收到对应的更新事件后失效
         """
-        return self.get_channel_info(channel_id=channel_id, retstr=retstr)
+        return self.get_channel_info(channel_id=channel_id, retstr=retstr, use_cache=use_cache)
 
-    def api_get_guild_user_info(self, guild_id, member_id, retstr=False) -> t.Union[str, structs.Member, None]:
+    def api_get_guild_user_info(self, guild_id, member_id, retstr=False, use_cache=True) -> t.Union[str, structs.Member, None]:
         """
         获取频道用户信息
         :param guild_id: 频道id
         :param member_id: 用户id
         :param retstr: 强制返回纯文本
+        :param use_cache: 使用缓存, 缓存会在收到对应的更新事件后失效
         """
-        return self.get_guild_user_info(guild_id=guild_id, member_id=member_id, retstr=retstr)
+        return self.get_guild_user_info(guild_id=guild_id, member_id=member_id, retstr=retstr, use_cache=use_cache)
 
-    def api_get_guild_info(self, guild_id, retstr=False) -> t.Union[str, structs.Guild, None]:
+    def api_get_guild_info(self, guild_id, retstr=False, use_cache=True) -> t.Union[str, structs.Guild, None]:
         """
         获取频道信息
         :param guild_id: 频道id
         :param retstr: 强制返回纯文本
+        :param use_cache: 使用缓存, 缓存会在收到对应的更新事件后失效
         """
-        return self.get_guild_info(guild_id=guild_id, retstr=retstr)
+        return self.get_guild_info(guild_id=guild_id, retstr=retstr, use_cache=use_cache)
 
     def api_get_schedule_list(self, channel_id, retstr=False) -> t.Union[str, t.List[structs.Schedule], None]:
         """
@@ -556,7 +780,7 @@ class BotApi(BotLogger):
         :return: 日程列表(若为空, 则返回 None)
         """
         url = f"{self.base_api}/channels/{channel_id}/schedules"
-        response = requests.request("GET", url, headers=self.__headers)
+        response = self._request("GET", url, headers=self.__headers)
         return self._retter(response, "获取日程列表失败", structs.Schedule, retstr, data_type=1)
 
     def api_get_schedule(self, channel_id, schedule_id, retstr=False) -> t.Union[str, structs.Schedule, None]:
@@ -568,7 +792,7 @@ class BotApi(BotLogger):
         :return: 单个日程信息(若为空, 则返回 None)
         """
         url = f"{self.base_api}/channels/{channel_id}/schedules/{schedule_id}"
-        response = requests.request("GET", url, headers=self.__headers)
+        response = self._request("GET", url, headers=self.__headers)
         return self._retter(response, "获取日程信息失败", structs.Schedule, retstr, data_type=0)
 
     def api_schedule_create(self, channel_id, name: str, description: str, start_timestamp: str, end_timestamp: str,
@@ -587,9 +811,9 @@ class BotApi(BotLogger):
         :return: 新创建的日程
         """
         url = f"{self.base_api}/channels/{channel_id}/schedules"
-        payload = json.dumps(models.schedule_json(name, description, start_timestamp, end_timestamp,
+        payload = codec.dumps_bytes(models.schedule_json(name, description, start_timestamp, end_timestamp,
                                                   jump_channel_id, remind_type))
-        response = requests.request("POST", url, headers=self.__headers, data=payload)
+        response = self._request("POST", url, headers=self.__headers, data=payload)
         return self._retter(response, "创建日程失败", structs.Schedule, retstr, data_type=0)
 
     def api_schedule_change(self, channel_id, schedule_id, name: str, description: str, start_timestamp: str,
@@ -609,9 +833,9 @@ class BotApi(BotLogger):
         :return: 修改后的日程
         """
         url = f"{self.base_api}/channels/{channel_id}/schedules/{schedule_id}"
-        payload = json.dumps(models.schedule_json(name, description, start_timestamp, end_timestamp,
+        payload = codec.dumps_bytes(models.schedule_json(name, description, start_timestamp, end_timestamp,
                                                   jump_channel_id, remind_type))
-        response = requests.request("PATCH", url, headers=self.__headers, data=payload)
+        response = self._request("PATCH", url, headers=self.__headers, data=payload)
         return self._retter(response, "修改日程失败", structs.Schedule, retstr, data_type=0)
 
     def api_schedule_delete(self, channel_id, schedule_id):
@@ -622,7 +846,7 @@ class BotApi(BotLogger):
         :return: 成功返回空字符串, 失败返回错误信息
         """
         url = f"{self.base_api}/channels/{channel_id}/schedules/{schedule_id}"
-        response = requests.request("DELETE", url, headers=self.__headers)
+        response = self._request("DELETE", url, headers=self.__headers)
         if response.status_code != 204:
             data = response.text
             self._tlogger(f"日程删除失败: {data}", error_resp=response.text,
@@ -643,7 +867,7 @@ class BotApi(BotLogger):
         payload = {
             'hidetip': str(hidetip).lower()
         }
-        response = requests.request("DELETE", url, headers=self.__headers, params=payload)
+        response = self._request("DELETE", url, headers=self.__headers, params=payload)
         if response.status_code != 200:
             data = response.text
             self._tlogger(f"撤回消息失败: {data}", error_resp=response.text,
@@ -660,7 +884,7 @@ class BotApi(BotLogger):
         :return: 频道权限列表
         """
         url = f"{self.base_api}/guilds/{guild_id}/api_permission"
-        response = requests.request("GET", url, headers=self.__headers)
+        response = self._request("GET", url, headers=self.__headers)
         return self._retter(response, "获取频道可用权限列表失败", structs.APIPermission, retstr, data_type=1)
 
     def api_demand_api_permission(self, guild_id, channel_id: str, path: str, method: str, desc: str, retstr=False) \
@@ -684,7 +908,7 @@ class BotApi(BotLogger):
             },
             "desc": desc
         }
-        response = requests.request("POST", url, headers=self.__headers, data=json.dumps(payload))
+        response = self._request("POST", url, headers=self.__headers, data=codec.dumps_bytes(payload))
         return self._retter(response, "创建授权链接失败", structs.APIPermissionDemand, retstr, data_type=0)
 
     def api_add_pins(self, channel_id, message_id, retstr=False) -> t.Union[structs.PinsMessage, str]:
@@ -696,7 +920,7 @@ class BotApi(BotLogger):
         :return:
         """
         url = f"{self.base_api}/channels/{channel_id}/pins/{message_id}"
-        response = requests.request("PUT", url, headers=self.__headers)
+        response = self._request("PUT", url, headers=self.__headers)
         return self._retter(response, "添加精华消息失败", structs.PinsMessage, retstr, data_type=0)
 
     def api_remove_pins(self, channel_id, message_id):
@@ -707,7 +931,7 @@ class BotApi(BotLogger):
         :return:
         """
         url = f"{self.base_api}/channels/{channel_id}/pins/{message_id}"
-        response = requests.request("DELETE", url, headers=self.__headers)
+        response = self._request("DELETE", url, headers=self.__headers)
         if response.status_code != 204:
             self._tlogger(f"移除精华消息失败: {response.text}", error=True, error_resp=response.text,
                           traceid=response.headers.get("X-Tps-trace-ID"))
@@ -723,7 +947,7 @@ class BotApi(BotLogger):
         :return:
         """
         url = f"{self.base_api}/channels/{channel_id}/pins"
-        response = requests.request("GET", url, headers=self.__headers)
+        response = self._request("GET", url, headers=self.__headers)
         return self._retter(response, "获取精华消息失败", structs.PinsMessage, retstr, data_type=0)
 
     def api_send_message_reactions(self, channel_id, message_id, emoji_type, emoji_id):
@@ -736,7 +960,7 @@ class BotApi(BotLogger):
         :return: 成功返回空字符串
         """
         url = f"{self.base_api}/channels/{channel_id}/messages/{message_id}/reactions/{emoji_type}/{emoji_id}"
-        response = requests.request("PUT", url, headers=self.__headers)
+        response = self._request("PUT", url, headers=self.__headers)
         if response.status_code != 204:
             self._tlogger(f"发送表情表态失败: {response.text}", error=True, error_resp=response.text,
                           traceid=response.headers.get("X-Tps-trace-ID"))
@@ -752,7 +976,7 @@ class BotApi(BotLogger):
         :return: 成功返回成员列表, 失败返回错误信息
         """
         url = f"{self.base_api}/guilds/{guild_id}/members"
-        response = requests.request("GET", url, headers=self.__headers)
+        response = self._request("GET", url, headers=self.__headers)
         return self._retter(response, "获取频道成员列表失败", structs.Member, retstr, data_type=1)
 
     def api_pv_kick_member(self, guild_id, user_id, add_blick_list=False, delete_history_msg_days=0) -> str:
@@ -770,7 +994,7 @@ class BotApi(BotLogger):
             "add_blacklist": add_blick_list,
             "delete_history_msg_days": f"{delete_history_msg_days}"
         }
-        response = requests.request("DELETE", url, headers=self.__headers, data=json.dumps(payload))
+        response = self._request("DELETE", url, headers=self.__headers, data=codec.dumps_bytes(payload))
         if response.status_code != 204:
             self._tlogger(f"移除成员失败: {response.text}", error=True, error_resp=response.text,
                           traceid=response.headers.get("X-Tps-trace-ID"))
@@ -798,7 +1022,7 @@ class BotApi(BotLogger):
             "position": channel_position,
             "parent_id": channel_parent_id
         }
-        response = requests.request("POST", url, data=json.dumps(body_s), headers=self.__headers)
+        response = self._request("POST", url, data=codec.dumps_bytes(body_s), headers=self.__headers)
         return self._retter(response, "创建子频道失败", structs.Channel, retstr, data_type=0)
 
     def api_pv_change_channel(self, channel_id, channel_name: str, channel_type: int,
@@ -821,7 +1045,7 @@ class BotApi(BotLogger):
             "position": channel_position,
             "parent_id": channel_parent_id
         }
-        response = requests.request("PATCH", url, data=json.dumps(body_s), headers=self.__headers)
+        response = self._request("PATCH", url, data=codec.dumps_bytes(body_s), headers=self.__headers)
         return self._retter(response, "修改子频道失败", structs.Channel, retstr, data_type=0)
 
     def api_pv_delete_channel(self, channel_id):
@@ -831,7 +1055,7 @@ class BotApi(BotLogger):
         :return: 成功返回空字符串, 失败返回错误信息
         """
         url = f"{self.base_api}/channels/{channel_id}"
-        response = requests.request("DELETE", url, headers=self.__headers)
+        response = self._request("DELETE", url, headers=self.__headers)
         if response.status_code != 200 and response.status_code != 204:
             self._tlogger(f"删除子频道失败: {response.text}", error_resp=response.text,
                           traceid=response.headers.get("X-Tps-trace-ID"))
@@ -839,29 +1063,77 @@ class BotApi(BotLogger):
         else:
             return ""
 
-    def get_guild_info(self, guild_id, retstr=False) -> t.Union[str, structs.Guild, None]:
+    def get_guild_info(self, guild_id, retstr=False, use_cache=True) -> t.Union[str, structs.Guild, None]:
         url = f"{self.base_api}/guilds/{guild_id}"
-        response = requests.request("GET", url, headers=self.__headers)
-        return self._retter(response, "获取频道信息失败", structs.Guild, retstr, data_type=0)
+        return self._cached_get(("guild", guild_id), url, use_cache, "获取频道信息失败", structs.Guild, retstr, 0)
 
-    def get_guild_user_info(self, guild_id, member_id, retstr=False) -> t.Union[str, structs.Member, None]:
+    def get_guild_user_info(self, guild_id, member_id, retstr=False, use_cache=True) \
+            -> t.Union[str, structs.Member, None]:
         url = f"{self.base_api}/guilds/{guild_id}/members/{member_id}"
-        response = requests.request("GET", url, headers=self.__headers)
-        return self._retter(response, "获取成员信息失败", structs.Member, retstr, data_type=0)
+        return self._cached_get(("member", guild_id, member_id), url, use_cache, "获取成员信息失败", structs.Member,
+                                retstr, 0)
 
-    def get_channel_info(self, channel_id, retstr=False) -> t.Union[str, structs.Channel, None]:
+    def get_channel_info(self, channel_id, retstr=False, use_cache=True) -> t.Union[str, structs.Channel, None]:
         url = f"{self.base_api}/channels/{channel_id}"
-        response = requests.request("GET", url, headers=self.__headers)
-        return self._retter(response, "获取子频道信息失败", structs.Channel, retstr, data_type=0)
+        return self._cached_get(("channel", channel_id), url, use_cache, "获取子频道信息失败", structs.Channel,
+                                retstr, 0)
 
-    def get_guild_channel_list(self, guild_id, retstr=False) -> t.Union[str, t.List[structs.Channel], None]:
+    def get_guild_channel_list(self, guild_id, retstr=False, use_cache=True) \
+            -> t.Union[str, t.List[structs.Channel], None]:
         url = f"{self.base_api}/guilds/{guild_id}/channels"
-        response = requests.request("GET", url, headers=self.__headers)
-        return self._retter(response, "获取子频道列表失败", structs.Channel, retstr, data_type=1)
+        return self._cached_get(("channel_list", guild_id), url, use_cache, "获取子频道列表失败", structs.Channel,
+                                retstr, 1)
+
+    def _cached_get(self, key: tuple, url: str, use_cache: bool, wrong_text: str, data_model, retstr: bool,
+                    data_type=0):
+        """
+        带缓存的GET请求, 仅缓存成功的返回值
+        :param key: 缓存key, 格式: (类型, id, ...)
+        """
+        if use_cache:
+            cached = self.entity_cache.get(key)
+            if cached is not None:
+                return self._retter_text(cached, None, wrong_text, data_model, retstr, data_type)
+        response = self._request("GET", url, headers=self.__headers)
+        if response.status_code == 200:
+            self.entity_cache.set(key, response.text)
+        return self._retter(response, wrong_text, data_model, retstr, data_type=data_type)
+
+    def _update_entity_cache(self, event_type: str, data: dict):
+        """
+        根据网关事件使缓存失效
+        :param event_type: 事件类型
+        :param data: 事件原始数据
+        """
+        ev = structs.Codes.QBot.GatewayEventName
+        if event_type in (ev.GUILD_CREATE, ev.GUILD_UPDATE, ev.GUILD_DELETE):
+            self.entity_cache.discard_if(lambda k: k[0] == "self_guilds")
+        if event_type in (ev.GUILD_UPDATE, ev.GUILD_DELETE):
+            guild_id = data.get("id")
+            self.entity_cache.pop(("guild", guild_id))
+            if event_type == ev.GUILD_DELETE:
+                channel_ids = self._guild_channel_ids(guild_id)
+                self.entity_cache.discard_if(lambda k: (k[0] in ("channel_list", "member") and k[1] == guild_id) or
+                                                       (k[0] == "channel" and k[1] in channel_ids))
+        elif event_type in (ev.CHANNEL_CREATE, ev.CHANNEL_UPDATE, ev.CHANNEL_DELETE):
+            self.entity_cache.pop(("channel", data.get("id")))
+            self.entity_cache.pop(("channel_list", data.get("guild_id")))
+        elif event_type in (ev.GUILD_MEMBER_ADD, ev.GUILD_MEMBER_UPDATE, ev.GUILD_MEMBER_REMOVE):
+            user = data.get("user") or {}
+            self.entity_cache.pop(("member", data.get("guild_id"), user.get("id")))
+
+    def _guild_channel_ids(self, guild_id) -> t.Set[str]:
+        cached = self.entity_cache.get(("channel_list", guild_id))
+        if cached is None:
+            return set()
+        try:
+            return {c.get("id") for c in codec.loads(cached)}
+        except (ValueError, AttributeError):
+            return set()
 
     def get_message(self, channel_id, message_id, retstr=False) -> t.Union[str, structs.Message, None]:
         url = f"{self.base_api}/channels/{channel_id}/messages/{message_id}"
-        response = requests.request("GET", url, headers=self.__headers)
+        response = self._request("GET", url, headers=self.__headers)
         return self._retter(response, "获取消息信息失败", structs.Message, retstr, data_type=0)
 
     def get_self_info(self, use_cache=False) -> t.Union[str, structs.User, None]:
@@ -869,11 +1141,11 @@ class BotApi(BotLogger):
             get_response = self._cache["self_info"]
         else:
             url = f"{self.base_api}/users/@me"
-            response = requests.request("GET", url, headers=self.__headers)
+            response = self._request("GET", url, headers=self.__headers)
             get_response = response.text
             self._cache["self_info"] = response.text
 
-        data = json.loads(get_response)
+        data = codec.loads(get_response)
         if "code" in data:
             self._tlogger(f"获取自身信息失败: {get_response}", error=True, error_resp=get_response)
             return None
@@ -885,22 +1157,28 @@ class BotApi(BotLogger):
 
     def get_self_guilds(self, before="", after="", limit="100", use_cache=False, retstr=False) \
             -> t.Union[str, t.List[structs.Guild], None]:
-        if use_cache and "get_self_guilds" in self._cache:
-            get_response = self._cache["get_self_guilds"]
-            x_trace_id = None
-        else:
-            if after != "":
-                url = f"{self.base_api}/users/@me/guilds?after={after}&limit={limit}"
-            elif before != "":
-                url = f"{self.base_api}/users/@me/guilds?before={before}&limit={limit}"
-            else:
-                url = f"{self.base_api}/users/@me/guilds?limit={limit}"
-            response = requests.request("GET", url, headers=self.__headers)
+        cache_key = ("self_guilds", str(before), str(after), str(limit))
+        get_response = self.entity_cache.get(cache_key) if use_cache else None
+        x_trace_id = None
+        if get_response is None:
+            response = self._request("GET", self._self_guilds_url(before, after, limit), headers=self.__headers)
             get_response = response.text
             x_trace_id = response.headers.get("X-Tps-trace-ID")
-            self._cache["get_self_guilds"] = response.text
+            if response.status_code == 200:
+                self.entity_cache.set(cache_key, response.text)
+
+        return self._self_guilds_retter(get_response, x_trace_id, retstr)
 
-        data = json.loads(get_response)
+    def _self_guilds_url(self, before, after, limit) -> str:
+        if after != "":
+            return f"{self.base_api}/users/@me/guilds?after={after}&limit={limit}"
+        elif before != "":
+            return f"{self.base_api}/users/@me/guilds?before={before}&limit={limit}"
+        else:
+            return f"{self.base_api}/users/@me/guilds?limit={limit}"
+
+    def _self_guilds_retter(self, get_response: str, x_trace_id, retstr: bool):
+        data = codec.loads(get_response)
         if "code" in data:
             self._tlogger(f"获取频道列表失败: {get_response}", error=True, error_resp=get_response, traceid=x_trace_id)
             if retstr:
@@ -911,6 +1189,54 @@ class BotApi(BotLogger):
         else:
             return get_response
 
+    @staticmethod
+    def _parse_guild_page(get_response: str) -> t.List[dict]:
+        """
+        解析 get_self_guilds(retstr=True) 的返回值
+        API返回错误时抛出 BotCallingAPIError, 避免把不完整的频道列表当作全部结果
+        """
+        try:
+            data = codec.loads(get_response)
+        except (TypeError, ValueError):
+            data = None
+        if not isinstance(data, list):
+            raise models.BotCallingAPIError(str(get_response), "获取频道列表失败")
+        return data
+
+    def iter_self_guilds(self, limit=100, after="", use_cache=False, prefetch=True) \
+            -> t.Iterator[t.Union[dict, structs.Guild]]:
+        """
+        遍历Bot加入的所有频道, 自动按 after 翻页
+        :param limit: 每页拉取条数, 最大100
+        :param after: 从此id之后开始读取
+        :param use_cache: 每一页分别按请求参数缓存
+        :param prefetch: 处理当前页时在后台线程预先拉取下一页
+        :return: 频道对象; api_return_pydantic 为 False 时为 dict
+        :raise BotCallingAPIError: 某一页获取失败
+        """
+        def _fetch(cursor):
+            return self._parse_guild_page(self.get_self_guilds(after=cursor, limit=limit, use_cache=use_cache,
+                                                               retstr=True))
+
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            page = _fetch(after)
+            while page:
+                next_page = None
+                has_more = len(page) >= int(limit)
+                if has_more and pool is not None:
+                    next_page = pool.submit(_fetch, page[-1]["id"])
+
+                for guild in page:
+                    yield structs.Guild(**guild) if self.api_return_pydantic else guild
+
+                if not has_more:
+                    break
+                page = next_page.result() if next_page is not None else _fetch(page[-1]["id"])
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False)
+
     def api_get_guild_message_freq(self, guild_id, retstr=False) -> t.Union[str, None, structs.MessageSetting]:
         """
         获取频道消息频率设置
@@ -919,7 +1245,7 @@ class BotApi(BotLogger):
         :return: MessageSetting
         """
         url = f"{self.base_api}/guilds/{guild_id}/message/setting"
-        response = requests.request("GET", url, headers=self.__headers)
+        response = self._request("GET", url, headers=self.__headers)
         return self._retter(response, "获取频道消息频率设置失败", structs.MessageSetting, retstr, data_type=0)
 
     def api_send_message_guide(self, channel_id, content: str):
@@ -931,7 +1257,7 @@ class BotApi(BotLogger):
         """
         url = f"{self.base_api}/channels/{channel_id}/settingguide"
         data = {"content": content}
-        response = requests.request("POST", url, data=json.dumps(data), headers=self.__headers)
+        response = self._request("POST", url, data=codec.dumps_bytes(data), headers=self.__headers)
         if not str(response.status_code).startswith("2"):
             self._tlogger(f"发送消息设置引导失败: {response.text}", error=True, error_resp=response.text,
                           traceid=response.headers.get("X-Tps-trace-ID"))
@@ -941,7 +1267,7 @@ class BotApi(BotLogger):
     def _request_guild_role_member(self, guild_id, role_id, user_id, channel_id="", request_function="PUT"):
         url = f"{self.base_api}/guilds/{guild_id}/members/{user_id}/roles/{role_id}"
         body = {"channel": {"id": channel_id}} if channel_id != "" else None
-        response = requests.request(request_function, url, data=None if body is None else json.dumps(body),
+        response = self._request(request_function, url, data=None if body is None else codec.dumps_bytes(body),
                                     headers=self.__headers)
         if response.status_code != 204:
             self._tlogger(f"{'增加' if request_function == 'PUT' else '删除'}频道身份组成员失败: {response.text}", error=True,
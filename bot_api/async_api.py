@@ -0,0 +1,812 @@
+import asyncio
+import typing as t
+from . import structs
+from . import codec
+from . import models
+from . import ratelimit
+from . import singleflight
+from .api import BotApi
+
+try:
+    import aiohttp
+except ImportError:  # 仅 AsyncBotApi 需要
+    aiohttp = None
+
+
+class AsyncResponse:
+    def __init__(self, status_code: int, content: bytes, headers):
+        """
+        异步请求的返回值, 提供与 requests.Response 相同的 status_code/text/headers 属性
+        """
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return codec.loads(self.content)
+
+
+class AsyncBotApi(BotApi):
+    def __init__(self, appid: int, token: str, secret: str, debug: bool, sandbox: bool, api_return_pydantic=False,
+                 output_log=True, log_path="", raise_api_error=False, http_pool_size=16, http_timeout=(5, 30)):
+        """
+        异步API客户端, 方法名, 参数与返回值均与 BotApi 相同, 调用时需要 await
+        基于 aiohttp, 同一个事件循环内的请求共用连接池. 限频/重试/熔断策略与 BotApi 相同
+        """
+        super().__init__(appid=appid, token=token, secret=secret, debug=debug, sandbox=sandbox,
+                         api_return_pydantic=api_return_pydantic, output_log=output_log, log_path=log_path,
+                         raise_api_error=raise_api_error, http_pool_size=http_pool_size, http_timeout=http_timeout)
+        self.single_flight = singleflight.AsyncSingleFlight()
+        self._headers = {
+            'Authorization': f'Bot {self.appid}.{self.token}',
+            'Content-Type': 'application/json'
+        }
+
+    def _init_transport(self):
+        self._session: t.Optional["aiohttp.ClientSession"] = None  # 首次请求时在当前事件循环中创建
+        self._http_stats = {"requests": 0, "new_connections": 0, "reused": 0, "errors": 0}
+
+    @classmethod
+    def from_bot(cls, bot: BotApi) -> "AsyncBotApi":
+        """
+        创建与 bot 使用相同凭据与连接池设置的异步API客户端, 共用限频/重试/熔断策略与缓存
+        """
+        api = cls(bot.appid, bot.token, bot.secret, debug=bot.debug, sandbox=bot.base_api.startswith("https://sandbox"),
+                  api_return_pydantic=bot.api_return_pydantic, output_log=bot.write_out_log, log_path=bot._log_path,
+                  raise_api_error=bot.raise_api_error, http_pool_size=bot._http_pool_size,
+                  http_timeout=bot._http_timeout)
+        api.rate_limiter = bot.rate_limiter
+        api.retry_policy = bot.retry_policy
+        api.circuit_breakers = bot.circuit_breakers
+        api._cache = bot._cache
+        api.entity_cache = bot.entity_cache
+        return api
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if aiohttp is None:
+            raise ImportError("AsyncBotApi 需要安装 aiohttp: pip install aiohttp")
+        if self._session is None or self._session.closed:
+            if isinstance(self._http_timeout, tuple):
+                timeout = aiohttp.ClientTimeout(sock_connect=self._http_timeout[0], sock_read=self._http_timeout[1])
+            else:
+                timeout = aiohttp.ClientTimeout(total=self._http_timeout)
+            connector = aiohttp.TCPConnector(limit=self._http_pool_size, keepalive_timeout=60)
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._on_connection_create)
+            trace.on_connection_reuseconn.append(self._on_connection_reuse)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[trace])
+        return self._session
+
+    async def _on_connection_create(self, session, ctx, params):
+        self._http_stats["new_connections"] += 1
+
+    async def _on_connection_reuse(self, session, ctx, params):
+        self._http_stats["reused"] += 1
+
+    def get_http_stats(self) -> dict:
+        """
+        获取HTTP连接复用统计
+        """
+        ret = dict(self._http_stats)
+        ret["reuse_rate"] = ret["reused"] / ret["requests"] if ret["requests"] else 0.0
+        return ret
+
+    async def close(self):
+        """
+        关闭连接池
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _request(self, method: str, url: str, **kwargs) -> AsyncResponse:
+        """
+        所有异步REST请求的统一入口, 流程同 BotApi._request
+        """
+        if method.upper() == "GET":
+            return await self.single_flight.do((method.upper(), url), lambda: self._send_request(method, url, **kwargs))
+        return await self._send_request(method, url, **kwargs)
+
+    async def _send_request(self, method: str, url: str, **kwargs) -> AsyncResponse:
+        route = ratelimit.route_key(method, url)[0]
+        breaker = self.circuit_breakers.get(route)
+        can_retry = self.retry_policy.can_retry(method)
+        headers = kwargs.pop("headers", self._headers)
+        attempt = 0
+        while True:
+            if not self.circuit_breakers.allow(route):
+                self._tlogger(f"接口熔断中, 跳过请求: {route}", warning=True)
+                response = self._circuit_open_response(url, route)
+                return AsyncResponse(response.status_code, response.content, response.headers)
+
+            try:
+                wait = self.rate_limiter.reserve(method, url)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._http_stats["requests"] += 1
+                async with self._get_session().request(method, url, headers=headers, **kwargs) as resp:
+                    response = AsyncResponse(resp.status, await resp.read(), resp.headers)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as sb:
+                self._http_stats["errors"] += 1
+                breaker.record_failure()
+                if can_retry and attempt < self.retry_policy.max_retries:
+                    self._tlogger(f"请求失败, 准备重试({attempt + 1}): {route} - {sb!r}", warning=True)
+                    await asyncio.sleep(self.retry_policy.backoff(attempt))
+                    attempt += 1
+                    continue
+                raise
+            except Exception:  # 如 ClientPayloadError, 同样计入失败, 否则半开状态的探测名额不会释放
+                self._http_stats["errors"] += 1
+                breaker.record_failure()
+                raise
+            except BaseException:  # 如 CancelledError
+                breaker.release()
+                raise
+
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            if response.status_code == 429:
+                retry_after = response.headers.get("Retry-After")
+                try:
+                    retry_after = float(retry_after) if retry_after is not None else 1.0
+                except ValueError:
+                    retry_after = 1.0
+                self.rate_limiter.penalize(method, url, retry_after)
+                self._tlogger(f"请求被限频, {retry_after}s内暂停该接口: {method} {url}", warning=True,
+                              traceid=response.headers.get("X-Tps-trace-ID"))
+
+            if response.status_code in self.retry_policy.retry_statuses and can_retry \
+                    and attempt < self.retry_policy.max_retries:
+                self._tlogger(f"请求失败({response.status_code}), 准备重试({attempt + 1}): {route}", warning=True,
+                              traceid=response.headers.get("X-Tps-trace-ID"))
+                await asyncio.sleep(self.retry_policy.backoff(attempt))
+                attempt += 1
+                continue
+            return response
+
+    def _empty_retter(self, response: AsyncResponse, wrong_text: str, ok_codes=(204,), error=True) -> str:
+        """
+        无返回内容的接口: 成功返回空字符串, 失败返回错误信息
+        """
+        if response.status_code not in ok_codes:
+            self._tlogger(f"{wrong_text}: {response.text}", error=error, error_resp=response.text,
+                          traceid=response.headers.get("X-Tps-trace-ID"))
+            return response.text
+        return ""
+
+    async def api_create_dms(self, recipient_id, source_guild_id, retstr=False) -> t.Union[structs.DMS, str]:
+        """
+        创建私信会话
+        """
+        url = f"{self.base_api}/users/@me/dms"
+        payload = {
+            "recipient_id": recipient_id,
+            "source_guild_id": source_guild_id
+        }
+        response = await self._request("POST", url, data=codec.dumps_bytes(payload))
+        return self._retter(response, "创建私信会话失败", structs.DMS, retstr, data_type=0)
+
+    async def api_reply_message(self, event: structs.Message, content="", image_url="", retstr=False,
+                                embed=None, ark=None, others_parameter: t.Optional[t.Dict] = None, at_user=True,
+                                message_reference=True, **kwargs) \
+            -> t.Union[str, structs.Message, None]:
+        """
+        快速回复消息, 支持频道消息/私聊消息
+        """
+        event_type = event.message_type_sdk
+        if at_user:
+            if "<@" not in content and event_type != "private":
+                content = f"<@{event.author.id}>\n{content}"
+
+        ref_type = 1 if message_reference else 0
+
+        if event_type == "guild":
+            return await self.api_send_message(channel_id=event.channel_id, msg_id=event.id, content=content,
+                                               image_url=image_url, retstr=retstr, embed=embed, ark=ark,
+                                               others_parameter=others_parameter, message_reference_type=ref_type,
+                                               **kwargs)
+        elif event_type == "private":
+            return await self.api_send_private_message(guild_id=event.guild_id, channel_id=event.channel_id,
+                                                       msg_id=event.id, content=content, image_url=image_url,
+                                                       retstr=retstr, embed=embed, ark=ark,
+                                                       others_parameter=others_parameter,
+                                                       message_reference_type=ref_type, **kwargs)
+        else:
+            self.logger("reply_message() - 无法识别传入的event", error=True)
+            return None
+
+    async def api_send_message(self, channel_id, msg_id="", content="", image_url="", retstr=False,
+                               embed=None, ark=None, message_reference_type=0, message_reference_id=None,
+                               others_parameter: t.Optional[t.Dict] = None, **kwargs) \
+            -> t.Union[str, structs.Message, None]:
+        """
+        发送消息
+        """
+        return await self._api_send_message(channel_id=channel_id, msg_id=msg_id, content=content,
+                                            image_url=image_url, retstr=retstr, embed=embed, ark=ark,
+                                            message_reference_type=message_reference_type,
+                                            message_reference_id=message_reference_id,
+                                            others_parameter=others_parameter, **kwargs)
+
+    async def api_send_private_message(self, guild_id, channel_id, msg_id="", content="", image_url="", retstr=False,
+                                       embed=None, ark=None, message_reference_type=0, message_reference_id=None,
+                                       others_parameter: t.Optional[t.Dict] = None, **kwargs):
+        """
+        发送私聊消息
+        """
+        return await self._api_send_message(channel_id=channel_id, msg_id=msg_id, content=content,
+                                            image_url=image_url, retstr=retstr, embed=embed, ark=ark,
+                                            others_parameter=others_parameter,
+                                            message_reference_type=message_reference_type,
+                                            message_reference_id=message_reference_id,
+                                            guild_id=guild_id, **kwargs)
+
+    async def _api_send_message(self, channel_id, msg_id="", content="", image_url="", retstr=False,
+                                embed=None, ark=None, others_parameter: t.Optional[t.Dict] = None, guild_id=None,
+                                message_reference_type=0, message_reference_id=None, is_markdown=False) \
+            -> t.Union[str, structs.Message, None]:
+        url = f"{self.base_api}/channels/{channel_id}/messages" if guild_id is None else \
+            f"{self.base_api}/dms/{guild_id}/messages"
+        payload = self._build_message_payload(msg_id=msg_id, content=content, image_url=image_url, embed=embed,
+                                              ark=ark, others_parameter=others_parameter,
+                                              message_reference_type=message_reference_type,
+                                              message_reference_id=message_reference_id, is_markdown=is_markdown)
+        if payload is None:
+            return None
+
+        response = await self._request("POST", url, data=payload)
+        return self._retter(response, "发送信息失败", structs.Message, retstr)
+
+    async def api_send_message_bulk(self, channel_ids: t.Iterable[str], msg_id="", content="", image_url="",
+                                    embed=None, ark=None, message_reference_type=0, message_reference_id=None,
+                                    others_parameter: t.Optional[t.Dict] = None,
+                                    dms_guild_ids: t.Optional[t.Iterable[str]] = None,
+                                    max_workers=16) -> t.List[structs.BulkSendResult]:
+        """
+        向多个子频道(及私信会话)发送同一条消息, 参数同 BotApi.api_send_message_bulk, max_workers 为最大并发协程数
+        """
+        targets = self._bulk_targets(channel_ids, dms_guild_ids)
+        payload = self._build_message_payload(msg_id=msg_id, content=content, image_url=image_url, embed=embed,
+                                              ark=ark, others_parameter=others_parameter,
+                                              message_reference_type=message_reference_type,
+                                              message_reference_id=message_reference_id)
+        if payload is None:
+            return [structs.BulkSendResult(target_id=tid, is_dms=is_dms, error="消息为空") for tid, is_dms in targets]
+
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def _send(target_id: str, is_dms: bool) -> structs.BulkSendResult:
+            url = f"{self.base_api}/dms/{target_id}/messages" if is_dms else \
+                f"{self.base_api}/channels/{target_id}/messages"
+            async with semaphore:
+                try:
+                    response = await self._request("POST", url, data=payload)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as sb:
+                    return structs.BulkSendResult(target_id=target_id, is_dms=is_dms, error=repr(sb))
+            return self._bulk_send_result(target_id, is_dms, response)
+
+        results = list(await asyncio.gather(*[_send(tid, is_dms) for tid, is_dms in targets]))
+        self._log_bulk_send(results)
+        return results
+
+    async def api_mute_guild(self, guild_id, mute_seconds="", mute_end_timestamp="",
+                             user_ids: t.Optional[t.List[str]] = None) -> t.Union[str, dict, t.List[str]]:
+        """
+        全频道禁言, 秒数/时间戳二选一
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/mute"
+        _body = {"mute_end_timestamp": f"{mute_end_timestamp}"} if mute_end_timestamp != "" else \
+            {"mute_seconds": f"{mute_seconds}"}
+        if user_ids is None:
+            response = await self._request("PATCH", url, data=codec.dumps_bytes(_body))
+            return self._empty_retter(response, "禁言频道失败")
+        else:
+            _body["user_ids"] = user_ids
+            response = await self._request("PATCH", url, data=codec.dumps_bytes(_body))
+            if response.status_code != 200:
+                return self._empty_retter(response, "批量禁言失败", ok_codes=(200,))
+            else:
+                udata = codec.loads(response.content)
+                return udata["user_ids"] if f"{user_ids}" in udata else udata
+
+    async def api_mute_member(self, guild_id, member_id, mute_seconds="", mute_end_timestamp="") -> str:
+        """
+        指定用户禁言, 秒数/时间戳二选一
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/members/{member_id}/mute"
+        _body = {"mute_end_timestamp": f"{mute_end_timestamp}"} if mute_end_timestamp != "" else \
+            {"mute_seconds": f"{mute_seconds}"}
+        response = await self._request("PATCH", url, data=codec.dumps_bytes(_body))
+        return self._empty_retter(response, "禁言成员失败")
+
+    async def api_guild_roles_list_get(self, guild_id, retstr=False) -> t.Union[str, structs.RetModel.GetGuildRole]:
+        """
+        获取频道身份组列表
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/roles"
+        response = await self._request("GET", url)
+        return self._retter(response, "获取频道身份组列表失败", structs.RetModel.GetGuildRole, retstr, data_type=0)
+
+    async def api_guild_role_create(self, guild_id, name="", color=-1, hoist=1, retstr=False) \
+            -> t.Union[str, structs.RetModel.CreateGuildRole]:
+        """
+        创建频道身份组
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/roles"
+        body = models.role_body(name, color, hoist)
+        response = await self._request("POST", url, data=codec.dumps_bytes(body))
+        return self._retter(response, "创建频道身份组失败", structs.RetModel.CreateGuildRole, retstr, data_type=0)
+
+    async def api_guild_role_change(self, guild_id, role_id, name="", color=-1, hoist=1, retstr=False) \
+            -> t.Union[str, structs.RetModel.ChangeGuildRole]:
+        """
+        修改频道身份组
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/roles/{role_id}"
+        body = models.role_body(name, color, hoist)
+        response = await self._request("PATCH", url, data=codec.dumps_bytes(body))
+        return self._retter(response, "修改频道身份组失败", structs.RetModel.ChangeGuildRole, retstr, data_type=0)
+
+    async def api_guild_role_remove(self, guild_id, role_id):
+        """
+        删除频道身份组
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/roles/{role_id}"
+        response = await self._request("DELETE", url)
+        return self._empty_retter(response, "删除频道身份组失败")
+
+    async def api_guild_role_member_add(self, guild_id, role_id, user_id, channel_id=""):
+        """
+        增加频道身份组成员
+        """
+        return await self._request_guild_role_member(guild_id, role_id, user_id, channel_id, "PUT")
+
+    async def api_guild_role_member_remove(self, guild_id, role_id, user_id, channel_id=""):
+        """
+        移除频道身份组成员
+        """
+        return await self._request_guild_role_member(guild_id, role_id, user_id, channel_id, "DELETE")
+
+    async def api_announces_create(self, guild_id, message_id=None, channel_id=None, announces_type=None,
+                                   recommend_channels=None, retstr=False) \
+            -> t.Union[str, structs.Announces]:
+        """
+        创建频道公告
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/announces"
+        body = {}
+        if message_id is not None:
+            body["message_id"] = message_id
+        if channel_id is not None:
+            body["channel_id"] = channel_id
+        if announces_type is not None:
+            body["announces_type"] = announces_type
+        if recommend_channels is not None:
+            body["recommend_channels"] = [{"channel_id": _cid, "introduce": introduce}
+                                          for _cid, introduce in recommend_channels]
+
+        response = await self._request("POST", url, data=codec.dumps_bytes(body))
+        return self._retter(response, "创建频道公告失败", structs.Announces, retstr, data_type=0)
+
+    async def api_announces_global_remove(self, guild_id, message_id="all"):
+        """
+        删除频道公告
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/announces/{message_id}"
+        response = await self._request("DELETE", url)
+        return self._empty_retter(response, "删除频道公告失败", error=False)
+
+    async def api_permissions_get_channel(self, channel_id, user_id, retstr=False) \
+            -> t.Union[str, structs.ChannelPermissions]:
+        """
+        获取指定子频道的权限
+        """
+        url = f"{self.base_api}/channels/{channel_id}/members/{user_id}/permissions"
+        response = await self._request("GET", url)
+        return self._retter(response, "获取指定子频道的权限失败", structs.ChannelPermissions, retstr, data_type=0)
+
+    async def api_permissions_change_channel(self, channel_id, user_id, add: str, remove: str, **kwargs):
+        """
+        修改指定子频道的权限
+        """
+        if "setrole" in kwargs:
+            url = f"{self.base_api}/channels/{channel_id}/members/{user_id}/permissions"
+            ft = "修改指定子频道身份组的权限失败"
+        else:
+            url = f"{self.base_api}/channels/{channel_id}/roles/{user_id}/permissions"
+            ft = "修改指定子频道的权限失败"
+        body = {"add": add, "remove": remove}
+        response = await self._request("PUT", url, data=codec.dumps_bytes(body))
+        return self._empty_retter(response, ft, error=False)
+
+    async def api_permissions_get_channel_group(self, channel_id, role_id, retstr=False) \
+            -> t.Union[str, structs.ChannelPermissions]:
+        """
+        获取指定子频道身份组的权限
+        """
+        url = f"{self.base_api}/channels/{channel_id}/roles/{role_id}/permissions"
+        response = await self._request("GET", url)
+        return self._retter(response, "获取指定子频道身份组的权限失败", structs.ChannelPermissions, retstr, data_type=0)
+
+    async def api_permissions_change_channel_group(self, channel_id, role_id, add: str, remove: str):
+        """
+        修改指定子频道身份组的权限
+        """
+        return await self.api_permissions_change_channel(channel_id, role_id, add, remove, setrole=1)
+
+    async def api_audio_control(self, channel_id, audio_url: str, status: int, text=""):
+        """
+        音频控制
+        """
+        url = f"{self.base_api}/channels/{channel_id}/audio"
+        body = models.audio_control(audio_url, status, text)
+        response = await self._request("POST", url, data=codec.dumps_bytes(body))
+        if response.text != "{}":
+            self._tlogger(f"音频控制失败: {response.text}", error_resp=response.text,
+                          traceid=response.headers.get("X-Tps-trace-ID"))
+        return response.text
+
+    async def api_get_self_guilds(self, before="", after="", limit="100", use_cache=False, retstr=False) \
+            -> t.Union[str, t.List[structs.Guild], None]:
+        """
+        获取Bot加入的频道列表
+        """
+        return await self.get_self_guilds(before=before, after=after, limit=limit, use_cache=use_cache,
+                                          retstr=retstr)
+
+    async def api_get_self_info(self, use_cache=False):
+        """
+        获取Bot自身信息
+        """
+        return await self.get_self_info(use_cache=use_cache)
+
+    async def api_get_message(self, channel_id, message_id, retstr=False) -> t.Union[str, structs.Message, None]:
+        """
+        获取指定消息
+        """
+        return await self.get_message(channel_id=channel_id, message_id=message_id, retstr=retstr)
+
+    async def api_get_guild_channel_list(self, guild_id, retstr=False, use_cache=True) \
+            -> t.Union[str, t.List[structs.Channel], None]:
+        """
+        获取频道内子频道列表
+        """
+        return await self.get_guild_channel_list(guild_id=guild_id, retstr=retstr, use_cache=use_cache)
+
+    async def api_get_channel_info(self, channel_id, retstr=False, use_cache=True) \
+            -> t.Union[str, structs.Channel, None]:
+        """
+        获取子频道信息
+        """
+        return await self.get_channel_info(channel_id=channel_id, retstr=retstr, use_cache=use_cache)
+
+    async def api_get_guild_user_info(self, guild_id, member_id, retstr=False, use_cache=True) \
+            -> t.Union[str, structs.Member, None]:
+        """
+        获取频道用户信息
+        """
+        return await self.get_guild_user_info(guild_id=guild_id, member_id=member_id, retstr=retstr,
+                                              use_cache=use_cache)
+
+    async def api_get_guild_info(self, guild_id, retstr=False, use_cache=True) -> t.Union[str, structs.Guild, None]:
+        """
+        获取频道信息
+        """
+        return await self.get_guild_info(guild_id=guild_id, retstr=retstr, use_cache=use_cache)
+
+    async def api_get_schedule_list(self, channel_id, retstr=False) -> t.Union[str, t.List[structs.Schedule], None]:
+        """
+        获取子频道日程列表
+        """
+        url = f"{self.base_api}/channels/{channel_id}/schedules"
+        response = await self._request("GET", url)
+        return self._retter(response, "获取日程列表失败", structs.Schedule, retstr, data_type=1)
+
+    async def api_get_schedule(self, channel_id, schedule_id, retstr=False) -> t.Union[str, structs.Schedule, None]:
+        """
+        获取单个日程信息
+        """
+        url = f"{self.base_api}/channels/{channel_id}/schedules/{schedule_id}"
+        response = await self._request("GET", url)
+        return self._retter(response, "获取日程信息失败", structs.Schedule, retstr, data_type=0)
+
+    async def api_schedule_create(self, channel_id, name: str, description: str, start_timestamp: str,
+                                  end_timestamp: str, jump_channel_id: str, remind_type: str, retstr=False) \
+            -> t.Union[str, structs.Schedule, None]:
+        """
+        创建日程
+        """
+        url = f"{self.base_api}/channels/{channel_id}/schedules"
+        payload = codec.dumps_bytes(models.schedule_json(name, description, start_timestamp, end_timestamp,
+                                                  jump_channel_id, remind_type))
+        response = await self._request("POST", url, data=payload)
+        return self._retter(response, "创建日程失败", structs.Schedule, retstr, data_type=0)
+
+    async def api_schedule_change(self, channel_id, schedule_id, name: str, description: str, start_timestamp: str,
+                                  end_timestamp: str, jump_channel_id: str, remind_type: str, retstr=False) \
+            -> t.Union[str, structs.Schedule, None]:
+        """
+        修改日程
+        """
+        url = f"{self.base_api}/channels/{channel_id}/schedules/{schedule_id}"
+        payload = codec.dumps_bytes(models.schedule_json(name, description, start_timestamp, end_timestamp,
+                                                  jump_channel_id, remind_type))
+        response = await self._request("PATCH", url, data=payload)
+        return self._retter(response, "修改日程失败", structs.Schedule, retstr, data_type=0)
+
+    async def api_schedule_delete(self, channel_id, schedule_id):
+        """
+        删除日程
+        """
+        url = f"{self.base_api}/channels/{channel_id}/schedules/{schedule_id}"
+        response = await self._request("DELETE", url)
+        return self._empty_retter(response, "日程删除失败", error=False)
+
+    async def api_message_recall(self, channel_id, message_id, hidetip=False):
+        """
+        撤回消息
+        """
+        url = f"{self.base_api}/channels/{channel_id}/messages/{message_id}"
+        payload = {
+            'hidetip': str(hidetip).lower()
+        }
+        response = await self._request("DELETE", url, params=payload)
+        return self._empty_retter(response, "撤回消息失败", ok_codes=(200,), error=False)
+
+    async def api_get_api_permission(self, guild_id, retstr=False) -> t.Union[structs.APIPermission, str]:
+        """
+        获取频道可用权限列表
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/api_permission"
+        response = await self._request("GET", url)
+        return self._retter(response, "获取频道可用权限列表失败", structs.APIPermission, retstr, data_type=1)
+
+    async def api_demand_api_permission(self, guild_id, channel_id: str, path: str, method: str, desc: str,
+                                        retstr=False) -> t.Union[structs.APIPermissionDemand, str]:
+        """
+        创建频道 API 接口权限授权链接
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/api_permission/demand"
+        payload = {
+            "channel_id": channel_id,
+            "api_identify": {
+                "path": path,
+                "method": method
+            },
+            "desc": desc
+        }
+        response = await self._request("POST", url, data=codec.dumps_bytes(payload))
+        return self._retter(response, "创建授权链接失败", structs.APIPermissionDemand, retstr, data_type=0)
+
+    async def api_add_pins(self, channel_id, message_id, retstr=False) -> t.Union[structs.PinsMessage, str]:
+        """
+        添加精华消息
+        """
+        url = f"{self.base_api}/channels/{channel_id}/pins/{message_id}"
+        response = await self._request("PUT", url)
+        return self._retter(response, "添加精华消息失败", structs.PinsMessage, retstr, data_type=0)
+
+    async def api_remove_pins(self, channel_id, message_id):
+        """
+        移除精华消息
+        """
+        url = f"{self.base_api}/channels/{channel_id}/pins/{message_id}"
+        response = await self._request("DELETE", url)
+        return self._empty_retter(response, "移除精华消息失败")
+
+    async def api_get_pins(self, channel_id, retstr=False) -> t.Union[structs.PinsMessage, str]:
+        """
+        获取精华消息
+        """
+        url = f"{self.base_api}/channels/{channel_id}/pins"
+        response = await self._request("GET", url)
+        return self._retter(response, "获取精华消息失败", structs.PinsMessage, retstr, data_type=0)
+
+    async def api_send_message_reactions(self, channel_id, message_id, emoji_type, emoji_id):
+        """
+        发表表情表态
+        """
+        url = f"{self.base_api}/channels/{channel_id}/messages/{message_id}/reactions/{emoji_type}/{emoji_id}"
+        response = await self._request("PUT", url)
+        return self._empty_retter(response, "发送表情表态失败")
+
+    async def api_pv_get_member_list(self, guild_id, retstr=False) -> t.Union[str, t.List[structs.Member], None]:
+        """
+        仅私域机器人可用 - 取频道成员列表
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/members"
+        response = await self._request("GET", url)
+        return self._retter(response, "获取频道成员列表失败", structs.Member, retstr, data_type=1)
+
+    async def api_pv_kick_member(self, guild_id, user_id, add_blick_list=False, delete_history_msg_days=0) -> str:
+        """
+        仅私域机器人可用 - 踢出指定成员
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/members/{user_id}"
+        payload = {
+            "add_blacklist": add_blick_list,
+            "delete_history_msg_days": f"{delete_history_msg_days}"
+        }
+        response = await self._request("DELETE", url, data=codec.dumps_bytes(payload))
+        return self._empty_retter(response, "移除成员失败")
+
+    async def api_pv_create_channel(self, guild_id, channel_name: str, channel_type: int,
+                                    channel_position: int, channel_parent_id: int, retstr=False) \
+            -> t.Union[str, structs.Channel, None]:
+        """
+        仅私域机器人可用 - 创建子频道
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/channels"
+        body_s = {
+            "name": channel_name,
+            "type": channel_type,
+            "position": channel_position,
+            "parent_id": channel_parent_id
+        }
+        response = await self._request("POST", url, data=codec.dumps_bytes(body_s))
+        return self._retter(response, "创建子频道失败", structs.Channel, retstr, data_type=0)
+
+    async def api_pv_change_channel(self, channel_id, channel_name: str, channel_type: int,
+                                    channel_position: int, channel_parent_id: int, retstr=False) \
+            -> t.Union[str, structs.Channel, None]:
+        """
+        仅私域机器人可用 - 修改子频道信息
+        """
+        url = f"{self.base_api}/channels/{channel_id}"
+        body_s = {
+            "name": channel_name,
+            "type": channel_type,
+            "position": channel_position,
+            "parent_id": channel_parent_id
+        }
+        response = await self._request("PATCH", url, data=codec.dumps_bytes(body_s))
+        return self._retter(response, "修改子频道失败", structs.Channel, retstr, data_type=0)
+
+    async def api_pv_delete_channel(self, channel_id):
+        """
+        仅私域机器人可用 - 删除子频道
+        """
+        url = f"{self.base_api}/channels/{channel_id}"
+        response = await self._request("DELETE", url)
+        return self._empty_retter(response, "删除子频道失败", ok_codes=(200, 204), error=False)
+
+    async def get_guild_info(self, guild_id, retstr=False, use_cache=True) -> t.Union[str, structs.Guild, None]:
+        url = f"{self.base_api}/guilds/{guild_id}"
+        return await self._cached_get(("guild", guild_id), url, use_cache, "获取频道信息失败", structs.Guild, retstr, 0)
+
+    async def get_guild_user_info(self, guild_id, member_id, retstr=False, use_cache=True) \
+            -> t.Union[str, structs.Member, None]:
+        url = f"{self.base_api}/guilds/{guild_id}/members/{member_id}"
+        return await self._cached_get(("member", guild_id, member_id), url, use_cache, "获取成员信息失败",
+                                      structs.Member, retstr, 0)
+
+    async def get_channel_info(self, channel_id, retstr=False, use_cache=True) \
+            -> t.Union[str, structs.Channel, None]:
+        url = f"{self.base_api}/channels/{channel_id}"
+        return await self._cached_get(("channel", channel_id), url, use_cache, "获取子频道信息失败",
+                                      structs.Channel, retstr, 0)
+
+    async def get_guild_channel_list(self, guild_id, retstr=False, use_cache=True) \
+            -> t.Union[str, t.List[structs.Channel], None]:
+        url = f"{self.base_api}/guilds/{guild_id}/channels"
+        return await self._cached_get(("channel_list", guild_id), url, use_cache, "获取子频道列表失败",
+                                      structs.Channel, retstr, 1)
+
+    async def _cached_get(self, key: tuple, url: str, use_cache: bool, wrong_text: str, data_model, retstr: bool,
+                          data_type=0):
+        if use_cache:
+            cached = self.entity_cache.get(key)
+            if cached is not None:
+                return self._retter_text(cached, None, wrong_text, data_model, retstr, data_type)
+        response = await self._request("GET", url)
+        if response.status_code == 200:
+            self.entity_cache.set(key, response.text)
+        return self._retter(response, wrong_text, data_model, retstr, data_type=data_type)
+
+    async def get_message(self, channel_id, message_id, retstr=False) -> t.Union[str, structs.Message, None]:
+        url = f"{self.base_api}/channels/{channel_id}/messages/{message_id}"
+        response = await self._request("GET", url)
+        return self._retter(response, "获取消息信息失败", structs.Message, retstr, data_type=0)
+
+    async def get_self_info(self, use_cache=False) -> t.Union[str, structs.User, None]:
+        if use_cache and "self_info" in self._cache:
+            get_response = self._cache["self_info"]
+        else:
+            url = f"{self.base_api}/users/@me"
+            response = await self._request("GET", url)
+            get_response = response.text
+            self._cache["self_info"] = response.text
+
+        data = codec.loads(get_response)
+        if "code" in data:
+            self._tlogger(f"获取自身信息失败: {get_response}", error=True, error_resp=get_response)
+            return None
+        elif self.api_return_pydantic:
+            data["bot"] = True
+            return structs.User(**data)
+        else:
+            return get_response
+
+    async def get_self_guilds(self, before="", after="", limit="100", use_cache=False, retstr=False) \
+            -> t.Union[str, t.List[structs.Guild], None]:
+        cache_key = ("self_guilds", str(before), str(after), str(limit))
+        get_response = self.entity_cache.get(cache_key) if use_cache else None
+        x_trace_id = None
+        if get_response is None:
+            response = await self._request("GET", self._self_guilds_url(before, after, limit))
+            get_response = response.text
+            x_trace_id = response.headers.get("X-Tps-trace-ID")
+            if response.status_code == 200:
+                self.entity_cache.set(cache_key, response.text)
+
+        return self._self_guilds_retter(get_response, x_trace_id, retstr)
+
+    async def iter_self_guilds(self, limit=100, after="", use_cache=False, prefetch=True) \
+            -> t.AsyncIterator[t.Union[dict, structs.Guild]]:
+        """
+        遍历Bot加入的所有频道, 自动按 after 翻页, 使用 async for 迭代
+        """
+        async def _fetch(cursor):
+            return self._parse_guild_page(await self.get_self_guilds(after=cursor, limit=limit, use_cache=use_cache,
+                                                                     retstr=True))
+
+        next_page: t.Optional[asyncio.Task] = None
+        try:
+            page = await _fetch(after)
+            while page:
+                has_more = len(page) >= int(limit)
+                if has_more and prefetch:
+                    next_page = asyncio.ensure_future(_fetch(page[-1]["id"]))
+
+                for guild in page:
+                    yield structs.Guild(**guild) if self.api_return_pydantic else guild
+
+                if not has_more:
+                    break
+                if next_page is not None:
+                    page = await next_page
+                    next_page = None
+                else:
+                    page = await _fetch(page[-1]["id"])
+        finally:
+            if next_page is not None and not next_page.done():
+                next_page.cancel()
+
+    async def api_get_guild_message_freq(self, guild_id, retstr=False) -> t.Union[str, None, structs.MessageSetting]:
+        """
+        获取频道消息频率设置
+        """
+        url = f"{self.base_api}/guilds/{guild_id}/message/setting"
+        response = await self._request("GET", url)
+        return self._retter(response, "获取频道消息频率设置失败", structs.MessageSetting, retstr, data_type=0)
+
+    async def api_send_message_guide(self, channel_id, content: str):
+        """
+        发送消息设置引导
+        """
+        url = f"{self.base_api}/channels/{channel_id}/settingguide"
+        data = {"content": content}
+        response = await self._request("POST", url, data=codec.dumps_bytes(data))
+        if not str(response.status_code).startswith("2"):
+            self._tlogger(f"发送消息设置引导失败: {response.text}", error=True, error_resp=response.text,
+                          traceid=response.headers.get("X-Tps-trace-ID"))
+        else:
+            return ""
+
+    async def _request_guild_role_member(self, guild_id, role_id, user_id, channel_id="", request_function="PUT"):
+        url = f"{self.base_api}/guilds/{guild_id}/members/{user_id}/roles/{role_id}"
+        body = {"channel": {"id": channel_id}} if channel_id != "" else None
+        response = await self._request(request_function, url, data=None if body is None else codec.dumps_bytes(body))
+        return self._empty_retter(response, f"{'增加' if request_function == 'PUT' else '删除'}频道身份组成员失败")
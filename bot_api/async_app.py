@@ -0,0 +1,134 @@
+import asyncio
+import typing as t
+from .sdk_main import BotApp
+from . import codec
+from .async_api import AsyncBotApi
+
+try:
+    import aiohttp
+except ImportError:  # 仅 AsyncBotApp 需要
+    aiohttp = None
+
+
+class AsyncBotApp(BotApp):
+    def __init__(self, *args, reconnect_delay=1.0, **kwargs):
+        """
+        基于 asyncio 的 BotAPP, 连接/心跳/鉴权/事件分发均在同一个事件循环中运行
+        事件注册方式与 BotApp 相同, 处理函数可以是 async def, 也可以是普通函数(交由 dispatcher 执行)
+        参数同 BotApp
+        :param reconnect_delay: 断线后重连前等待的秒数
+        """
+        super().__init__(*args, **kwargs)
+        self.reconnect_delay = reconnect_delay
+        # 异步API客户端, 在 async def 处理函数中使用: await bot.aio_api.api_send_message(...)
+        self.aio_api = AsyncBotApi.from_bot(self)
+        self._loop: t.Optional[asyncio.AbstractEventLoop] = None
+        self._aws = None  # aiohttp.ClientWebSocketResponse
+        self._heartbeat_task: t.Optional[asyncio.Task] = None
+        self._tasks: t.Set[asyncio.Task] = set()
+
+    def start(self):
+        asyncio.run(self.start_async())
+
+    async def start_async(self):
+        """
+        在当前事件循环中运行Bot, 可与其它协程共用一个事件循环
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncBotApp 需要安装 aiohttp: pip install aiohttp")
+
+        self._loop = asyncio.get_running_loop()
+        try:
+            await self._run_forever()
+        finally:
+            await self.aio_api.close()
+
+    async def _run_forever(self):
+        async with aiohttp.ClientSession() as session:
+            while True:
+                url = await self._loop.run_in_executor(None, self._get_websocket_url)
+                if url:
+                    try:
+                        async with session.ws_connect(url) as ws:
+                            self._aws = ws
+                            self._on_open()
+                            async for frame in ws:
+                                if frame.type == aiohttp.WSMsgType.TEXT:
+                                    self._on_message(ws, frame.data)
+                                elif frame.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
+                                    break
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as sb:
+                        self.logger(f"Error: {sb}", error=True)
+                    finally:
+                        self._stop_heartbeat()
+                        self._aws = None
+
+                    self.heartbeat_time = -1
+                    self.logger("连接断开, 尝试重连", warning=True)
+                await asyncio.sleep(self.reconnect_delay)
+
+    def _ws_send(self, data: dict):
+        if self._aws is not None and not self._aws.closed:
+            self._spawn(self._aws.send_str(codec.dumps(data)))
+
+    def _send_verify(self, body: dict):
+        if self._aws is None or self._aws.closed:
+            return
+        ws = self._aws
+
+        async def send():
+            await ws.send_str(codec.dumps(body))
+            if ws is self._aws:
+                self._verify_sent = True
+        self._spawn(send())
+
+    def _spawn(self, coro):
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _on_close(self, *args, active_close=False):
+        self.logger(f"on_close {args}", debug=True)
+        self.heartbeat_time = -1
+        self._verify_sent = False
+        self._stop_heartbeat()
+        if self._aws is not None and not self._aws.closed:
+            self._spawn(self._aws.close())
+        if active_close:
+            self.logger("连接已断开", warning=True)
+
+    def _handout_to(self, handlers: t.List[t.Callable], *args, **kwargs):
+        for f in handlers:
+            if asyncio.iscoroutinefunction(f):
+                self._spawn(self.dispatcher.run_async(f, args, kwargs))
+            else:  # 不能阻塞事件循环
+                self.dispatcher.submit_nowait(f, *args, **kwargs)
+
+    def send_heart_beat(self):
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = self._loop.create_task(self._heart_beat_loop())
+
+    def _stop_heartbeat(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+
+    async def _heart_beat_loop(self):
+        while self._aws is not None and not self._aws.closed:
+            if self.heartbeat_time != -1 and self._d is not None and self._verify_sent:
+                if self.heartbeat_monitor.check_zombie():
+                    self.logger("上一次心跳未收到ACK, 连接可能已失效, 尝试重连", warning=True)
+                    self._on_close()
+                    return
+                self.logger("发送心跳: %s", debug=True, args=(self._d,))
+                try:
+                    await self._aws.send_str(codec.dumps({"op": 1, "d": self._d}))
+                    self.heartbeat_monitor.on_send()
+                except ConnectionResetError:
+                    self.logger("发送心跳包失败", error=True)
+                    self._on_close()
+                    return
+                await asyncio.sleep(self.heartbeat_time)
+            else:
+                await asyncio.sleep(1)
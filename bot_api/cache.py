@@ -0,0 +1,66 @@
+import time
+import threading
+import typing as t
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, maxsize=4096, ttl=60.0):
+        """
+        线程安全的 TTL + LRU 缓存
+        :param maxsize: 最大条目数, 超出后淘汰最久未使用的条目
+        :param ttl: 过期秒数, 0为关闭缓存
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[t.Hashable, t.Tuple[float, t.Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: t.Hashable, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expire, value = item
+            if expire < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: t.Hashable, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: t.Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def discard_if(self, predicate: t.Callable[[t.Hashable], bool]):
+        """
+        删除所有 key 满足 predicate 的条目
+        """
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses}
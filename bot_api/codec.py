@@ -0,0 +1,84 @@
+import json
+import typing as t
+
+try:
+    import orjson
+except ImportError:  # 可选依赖, 安装后可通过 set_backend("orjson") 启用
+    orjson = None
+
+
+class JsonCodec:
+    name = "json"
+
+    @staticmethod
+    def dumps(obj) -> str:
+        return json.dumps(obj)
+
+    @staticmethod
+    def dumps_bytes(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    @staticmethod
+    def loads(data: t.Union[str, bytes, bytearray]):
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+
+    @staticmethod
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    @staticmethod
+    def dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    @staticmethod
+    def loads(data: t.Union[str, bytes, bytearray]):
+        return orjson.loads(data)
+
+
+_backends: t.Dict[str, t.Type[JsonCodec]] = {"json": JsonCodec, "orjson": OrjsonCodec}
+_codec: JsonCodec = JsonCodec()
+
+
+def set_backend(backend: t.Union[str, JsonCodec]):
+    """
+    切换全局使用的JSON编解码器
+    :param backend: "json"(标准库, 默认), "orjson"(需要安装 orjson), 或自定义的 JsonCodec 实例
+    """
+    global _codec
+    if isinstance(backend, JsonCodec):
+        _codec = backend
+        return
+    if backend not in _backends:
+        raise ValueError(f"未知的JSON后端: {backend}")
+    if backend == "orjson" and orjson is None:
+        raise ImportError("使用 orjson 后端需要安装 orjson: pip install orjson")
+    _codec = _backends[backend]()
+
+
+def get_backend() -> str:
+    return _codec.name
+
+
+def dumps(obj) -> str:
+    """
+    编码为文本, 用于网关等需要 str 的场景
+    """
+    return _codec.dumps(obj)
+
+
+def dumps_bytes(obj) -> bytes:
+    """
+    编码为 UTF-8 bytes, 用于HTTP请求体
+    """
+    return _codec.dumps_bytes(obj)
+
+
+def loads(data: t.Union[str, bytes, bytearray]):
+    """
+    解码 str 或 bytes, 解析失败时抛出 ValueError
+    """
+    return _codec.loads(data)
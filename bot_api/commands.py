@@ -0,0 +1,218 @@
+import re
+import typing as t
+from . import structs
+
+BCd = structs.Codes
+_MENTION = re.compile(r"^(?:\s*<@!?\d+>)+\s*")
+_META = set(".^$*+?{}[]\\|()")
+_QUANTIFIERS = set("*?{")
+_NUMBERED_REF = re.compile(r"(?<!\\)(?:\\\\)*(?:\\[1-9]|\(\?\(\d)")  # \1 等编号引用, 合并后编号会改变
+
+
+def _literal_prefix(compiled: t.Pattern) -> str:
+    """
+    正则开头的固定文本, 用于建立索引. 无法确定时返回空字符串
+    """
+    if compiled.flags & (re.IGNORECASE | re.VERBOSE):
+        return ""
+    source = compiled.pattern
+    if isinstance(source, bytes) or "|" in source:  # 存在分支时开头不固定
+        return ""
+    prefix = []
+    for ch in source:
+        if ch in _META:
+            if ch in _QUANTIFIERS and prefix:  # 量词作用于前一个字符, 该字符可能不出现
+                prefix.pop()
+            break
+        prefix.append(ch)
+    return "".join(prefix)
+
+
+def _fold(text: str) -> str:
+    """
+    逐字符转为小写, 与路由时逐字符匹配的结果一致(str.lower() 对部分字符依赖上下文)
+    """
+    return "".join(ch.lower() for ch in text)
+
+
+class _TrieNode:
+    __slots__ = ("children", "handler", "name", "patterns")
+
+    def __init__(self):
+        self.children: t.Dict[str, "_TrieNode"] = {}
+        self.handler: t.Optional[t.Callable] = None
+        self.name: t.Optional[str] = None
+        self.patterns: t.List[t.Tuple[int, t.Pattern, t.Callable]] = []  # 以该节点路径为固定前缀的正则
+
+
+class CommandRouter:
+    def __init__(self, bot=None, event_types: t.Iterable[str] = (BCd.SeverCode.AT_MESSAGE_CREATE,
+                                                                 BCd.SeverCode.DIRECT_MESSAGE_CREATE),
+                 strip_mention=True, case_sensitive=True):
+        """
+        命令路由, 每条消息只调用匹配到的一个处理函数, 路由耗时与命令数量基本无关
+        前缀命令使用前缀树匹配; 正则命令按其开头的固定文本放入前缀树, 没有固定开头的正则合并为一个正则匹配
+        :param bot: BotApp, 传入后自动注册为 event_types 事件的处理函数; 也可以之后调用 attach()
+        :param event_types: 需要路由的消息事件
+        :param strip_mention: 匹配前去掉消息开头的艾特
+        :param case_sensitive: 前缀命令是否区分大小写
+        """
+        self.strip_mention = strip_mention
+        self.case_sensitive = case_sensitive
+        self._root = _TrieNode()
+        self._pattern_root = _TrieNode()
+        self._pattern_count = 0
+        self._unindexed: t.List[t.Tuple[int, t.Pattern, t.Callable]] = []  # 没有固定开头的正则
+        self._separate: t.List[t.Tuple[int, t.Pattern, t.Callable]] = []  # 没有固定开头且含编号引用的正则
+        self._combined: t.Optional[t.Pattern] = None
+        self._combined_dirty = False
+        self._fallback: t.Optional[t.Callable] = None
+        self.event_types = tuple(event_types)
+        if bot is not None:
+            self.attach(bot)
+
+    def attach(self, bot):
+        """
+        注册到 bot, 收到消息时进行路由
+        """
+        for event_type in self.event_types:
+            bot.receiver(event_type)(self.dispatch)
+
+    def command(self, *names: str):
+        """
+        注册前缀命令, 可传入多个别名. 命令后需为空白或消息结尾
+        处理函数参数为 (event, args), args 为命令之后去掉首尾空白的文本
+        """
+        def reg(func: t.Callable):
+            for name in names:
+                node = self._root
+                for ch in (name if self.case_sensitive else _fold(name)):
+                    node = node.children.setdefault(ch, _TrieNode())
+                node.handler = func
+                node.name = name
+            return func
+        return reg
+
+    def pattern(self, regex: t.Union[str, t.Pattern], flags=0):
+        """
+        注册正则命令, 从消息开头匹配(re.match)
+        处理函数参数为 (event, *groups); 含命名分组时为 (event, **groupdict)
+        """
+        def reg(func: t.Callable):
+            compiled = re.compile(regex, flags)
+            entry = (self._pattern_count, compiled, func)
+            self._pattern_count += 1
+            prefix = _literal_prefix(compiled)
+            if prefix:
+                node = self._pattern_root
+                for ch in prefix:
+                    node = node.children.setdefault(ch, _TrieNode())
+                node.patterns.append(entry)
+            elif _NUMBERED_REF.search(compiled.pattern) is not None:  # 无法合并, 单独匹配
+                self._separate.append(entry)
+            else:
+                self._unindexed.append(entry)
+                self._combined_dirty = True  # 首次路由时再合并, 避免批量注册时重复编译
+            return func
+        return reg
+
+    def fallback(self, func: t.Callable):
+        """
+        注册未匹配到任何命令时调用的函数, 参数为 (event, text)
+        """
+        self._fallback = func
+        return func
+
+    def _combine(self) -> t.Optional[t.Pattern]:
+        parts = []
+        for i, (_, compiled, _) in enumerate(self._unindexed):
+            if compiled.flags & ~(re.UNICODE | re.ASCII):  # 带 flags 的正则无法安全合并
+                return None
+            parts.append(f"(?P<_cmd{i}>{compiled.pattern})")
+        try:
+            return re.compile("|".join(parts))
+        except re.error:  # 例如不同正则中存在同名分组
+            return None
+
+    def _match_prefix(self, text: str) -> t.Optional[t.Tuple[t.Callable, str]]:
+        node = self._root
+        found = None
+        for i, ch in enumerate(text):  # 按原文的位置切分参数, 转小写后长度可能改变
+            for key in (ch if self.case_sensitive else ch.lower()):
+                node = node.children.get(key)
+                if node is None:
+                    return found
+            if node.handler is not None and (i + 1 == len(text) or text[i + 1].isspace()):
+                found = (node.handler, text[i + 1:].strip())
+        return found
+
+    def _match_pattern(self, text: str) -> t.Optional[t.Tuple[t.Callable, t.Match]]:
+        """
+        按注册顺序返回第一个匹配的正则命令
+        """
+        candidates = []
+        node = self._pattern_root
+        for ch in text:
+            node = node.children.get(ch)
+            if node is None:
+                break
+            candidates.extend(node.patterns)
+        best = None
+        for order, compiled, func in sorted(candidates, key=lambda c: c[0]):
+            m = compiled.match(text)
+            if m is not None:
+                best = (order, func, m)
+                break
+
+        if self._unindexed:
+            if self._combined_dirty:
+                self._combined = self._combine()
+                self._combined_dirty = False
+            if self._combined is not None:
+                m = self._combined.match(text)
+                unindexed = [] if m is None else [self._unindexed[int(m.lastgroup[4:])]]
+            else:
+                unindexed = self._unindexed
+            for order, compiled, func in unindexed:
+                if best is not None and best[0] < order:
+                    break
+                m = compiled.match(text)
+                if m is not None:
+                    best = (order, func, m)
+                    break
+
+        for order, compiled, func in self._separate:
+            if best is not None and best[0] < order:
+                break
+            m = compiled.match(text)
+            if m is not None:
+                best = (order, func, m)
+                break
+        return None if best is None else (best[1], best[2])
+
+    def route(self, text: str) -> t.Optional[t.Tuple[t.Callable, tuple, dict]]:
+        """
+        :return: (处理函数, 位置参数, 关键字参数), 未匹配返回 None
+        """
+        if self.strip_mention:
+            text = _MENTION.sub("", text)
+        prefix = self._match_prefix(text)
+        if prefix is not None:
+            return prefix[0], (prefix[1],), {}
+        matched = self._match_pattern(text)
+        if matched is not None:
+            func, m = matched
+            return (func, (), m.groupdict()) if m.re.groupindex else (func, m.groups(), {})
+        if self._fallback is not None:
+            return self._fallback, (text,), {}
+        return None
+
+    def dispatch(self, event):
+        """
+        路由一条消息事件并调用匹配到的处理函数
+        """
+        routed = self.route(event.content or "")
+        if routed is None:
+            return None
+        func, args, kwargs = routed
+        return func(event, *args, **kwargs)
@@ -0,0 +1,235 @@
+import abc
+import os
+import queue
+import time
+import threading
+import traceback
+import typing as t
+from threading import Thread
+
+
+class DispatchMode:
+    THREAD = "thread"  # 每个事件处理函数启动一个新线程
+    POOL = "pool"  # 固定大小的线程池 + 有界队列
+
+
+class HandlerStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, cost: float, is_error: bool):
+        self.calls += 1
+        self.total_time += cost
+        if cost > self.max_time:
+            self.max_time = cost
+        if is_error:
+            self.errors += 1
+
+    def to_dict(self):
+        return {"calls": self.calls,
+                "errors": self.errors,
+                "avg_time": self.total_time / self.calls if self.calls else 0.0,
+                "max_time": self.max_time}
+
+
+class BaseDispatcher(abc.ABC):
+    def __init__(self, logger: t.Optional[t.Callable] = None):
+        """
+        事件分发器基类, 负责调用事件处理函数并统计耗时
+        :param logger: 日志函数, 签名同 BotLogger.logger
+        """
+        self._logger = logger
+        self._stats_lock = threading.Lock()
+        self._handler_stats: t.Dict[str, HandlerStats] = {}
+        self.submitted = 0
+        self.dropped = 0
+
+    @abc.abstractmethod
+    def submit(self, func: t.Callable, *args, **kwargs):
+        """
+        提交一次事件处理函数调用
+        """
+
+    def submit_nowait(self, func: t.Callable, *args, **kwargs):
+        """
+        同 submit, 但无论 put_timeout 如何设置都不会阻塞调用方, 用于在事件循环中提交
+        """
+        self.submit(func, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        pass
+
+    def _run(self, func: t.Callable, args, kwargs):
+        start = time.perf_counter()
+        is_error = False
+        try:
+            func(*args, **kwargs)
+        except Exception as sb:
+            is_error = True
+            if self._logger is not None:
+                self._logger(f"事件处理函数 {getattr(func, '__name__', func)} 出错: {sb}\n{traceback.format_exc()}",
+                             error=True)
+        finally:
+            self._record(func, time.perf_counter() - start, is_error)
+
+    async def run_async(self, func: t.Callable, args, kwargs):
+        """
+        在事件循环中执行 async def 处理函数, 同样计入统计
+        """
+        start = time.perf_counter()
+        is_error = False
+        try:
+            await func(*args, **kwargs)
+        except Exception as sb:
+            is_error = True
+            if self._logger is not None:
+                self._logger(f"事件处理函数 {getattr(func, '__name__', func)} 出错: {sb}\n{traceback.format_exc()}",
+                             error=True)
+        finally:
+            self._record(func, time.perf_counter() - start, is_error)
+
+    def _record(self, func: t.Callable, cost: float, is_error: bool):
+        name = getattr(func, "__qualname__", repr(func))
+        with self._stats_lock:
+            if name not in self._handler_stats:
+                self._handler_stats[name] = HandlerStats()
+            self._handler_stats[name].record(cost, is_error)
+
+    def get_stats(self) -> dict:
+        """
+        获取分发统计信息
+        :return: 提交/丢弃的任务数, 队列深度及每个处理函数的调用次数与耗时(秒)
+        """
+        with self._stats_lock:
+            handlers = {k: v.to_dict() for k, v in self._handler_stats.items()}
+        return {"submitted": self.submitted,
+                "dropped": self.dropped,
+                "queue_depth": 0,
+                "max_queue_depth": 0,
+                "handlers": handlers}
+
+
+class ThreadDispatcher(BaseDispatcher):
+    """
+    每次分发事件都启动一个新线程 (旧版行为)
+    """
+
+    def submit(self, func: t.Callable, *args, **kwargs):
+        with self._stats_lock:
+            self.submitted += 1
+        _t = Thread(target=self._run, args=(func, args, kwargs))
+        _t.start()
+
+
+class PoolDispatcher(BaseDispatcher):
+    def __init__(self, workers=8, queue_size=1000, put_timeout: t.Optional[float] = 0,
+                 logger: t.Optional[t.Callable] = None):
+        """
+        线程池事件分发器
+        :param workers: 工作线程数
+        :param queue_size: 等待队列长度上限, 0为不限制
+        :param put_timeout: 队列已满时, 等待的最长秒数, 超时后丢弃该事件. 0为不等待直接丢弃, None为一直等待
+                            submit 在网关连接线程中调用, 等待期间无法处理心跳ACK等消息, 一般不建议等待
+        :param logger: 日志函数
+        """
+        super().__init__(logger=logger)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads: t.List[Thread] = []
+        self._pid = None  # fork后需要在子进程内重新启动工作线程
+        self._start_lock = threading.Lock()
+        self.max_queue_depth = 0
+        self.total_wait_time = 0.0
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._threads = []
+            for i in range(self.workers):
+                _t = Thread(target=self._worker, name=f"bot-dispatch-{i}", daemon=True)
+                _t.start()
+                self._threads.append(_t)
+            self._pid = os.getpid()
+
+    def _worker(self):
+        _q = self._queue
+        while True:
+            task = _q.get()
+            if task is None:
+                break
+            func, args, kwargs, put_time = task
+            with self._stats_lock:
+                self.total_wait_time += time.perf_counter() - put_time
+            self._run(func, args, kwargs)
+
+    def submit(self, func: t.Callable, *args, **kwargs):
+        self._put(func, args, kwargs, self.put_timeout)
+
+    def submit_nowait(self, func: t.Callable, *args, **kwargs):
+        self._put(func, args, kwargs, 0)
+
+    def _put(self, func: t.Callable, args, kwargs, timeout: t.Optional[float]):
+        self._ensure_started()
+        task = (func, args, kwargs, time.perf_counter())
+        try:
+            if timeout == 0:
+                self._queue.put_nowait(task)
+            else:
+                self._queue.put(task, timeout=timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            if self._logger is not None:
+                self._logger(f"事件队列已满, 丢弃事件: {getattr(func, '__name__', func)}", warning=True)
+            return
+
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self.submitted += 1
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+
+    def shutdown(self, wait=True):
+        if self._pid != os.getpid():
+            return
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for _t in self._threads:
+                _t.join()
+        self._pid = None
+
+    def get_stats(self) -> dict:
+        ret = super().get_stats()
+        ret["queue_depth"] = self._queue.qsize()
+        ret["max_queue_depth"] = self.max_queue_depth
+        ret["workers"] = self.workers
+        ret["avg_wait_time"] = self.total_wait_time / self.submitted if self.submitted else 0.0
+        return ret
+
+
+def create_dispatcher(mode: str, workers=8, queue_size=1000, put_timeout: t.Optional[float] = 0,
+                      logger: t.Optional[t.Callable] = None) -> BaseDispatcher:
+    """
+    创建事件分发器
+    :param mode: 分发模式, 见 DispatchMode
+    :param workers: 线程池大小(仅pool模式)
+    :param queue_size: 队列长度上限(仅pool模式)
+    :param put_timeout: 队列已满时等待的最长秒数, 0为直接丢弃(仅pool模式)
+    :param logger: 日志函数
+    """
+    if mode == DispatchMode.POOL:
+        return PoolDispatcher(workers=workers, queue_size=queue_size, put_timeout=put_timeout, logger=logger)
+    elif mode == DispatchMode.THREAD:
+        return ThreadDispatcher(logger=logger)
+    else:
+        raise ValueError(f"未知的事件分发模式: {mode}")
@@ -0,0 +1,133 @@
+import re
+import typing as t
+
+_Values = t.Union[str, int, t.Iterable[t.Union[str, int]], None]
+
+
+def _as_set(value: _Values) -> t.Optional[t.FrozenSet[str]]:
+    if value is None:
+        return None
+    if isinstance(value, (str, int)):
+        return frozenset((str(value),))
+    return frozenset(str(v) for v in value)
+
+
+class EventFilter:
+    __slots__ = ("guild_ids", "channel_ids", "author_ids", "prefixes", "regex")
+
+    def __init__(self, guild_id: _Values = None, channel_id: _Values = None, author_id: _Values = None,
+                 prefix: t.Union[str, t.Iterable[str], None] = None, regex: t.Union[str, t.Pattern, None] = None):
+        """
+        事件过滤条件, 在构造事件对象之前直接匹配原始数据. 各条件之间为"与", 同一条件的多个值之间为"或"
+        :param guild_id: 频道ID, 可为列表
+        :param channel_id: 子频道ID, 可为列表
+        :param author_id: 发送者/成员ID, 可为列表
+        :param prefix: 消息内容前缀, 可为列表
+        :param regex: 消息内容正则(search)
+        """
+        self.guild_ids = _as_set(guild_id)
+        self.channel_ids = _as_set(channel_id)
+        self.author_ids = _as_set(author_id)
+        self.prefixes = None if prefix is None else ((prefix,) if isinstance(prefix, str) else tuple(prefix))
+        self.regex = None if regex is None else re.compile(regex)
+
+    def is_empty(self) -> bool:
+        return self.guild_ids is None and self.channel_ids is None and self.author_ids is None and \
+            self.prefixes is None and self.regex is None
+
+    def has_content_filter(self) -> bool:
+        return self.prefixes is not None or self.regex is not None
+
+    def match_content(self, content: str) -> bool:
+        if self.prefixes is not None and not content.startswith(self.prefixes):
+            return False
+        if self.regex is not None and self.regex.search(content) is None:
+            return False
+        return True
+
+    def match(self, data: dict) -> bool:
+        if self.guild_ids is not None and str(data.get("guild_id")) not in self.guild_ids:
+            return False
+        if self.channel_ids is not None and str(data.get("channel_id")) not in self.channel_ids:
+            return False
+        if self.author_ids is not None and _author_id(data) not in self.author_ids:
+            return False
+        if self.has_content_filter():
+            return self.match_content(data.get("content") or "")
+        return True
+
+
+def _author_id(data: dict) -> str:
+    author = data.get("author") or data.get("user") or {}
+    return str(author.get("id"))
+
+
+class FilterIndex:
+    _KEYS = ("guild_ids", "channel_ids", "author_ids")
+
+    def __init__(self):
+        """
+        同一事件类型下所有处理函数的过滤条件索引, 在注册时建立
+        guild_id, channel_id, author_id 按值索引到处理函数序号, 匹配事件时取各条件候选集合的交集;
+        前缀与正则只对候选处理函数检查
+        """
+        self.filters: t.List[t.Optional[EventFilter]] = []  # 与处理函数一一对应
+        self._keyed: t.Dict[str, t.Dict[str, t.Set[int]]] = {key: {} for key in self._KEYS}  # 条件值 -> 处理函数序号
+        self._free: t.Dict[str, t.Set[int]] = {key: set() for key in self._KEYS}  # 未设置该条件的处理函数序号
+        self._content: t.Dict[int, EventFilter] = {}  # 设置了前缀/正则的处理函数序号
+        self._filtered = False
+
+    def add(self, event_filter: t.Optional[EventFilter]) -> int:
+        """
+        添加一个处理函数的过滤条件
+        :return: 处理函数序号
+        """
+        if event_filter is not None and event_filter.is_empty():
+            event_filter = None
+        index = len(self.filters)
+        self.filters.append(event_filter)
+        for key in self._KEYS:
+            values = None if event_filter is None else getattr(event_filter, key)
+            if values is None:
+                self._free[key].add(index)
+                continue
+            keyed = self._keyed[key]
+            for value in values:
+                keyed.setdefault(value, set()).add(index)
+        if event_filter is not None:
+            self._filtered = True
+            if event_filter.has_content_filter():
+                self._content[index] = event_filter
+        return index
+
+    @staticmethod
+    def _value(key: str, data: dict) -> str:
+        if key == "guild_ids":
+            return str(data.get("guild_id"))
+        if key == "channel_ids":
+            return str(data.get("channel_id"))
+        return _author_id(data)
+
+    def select(self, data: dict) -> t.Optional[t.List[int]]:
+        """
+        :return: 满足过滤条件的处理函数序号(按注册顺序); 没有任何过滤条件时返回 None, 即全部处理函数
+        """
+        if not self._filtered:
+            return None
+        candidates: t.Optional[t.Set[int]] = None
+        for key in self._KEYS:
+            keyed = self._keyed[key]
+            if not keyed:  # 没有处理函数设置该条件
+                continue
+            matched = keyed.get(self._value(key, data))
+            matched = self._free[key] if matched is None else matched | self._free[key]
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return []
+        if candidates is None:
+            candidates = range(len(self.filters))
+        if not self._content:
+            return sorted(candidates)
+        content = data.get("content") or ""
+        content_filters = self._content
+        return [i for i in sorted(candidates) if i not in content_filters or content_filters[i].match_content(content)]
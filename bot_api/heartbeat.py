@@ -0,0 +1,88 @@
+import time
+import threading
+import typing as t
+from collections import deque
+
+
+class HeartbeatMonitor:
+    def __init__(self, max_samples=1000):
+        """
+        心跳状态记录: 发送/ACK时间, 往返延迟, 未收到ACK的次数
+        :param max_samples: 保留的延迟样本数量
+        """
+        self._lock = threading.Lock()
+        self._samples: t.Deque[float] = deque(maxlen=max_samples)
+        self.last_send_time: t.Optional[float] = None
+        self.last_ack_time: t.Optional[float] = None
+        self.ack_pending = False  # 已发送心跳, 尚未收到ACK
+        self.missed = 0  # 未收到ACK的次数(僵尸连接)
+
+    def reset(self):
+        """
+        新连接建立时调用, 清除未完成的心跳
+        """
+        with self._lock:
+            self.ack_pending = False
+            self.last_send_time = None
+
+    def on_send(self):
+        with self._lock:
+            self.last_send_time = time.perf_counter()
+            self.ack_pending = True
+
+    def on_ack(self) -> t.Optional[float]:
+        """
+        收到 Heartbeat_Ack
+        :return: 本次心跳往返延迟(秒), 若没有对应的心跳则返回None
+        """
+        with self._lock:
+            self.last_ack_time = time.perf_counter()
+            if not self.ack_pending or self.last_send_time is None:
+                return None
+            self.ack_pending = False
+            rtt = self.last_ack_time - self.last_send_time
+            self._samples.append(rtt)
+            return rtt
+
+    def check_zombie(self) -> bool:
+        """
+        发送下一次心跳前调用, 上一次心跳未收到ACK即视为僵尸连接
+        """
+        with self._lock:
+            if self.ack_pending:
+                self.missed += 1
+                self.ack_pending = False
+                return True
+            return False
+
+    def get_latency(self) -> dict:
+        """
+        获取心跳延迟(秒)
+        :return: last-最近一次; avg-平均值; p99-99分位; count-样本数; missed-未收到ACK次数
+        """
+        return merge_latency([self])
+
+
+def merge_latency(monitors: t.Iterable[HeartbeatMonitor]) -> dict:
+    """
+    合并多个连接(如各分片)的心跳延迟统计, 返回值同 HeartbeatMonitor.get_latency
+    """
+    samples = []
+    last = None
+    last_ack_time = None
+    missed = 0
+    for monitor in monitors:
+        with monitor._lock:
+            samples.extend(monitor._samples)
+            if monitor._samples and (last_ack_time is None or monitor.last_ack_time > last_ack_time):
+                last, last_ack_time = monitor._samples[-1], monitor.last_ack_time
+            missed += monitor.missed
+    if not samples:
+        return {"last": None, "avg": None, "p99": None, "count": 0, "missed": missed}
+    samples.sort()
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return {"last": last,
+            "avg": sum(samples) / len(samples),
+            "p99": p99,
+            "count": len(samples),
+            "missed": missed}
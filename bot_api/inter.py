@@ -1,16 +1,17 @@
 from . import structs
-from typing import Callable, List, Dict
+from typing import Callable, List, Dict, Optional
 from . import api
+from . import filters
 
 BCd = structs.Codes
 
 class BotMessageDistributor(api.BotApi):
     def __init__(self, appid: int, token: str, secret: str, sandbox: bool, debug=False, api_return_pydantic=False,
-                 output_log=True, log_path="", raise_api_error=False):
+                 output_log=True, log_path="", raise_api_error=False, http_pool_size=16, http_timeout=(5, 30)):
         self.debug = debug
         super().__init__(appid=appid, token=token, secret=secret, debug=debug, sandbox=sandbox,
                          api_return_pydantic=api_return_pydantic, output_log=output_log, log_path=log_path,
-                         raise_api_error=raise_api_error)
+                         raise_api_error=raise_api_error, http_pool_size=http_pool_size, http_timeout=http_timeout)
 
         self.known_events = {BCd.SeverCode.BotGroupAtMessage: ["群艾特消息", structs.Message],
                              BCd.SeverCode.AT_MESSAGE_CREATE: ["群艾特消息", structs.Message],
@@ -40,19 +41,37 @@ class BotMessageDistributor(api.BotApi):
                              }
 
         self.bot_events: Dict[str, List] = {}
+        self.bot_event_filters: Dict[str, filters.FilterIndex] = {}  # 各事件处理函数的过滤条件索引, 与 bot_events 一一对应
+        self.middlewares: List[Callable[[str, dict], Optional[bool]]] = []
 
         self.img_to_url = None  # 图片转为url
 
         self.modules = {}  # 模块注册
 
-    def receiver(self, reg_type: str, reg_name=""):
+    def receiver(self, reg_type: str, reg_name="", guild_id=None, channel_id=None, author_id=None, prefix=None,
+                 regex=None):
+        """
+        注册事件处理函数
+        :param reg_type: 事件代号
+        :param reg_name: 模块名, 仅注册模块时使用
+        以下为可选的过滤条件, 不满足条件的事件不会调用该函数, 也不会为其构造事件对象. 详见 filters.EventFilter
+        :param guild_id: 频道ID, 可为列表
+        :param channel_id: 子频道ID, 可为列表
+        :param author_id: 发送者/成员ID, 可为列表
+        :param prefix: 消息内容前缀, 可为列表
+        :param regex: 消息内容正则
+        """
         self.logger(f"注册函数: {reg_type} {reg_name}", debug=True)
+        event_filter = filters.EventFilter(guild_id=guild_id, channel_id=channel_id, author_id=author_id,
+                                           prefix=prefix, regex=regex)
 
         def reg(func: Callable):
             def _adder(event_type, event_name):
                 if event_type not in self.bot_events:
                     self.bot_events[event_type] = []
+                    self.bot_event_filters[event_type] = filters.FilterIndex()
                 self.bot_events[event_type].append(func)
+                self.bot_event_filters[event_type].add(event_filter)
                 self.logger(f"函数: {func.__name__} 注册到事件: {event_name}", debug=True)
 
             if reg_type in self.known_events:
@@ -70,5 +89,35 @@ class BotMessageDistributor(api.BotApi):
 
         return reg
 
+    def middleware(self, func: Callable[[str, dict], Optional[bool]]):
+        """
+        注册中间件, 在构造事件对象与分发之前, 按注册顺序处理原始事件数据
+        中间件参数为 (事件代号, 原始数据dict), 可直接修改原始数据; 返回 False 则丢弃该事件
+        """
+        self.middlewares.append(func)
+        return func
+
+    def _run_middlewares(self, event_type: str, data: dict) -> bool:
+        for func in self.middlewares:
+            try:
+                if func(event_type, data) is False:
+                    return False
+            except Exception as sb:
+                self.logger(f"中间件 {getattr(func, '__name__', func)} 出错, 丢弃事件 {event_type}: {sb!r}", error=True)
+                return False
+        return True
+
+    def _select_handlers(self, event_type: str, data: dict) -> List[Callable]:
+        """
+        根据过滤条件选出需要调用的处理函数
+        """
+        funcs = self.bot_events.get(event_type)
+        if not funcs:
+            return []
+        selected = self.bot_event_filters[event_type].select(data)
+        if selected is None:
+            return funcs
+        return [funcs[i] for i in selected]
+
     def call_module(self, module, *args, **kwargs):  # 调用模块
         return self.modules[module](*args, **kwargs)
@@ -0,0 +1,182 @@
+import copy
+import threading
+import typing as t
+from pydantic import BaseModel, ValidationError
+
+try:
+    from pydantic import TypeAdapter  # pydantic v2
+except ImportError:
+    TypeAdapter = None
+
+_SCALARS = (str, int, float, bool)
+_field_cache: t.Dict[type, "_ModelInfo"] = {}
+_field_lock = threading.Lock()
+
+
+class _ModelInfo:
+    __slots__ = ("fields", "required", "scalars", "adapters")
+
+    def __init__(self, model: t.Type[BaseModel]):
+        declared = getattr(model, "model_fields", None) or getattr(model, "__fields__", {})
+        self.fields = dict(declared)
+        self.required = frozenset(name for name, info in declared.items() if self._is_required(info))
+        self.scalars = {}  # 字段名 -> 标量类型, 原始值已是该类型时无需校验
+        for name, info in declared.items():
+            tp = self._scalar_type(getattr(info, "annotation", None) or getattr(info, "outer_type_", None))
+            if tp is not None:
+                self.scalars[name] = tp
+        self.adapters = {}
+
+    @staticmethod
+    def _is_required(info) -> bool:
+        is_required = getattr(info, "is_required", None)  # pydantic v2
+        if callable(is_required):
+            return is_required()
+        return bool(info.required)
+
+    @staticmethod
+    def _scalar_type(tp) -> t.Optional[type]:
+        if t.get_origin(tp) is t.Union:
+            args = [a for a in t.get_args(tp) if a is not type(None)]
+            tp = args[0] if len(args) == 1 else None
+        return tp if tp in _SCALARS else None
+
+
+def _model_info(model: t.Type[BaseModel]) -> _ModelInfo:
+    info = _field_cache.get(model)
+    if info is None:
+        info = _ModelInfo(model)
+        with _field_lock:
+            _field_cache[model] = info
+    return info
+
+
+def _validate(model: t.Type[BaseModel], info: _ModelInfo, name: str, value):
+    """
+    按 model 的字段定义校验/转换单个字段, 结果与构造完整 model 时相同
+    """
+    if value is not None and type(value) is info.scalars.get(name):
+        return value
+    field = info.fields[name]
+    if TypeAdapter is not None and hasattr(field, "annotation"):  # pydantic v2
+        adapter = info.adapters.get(name)
+        if adapter is None:
+            adapter = info.adapters[name] = TypeAdapter(field.annotation)
+        return adapter.validate_python(value)
+    value, errors = field.validate(value, {}, loc=name, cls=model)
+    if errors:
+        raise ValidationError([errors], model)
+    return value
+
+
+def _default(info: _ModelInfo, name: str):
+    field = info.fields[name]
+    if hasattr(field, "get_default"):
+        try:
+            return field.get_default(call_default_factory=True)  # pydantic v2
+        except TypeError:
+            return field.get_default()
+    return field.default
+
+
+def _restore(model: t.Type[BaseModel], raw: dict) -> "LazyModel":
+    return LazyModel(model, raw)
+
+
+class LazyModel:
+    __slots__ = ("_model", "_raw", "_values", "_writes", "_full", "_lock")
+
+    def __init__(self, model: t.Type[BaseModel], raw: dict):
+        """
+        事件对象的惰性视图, 属性与 model 相同
+        字段在首次访问时才按 model 的定义校验(嵌套对象如 author, member 同理), 结果会被缓存
+        访问 dict(), json() 等 model 的其它方法时才会构造完整的 model, 且只构造一次
+        同一事件的所有处理函数共用一个对象, 可在多个线程中同时访问
+        缺少必填字段时与直接构造 model 一样抛出 ValidationError
+        :param model: pydantic model
+        :param raw: 事件原始数据, 不会被修改
+        """
+        object.__setattr__(self, "_model", model)
+        object.__setattr__(self, "_raw", raw)
+        object.__setattr__(self, "_values", {})  # 已读取并校验的字段
+        object.__setattr__(self, "_writes", {})  # 处理函数赋值的字段
+        object.__setattr__(self, "_full", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+        if not _model_info(model).required <= raw.keys():
+            self.to_model()
+
+    def __getattr__(self, name):
+        if name in LazyModel.__slots__:  # copy/pickle 创建的未初始化对象
+            raise AttributeError(name)
+        if name.startswith("__"):  # 类属性, 如 isinstance() 时 pydantic 读取的 __post_root_validators__
+            return getattr(self._model, name)
+        values = self._values
+        if name in values:
+            return values[name]
+        info = _model_info(self._model)
+        if name not in info.fields:
+            return getattr(self.to_model(), name)
+        with self._lock:  # 每个字段只校验一次, 且各线程得到同一个对象
+            if name in values:
+                return values[name]
+            if self._full is not None:
+                value = getattr(self._full, name)
+            elif name in self._raw:
+                value = _validate(self._model, info, name, self._raw[name])
+            else:
+                value = _default(info, name)
+            values[name] = value
+        return value
+
+    def __setattr__(self, name, value):
+        with self._lock:
+            self._writes[name] = value
+            self._values[name] = value
+            if self._full is not None:
+                setattr(self._full, name, value)
+
+    def to_model(self) -> BaseModel:
+        """
+        获取完整校验后的 pydantic model
+        """
+        if self._full is None:
+            with self._lock:
+                if self._full is None:
+                    full = self._model(**self._raw)
+                    for name, value in self._writes.items():
+                        setattr(full, name, value)
+                    object.__setattr__(self, "_full", full)
+        return self._full
+
+    def __getstate__(self):
+        with self._lock:
+            return {"writes": dict(self._writes)}
+
+    def __setstate__(self, state):
+        for name, value in state["writes"].items():
+            self.__setattr__(name, value)
+
+    def __reduce__(self):
+        return _restore, (self._model, self._raw), self.__getstate__()
+
+    def __copy__(self):
+        ret = LazyModel(self._model, self._raw)
+        ret.__setstate__(self.__getstate__())
+        return ret
+
+    def __deepcopy__(self, memo):
+        ret = LazyModel(self._model, copy.deepcopy(self._raw, memo))
+        ret.__setstate__(copy.deepcopy(self.__getstate__(), memo))
+        return ret
+
+    @property
+    def __class__(self):  # isinstance(event, structs.Message) 仍然成立
+        return self._model
+
+    def __eq__(self, other):
+        if isinstance(other, LazyModel):
+            other = other.to_model()
+        return self.to_model() == other
+
+    def __repr__(self):
+        return f"Lazy{self.to_model()!r}"
@@ -1,4 +1,9 @@
 import time
+import atexit
+import queue
+import threading
+import typing as t
+import multiprocessing.util
 from colorama import init
 import os
 
@@ -53,34 +58,199 @@ class BGColor:
     LIGHTWHITE_EX = 107
 
 
+class LogWriter:
+    def __init__(self, log_path: str, flush_interval=0.5, max_batch=512, queue_size=100000):
+        """
+        后台日志写入线程: 控制台输出与日志文件写入均在该线程完成, 调用方只负责入队
+        日志文件句柄保持打开, 按日期切换文件, 每批日志写入后统一 flush
+        :param log_path: 日志文件夹
+        :param flush_interval: 无新日志时的最长等待秒数
+        :param max_batch: 单次写入的最大条数
+        :param queue_size: 队列长度上限, 队列已满时直接在调用方线程输出
+        """
+        self.log_path = log_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.queue_size = queue_size
+        self._queue: "queue.Queue[t.Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._file_day = ""
+        self._thread: t.Optional[threading.Thread] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.dropped = 0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None:  # fork 后的子进程, 父进程的线程与队列不可用
+                self._queue = queue.Queue(maxsize=self.queue_size)
+                self._write_lock = threading.Lock()
+                self._file = None
+                self._file_day = ""
+                # multiprocessing 子进程退出时不执行 atexit
+                multiprocessing.util.Finalize(self, self.flush, exitpriority=10)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="bot-log-writer", daemon=True)
+            self._thread.start()
+
+    def put(self, console: t.Optional[str], line: t.Optional[str], day: str):
+        """
+        :param console: 输出到控制台的内容(已包含颜色代码), None为不输出
+        :param line: 写入日志文件的内容, None为不写入
+        :param day: 日志文件名(日期)
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((console, line, day))
+        except queue.Full:
+            self.dropped += 1
+            self._write_batch([(console, line, day)])
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = []
+            stop = False
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                stop = True
+            self._write_batch(batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, batch: t.List[tuple]):
+        with self._write_lock:
+            console = [c for c, _, _ in batch if c is not None]
+            if console:
+                print("\n".join(console))
+            for _, line, day in batch:
+                if line is None:
+                    continue
+                try:
+                    self._get_file(day).write(f"{line}\n")
+                except OSError as sb:
+                    print(f"写入日志失败: {sb}")
+            if self._file is not None:
+                self._file.flush()
+
+    def _get_file(self, day: str):
+        if self._file is None or self._file_day != day:
+            if self._file is not None:
+                self._file.close()
+            os.makedirs(self.log_path, exist_ok=True)
+            self._file = open(f"{self.log_path}/{day}.log", "a", encoding="utf8")
+            self._file_day = day
+        return self._file
+
+    def flush(self, timeout=5.0):
+        """
+        等待队列中的日志全部写入
+        """
+        if self._thread is None or self._pid != os.getpid():
+            return
+        end = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < end:
+            time.sleep(0.01)
+
+    def close(self, timeout=5.0):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._thread = None
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_writers: t.Dict[str, LogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_log_writer(log_path: str) -> LogWriter:
+    """
+    同一日志文件夹共用一个写入线程
+    """
+    writer = _writers.get(log_path)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.setdefault(log_path, LogWriter(log_path))
+    return writer
+
+
+@atexit.register
+def flush_logs():
+    """
+    写入所有尚未写入的日志, 程序退出时自动调用
+    """
+    for writer in list(_writers.values()):
+        writer.flush()
+
+
 class BotLogger:
     def __init__(self, debug: bool, write_out_log=True, log_path=""):
         self.debug = debug
         self.write_out_log = write_out_log
         self._log_path = f"{os.path.split(__file__)[0]}/log" if log_path == "" else log_path
-        self.logger(f"log路径为: {self._log_path}")
+        opened = self._log_path in _writers
+        self._log_writer = get_log_writer(self._log_path)
+        if not opened:  # 同一日志文件夹只提示一次, 如 AsyncBotApi.from_bot
+            self.logger(f"log路径为: {self._log_path}")
 
-    def logger(self, msg, debug=False, warning=False, error=False):
+    def logger(self, msg, debug=False, warning=False, error=False, args: tuple = (), **fields):
+        """
+        输出日志. 未开启debug时, debug日志在格式化之前直接返回
+        :param msg: 日志内容; 也可以是无参数的函数, 仅在需要输出时调用
+        :param debug: debug日志, 与 warning, error 保持原有的位置参数顺序, 如 logger("x", True)
+        :param args: 格式化参数元组, 传入时以 msg % args 生成日志内容, 如 logger("延迟: %s", debug=True, args=(rtt,))
+        :param fields: 结构化字段, 以 key=value 的形式附加在日志末尾
+        """
+        if not self._log_enabled(debug, warning, error):
+            return
+        msg = self._format_log(msg, args, fields)
         _tm = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        _day = _tm[:10]
         if error:
-            self._printout(f"[{_tm}][ERROR] {msg}", Color.RED)
+            self._printout(f"[{_tm}][ERROR] {msg}", Color.RED, day=_day)
         elif warning:
-            self._printout(f"[{_tm}][WARNING] {msg}", Color.LIGHTYELLOW_EX)
-        elif debug and self.debug:
-            self._printout(f"[{_tm}][DEBUG] {msg}", Color.BLUE)
-        elif not debug:
-            self._printout(f"[{_tm}][INFO] {msg}")
-
-    def _printout(self, content, color=Color.DEFAULT, bgcolor=BGColor.DEFAULT, style=Style.DEFAULT):
-        print("\033[{};{};{}m{}\033[0m".format(style, color, bgcolor, content))
-        if self.write_out_log:
-            self._write_log(content)
-
-    def _write_log(self, content):
-        _tm = time.strftime("%Y-%m-%d", time.localtime())
-        try:
-            with open(f"{self._log_path}/{_tm}.log", "a", encoding="utf8") as f:
-                f.write(f"{content}\n")
-        except FileNotFoundError:
-            os.makedirs(f"{self._log_path}")
-            self.logger("未找到log文件夹, 尝试重新创建", warning=True)
+            self._printout(f"[{_tm}][WARNING] {msg}", Color.LIGHTYELLOW_EX, day=_day)
+        elif debug:
+            self._printout(f"[{_tm}][DEBUG] {msg}", Color.BLUE, day=_day)
+        else:
+            self._printout(f"[{_tm}][INFO] {msg}", day=_day)
+
+    def _log_enabled(self, debug=False, warning=False, error=False) -> bool:
+        return error or warning or not debug or self.debug
+
+    @staticmethod
+    def _format_log(msg, args: tuple, fields: dict) -> str:
+        if callable(msg):
+            msg = msg()
+        if args:
+            msg = msg % args
+        if fields:
+            msg = f"{msg} " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return msg
+
+    def _printout(self, content, color=Color.DEFAULT, bgcolor=BGColor.DEFAULT, style=Style.DEFAULT, day=None):
+        if day is None:
+            day = time.strftime("%Y-%m-%d", time.localtime())
+        self._log_writer.put("\033[{};{};{}m{}\033[0m".format(style, color, bgcolor, content),
+                             content if self.write_out_log else None, day)
@@ -1,12 +1,12 @@
 import typing as t
-import json
+from . import codec
 
 
 class BotCallingAPIError(Exception):
     def __init__(self, error_response: str, error_message="", x_tps_trace_id=None):
         try:
-            data = json.loads(error_response)
-        except json.JSONDecodeError:
+            data = codec.loads(error_response)
+        except ValueError:
             data = {}
 
         self.error_response = error_response
@@ -0,0 +1,120 @@
+import time
+import threading
+import typing as t
+from collections import deque
+from concurrent.futures import Future
+
+_MERGE_BLOCKERS = ("image_url", "embed", "ark", "others_parameter")
+
+
+class _Outgoing:
+    def __init__(self, kwargs: dict):
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class OutboundQueue:
+    def __init__(self, send_func: t.Callable[..., t.Any], flush_interval=0.0, merge_text=False,
+                 max_merge_length=2000, merge_separator="\n"):
+        """
+        按子频道区分的发送队列: 同一子频道的消息严格按提交顺序逐条发送, 不同子频道之间并行
+        :param send_func: 实际发送消息的函数, 参数同 BotApi._api_send_message
+        :param flush_interval: 每次发送前等待的秒数, 用于收集更多可合并的消息
+        :param merge_text: 合并连续的纯文本消息(相同子频道, 相同回复目标)为一条
+        :param max_merge_length: 合并后消息内容的最大长度
+        :param merge_separator: 合并消息时的分隔符
+        """
+        self.enabled = False  # 为 True 时 api_send_message/api_reply_message 默认进入队列
+        self.send_func = send_func
+        self.flush_interval = flush_interval
+        self.merge_text = merge_text
+        self.max_merge_length = max_merge_length
+        self.merge_separator = merge_separator
+        self._queues: t.Dict[t.Hashable, t.Deque[_Outgoing]] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self.submitted = 0
+        self.sent = 0
+        self.merged = 0
+
+    def submit(self, key: t.Hashable, **kwargs) -> Future:
+        """
+        :param key: 队列key, 如 ("channel", 子频道ID)
+        :param kwargs: 传给 send_func 的参数
+        :return: Future, 结果为 send_func 的返回值. 被合并的消息共享同一个结果
+        """
+        item = _Outgoing(kwargs)
+        with self._lock:
+            self.submitted += 1
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = deque()
+                threading.Thread(target=self._drain, args=(key,), name=f"bot-outbox-{key}", daemon=True).start()
+            queue.append(item)
+        return item.future
+
+    def _drain(self, key: t.Hashable):
+        while True:
+            if self.flush_interval > 0:
+                time.sleep(self.flush_interval)
+            with self._lock:
+                queue = self._queues[key]
+                if not queue:
+                    del self._queues[key]
+                    self._idle.notify_all()
+                    return
+                batch = self._take_batch(queue)
+
+            kwargs = dict(batch[0].kwargs)
+            if len(batch) > 1:
+                kwargs["content"] = self.merge_separator.join(i.kwargs["content"] for i in batch)
+            try:
+                result = self.send_func(**kwargs)
+            except BaseException as sb:
+                for i in batch:
+                    i.future.set_exception(sb)
+            else:
+                for i in batch:
+                    i.future.set_result(result)
+            with self._lock:
+                self.sent += 1
+                self.merged += len(batch) - 1
+
+    def _take_batch(self, queue: t.Deque[_Outgoing]) -> t.List[_Outgoing]:
+        batch = [queue.popleft()]
+        if not self.merge_text or not self._is_plain_text(batch[0].kwargs):
+            return batch
+        merge_key = self._merge_key(batch[0].kwargs)
+        length = len(batch[0].kwargs["content"])
+        while queue and self._is_plain_text(queue[0].kwargs) and self._merge_key(queue[0].kwargs) == merge_key:
+            length += len(self.merge_separator) + len(queue[0].kwargs["content"])
+            if length > self.max_merge_length:
+                break
+            batch.append(queue.popleft())
+        return batch
+
+    @staticmethod
+    def _is_plain_text(kwargs: dict) -> bool:
+        return bool(kwargs.get("content")) and not kwargs.get("is_markdown") and \
+            all(kwargs.get(k) in (None, "") for k in _MERGE_BLOCKERS)
+
+    @staticmethod
+    def _merge_key(kwargs: dict) -> tuple:
+        return tuple(kwargs.get(k) for k in ("channel_id", "guild_id", "msg_id", "message_reference_type",
+                                             "message_reference_id", "retstr"))
+
+    def flush(self, timeout: t.Optional[float] = None) -> bool:
+        """
+        等待所有队列发送完毕
+        :return: 是否在超时前发送完毕
+        """
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._queues, timeout)
+
+    def get_stats(self) -> dict:
+        """
+        :return: submitted-提交的消息数; sent-实际发送次数; merged-被合并的消息数; pending-等待发送的消息数
+        """
+        with self._lock:
+            pending = sum(len(q) for q in self._queues.values())
+        return {"submitted": self.submitted, "sent": self.sent, "merged": self.merged, "pending": pending}
@@ -0,0 +1,152 @@
+import time
+import threading
+import typing as t
+from urllib.parse import urlsplit
+
+_ID_AFTER = {"guilds", "channels", "dms", "members", "roles", "messages", "schedules", "announces", "pins", "users",
+             "reactions"}
+_MAJOR_PARAMS = {"guilds", "channels", "dms"}
+
+
+def route_key(method: str, url: str) -> t.Tuple[str, str]:
+    """
+    将请求转换为 (路由, 主参数)
+    例: POST https://api.sgroup.qq.com/channels/123/messages -> ("POST /channels/{id}/messages", "123")
+    """
+    segments = urlsplit(url).path.strip("/").split("/")
+    route = []
+    major = ""
+    prev = None
+    for seg in segments:
+        if (prev in _ID_AFTER and seg != "@me") or seg.isdigit():
+            route.append("{id}")
+            if not major and prev in _MAJOR_PARAMS:
+                major = seg
+        else:
+            route.append(seg)
+        prev = seg
+    return f"{method.upper()} /{'/'.join(route)}", major
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        """
+        令牌桶
+        :param rate: 每秒生成的令牌数
+        :param burst: 令牌桶容量
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # 服务端限频后的冷却时间
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """
+        预定一个令牌, 令牌不足时允许透支
+        :return: 调用方需要等待的秒数
+        """
+        self._refill(now)
+        self.tokens -= 1
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst and now >= self.blocked_until
+
+
+class RateLimiter:
+    def __init__(self, default_rate=20.0, default_burst=20, max_buckets=10000):
+        """
+        按 (路由, 主参数) 区分的客户端限频器. 令牌不足时延迟请求, 而不是直接失败
+        :param default_rate: 默认每秒请求数
+        :param default_burst: 默认突发请求数
+        :param max_buckets: 令牌桶数量上限, 超出后清理空闲的令牌桶
+        """
+        self.enabled = True
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.max_buckets = max_buckets
+        self.route_limits: t.Dict[str, t.Tuple[float, int]] = {
+            "POST /channels/{id}/messages": (5.0, 5),
+            "POST /dms/{id}/messages": (5.0, 5),
+        }
+        self._buckets: t.Dict[t.Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def set_limit(self, route: str, rate: float, burst: int):
+        """
+        设置指定路由的限频, 已存在的令牌桶同时生效
+        :param route: 路由, 格式同 route_key() 的返回值, 如 "POST /channels/{id}/messages"
+        :param rate: 每秒请求数
+        :param burst: 突发请求数
+        """
+        with self._lock:
+            self.route_limits[route] = (rate, burst)
+            for (b_route, _), bucket in self._buckets.items():
+                if b_route == route:
+                    bucket.rate = rate
+                    bucket.burst = burst
+
+    def _get_bucket(self, key: t.Tuple[str, str], now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                for k in [k for k, v in self._buckets.items() if v.is_idle(now)]:
+                    del self._buckets[k]
+            rate, burst = self.route_limits.get(key[0], (self.default_rate, self.default_burst))
+            bucket = TokenBucket(rate, burst)
+            self._buckets[key] = bucket
+        return bucket
+
+    def reserve(self, method: str, url: str) -> float:
+        """
+        为一次请求预定令牌
+        :return: 发送请求前需要等待的秒数
+        """
+        if not self.enabled:
+            return 0.0
+        key = route_key(method, url)
+        now = time.monotonic()
+        with self._lock:
+            return self._get_bucket(key, now).reserve(now)
+
+    def acquire(self, method: str, url: str):
+        """
+        阻塞直到可以发送请求
+        """
+        wait = self.reserve(method, url)
+        if wait > 0:
+            time.sleep(wait)
+
+    def penalize(self, method: str, url: str, seconds: float):
+        """
+        服务端返回限频时调用, 该令牌桶在 seconds 秒内不再放行请求
+        """
+        key = route_key(method, url)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._get_bucket(key, now)
+            bucket.tokens = min(bucket.tokens, 0.0)
+            bucket.blocked_until = max(bucket.blocked_until, now + seconds)
+
+    def get_state(self) -> t.Dict[str, dict]:
+        """
+        获取当前所有令牌桶的状态
+        :return: {"路由 主参数": {"tokens": 剩余令牌, "rate": 每秒令牌数, "burst": 容量, "blocked": 剩余冷却秒数}}
+        """
+        now = time.monotonic()
+        ret = {}
+        with self._lock:
+            for (route, major), bucket in self._buckets.items():
+                bucket._refill(now)
+                ret[f"{route} {major}".strip()] = {"tokens": bucket.tokens,
+                                                   "rate": bucket.rate,
+                                                   "burst": bucket.burst,
+                                                   "blocked": max(bucket.blocked_until - now, 0.0)}
+        return ret
@@ -0,0 +1,118 @@
+import time
+import random
+import threading
+import typing as t
+
+
+class RetryPolicy:
+    IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+
+    def __init__(self, max_retries=2, base_delay=0.5, max_delay=8.0, retry_sends=False,
+                 retry_statuses: t.Iterable[int] = (429, 500, 502, 503, 504)):
+        """
+        请求重试策略, 指数退避 + 随机抖动
+        :param max_retries: 最大重试次数
+        :param base_delay: 首次重试的基础等待秒数
+        :param max_delay: 单次等待秒数上限
+        :param retry_sends: 是否重试非幂等请求(POST/PATCH, 如发送消息). 可能导致消息重复发送, 默认关闭
+        :param retry_statuses: 需要重试的HTTP状态码
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_sends = retry_sends
+        self.retry_statuses = set(retry_statuses)
+
+    def can_retry(self, method: str) -> bool:
+        return method.upper() in self.IDEMPOTENT_METHODS or self.retry_sends
+
+    def backoff(self, attempt: int) -> float:
+        """
+        :param attempt: 第几次重试, 从0开始
+        :return: 等待秒数
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        熔断器: 连续失败 failure_threshold 次后熔断, reset_timeout 秒后放行一个探测请求
+        探测请求超过 reset_timeout 秒仍未结束时, 放行下一个探测请求
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and \
+                    (not self._probing or time.monotonic() - self._probe_started >= self.reset_timeout):
+                self._probing = True
+                self._probe_started = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def release(self):
+        """
+        请求被中断(如取消)时调用, 不计入成功或失败, 仅释放探测名额
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class CircuitBreakerGroup:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        按接口(路由)区分的熔断器集合
+        """
+        self.enabled = True
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: t.Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, route: str) -> CircuitBreaker:
+        breaker = self._breakers.get(route)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(route, CircuitBreaker(self.failure_threshold, self.reset_timeout))
+        return breaker
+
+    def allow(self, route: str) -> bool:
+        return not self.enabled or self.get(route).allow()
+
+    def get_state(self) -> t.Dict[str, dict]:
+        """
+        :return: {路由: {"state": 状态, "failures": 连续失败次数}}
+        """
+        return {route: {"state": b.state, "failures": b.failures} for route, b in list(self._breakers.items())}
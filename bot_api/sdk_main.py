@@ -1,12 +1,16 @@
 from . import inter
+from . import dispatcher
+from . import heartbeat
+from . import codec
+from . import lazy
 from .structs import Codes as BCd
 import websocket
-import json
-import requests
 import time
 from threading import Thread
 import typing as t
 import os
+import copy
+import multiprocessing
 
 event_types = BCd.QBot.GatewayEventName
 
@@ -43,7 +47,9 @@ def get_connection(url, on_message, on_open, on_error, on_close):
 class BotApp(inter.BotMessageDistributor):
     def __init__(self, appid: int, token: str, secret: str, is_sandbox: bool, inters: t.List,
                  debug=False, api_return_pydantic=False, ignore_at_self=False, output_log=True, log_path="",
-                 raise_api_error=False, call_on_load_event_every_reconnect=False):
+                 raise_api_error=False, call_on_load_event_every_reconnect=False,
+                 dispatch_mode=dispatcher.DispatchMode.THREAD, dispatch_workers=8, dispatch_queue_size=1000,
+                 dispatch_put_timeout=0, shard_id=0, shard_count=1, http_pool_size=16, http_timeout=(5, 30), lazy_event_model=True):
         """
         BotAPP
         :param appid: BotAPPId
@@ -58,23 +64,42 @@ class BotApp(inter.BotMessageDistributor):
         :param log_path: 日志输出位置, 默认为sdk目录内log文件夹
         :param raise_api_error: 当API调用出错时, 抛出 BotCallingAPIError 异常
         :param call_on_load_event_every_reconnect: 每次触发重连都调用 FUNC_CALL_AFTER_BOT_LOAD 事件
+        :param dispatch_mode: 事件分发模式, "thread"-每个事件新建线程; "pool"-固定大小线程池, 见 dispatcher.DispatchMode
+        :param dispatch_workers: 线程池大小, 仅pool模式有效
+        :param dispatch_queue_size: 事件等待队列长度上限, 仅pool模式有效
+        :param dispatch_put_timeout: 队列已满时等待的最长秒数, 超时后丢弃事件; 默认0为直接丢弃, 避免阻塞心跳处理. 仅pool模式有效
+        :param shard_id: 当前连接的分片ID, 多分片请使用 start_sharded()
+        :param shard_count: 分片总数
+        :param http_pool_size: REST请求连接池大小
+        :param http_timeout: REST请求超时(秒), 可为 (连接超时, 读取超时)
+        :param lazy_event_model: 事件对象在处理函数访问字段时才解析(见 lazy.LazyModel), False 则在分发前构造完整的 pydantic 对象
         """
         super().__init__(appid=appid, token=token, secret=secret, sandbox=is_sandbox, debug=debug,
                          api_return_pydantic=api_return_pydantic, output_log=output_log, log_path=log_path,
-                         raise_api_error=raise_api_error)
+                         raise_api_error=raise_api_error, http_pool_size=http_pool_size, http_timeout=http_timeout)
         self.inters = inters
         self.ignore_at_self = ignore_at_self
         self.self_id = ""
         self.self_name = ""
         self.EVENT_MESSAGE_CREATE_CALL_AT_MESSAGE_CREATE = False
         self.session_id = None
-        self._d = None  # 心跳参数
+        self._d = None  # 心跳参数, 即最后收到的消息序号 s, 用于RESUME
+        self._verify_sent = False  # 当前连接已发送 IDENTIFY/RESUME, 之后才开始发送心跳
         self._t = None
         self.heartbeat_time = -1  # 心跳间隔
+        self.heartbeat_monitor = heartbeat.HeartbeatMonitor()
         self.ws = None
         self._on_load_run = True
         self.call_on_load_event_every_reconnect = call_on_load_event_every_reconnect
         self._spath = os.path.split(__file__)[0]
+        self.dispatcher = dispatcher.create_dispatcher(dispatch_mode, workers=dispatch_workers,
+                                                       queue_size=dispatch_queue_size,
+                                                       put_timeout=dispatch_put_timeout, logger=self.logger)
+        self.shard_id = shard_id
+        self.shard_count = shard_count
+        self.shards: t.List[BotApp] = []
+        self._parent: t.Optional[BotApp] = None  # 分片实例对应的 start_sharded() 调用方
+        self.lazy_event_model = lazy_event_model
 
     # @on_new_thread
     def start(self):
@@ -87,6 +112,54 @@ class BotApp(inter.BotMessageDistributor):
                                      on_close=self._on_close)
             self.ws.run_forever()
 
+    def start_sharded(self, shard_count: t.Optional[int] = None, use_process=False):
+        """
+        以多分片模式启动Bot, 每个分片使用独立的连接. 事件注册依旧在当前BotApp上进行
+        :param shard_count: 分片数量, 为None时使用 /gateway/bot 返回的建议分片数
+        :param use_process: 每个分片在独立的进程中运行(使用fork, 仅支持Linux/macOS), 否则在独立的线程中运行
+        """
+        gateway_info = self._get_gateway_bot()
+        if shard_count is None:
+            shard_count = gateway_info.get("shards", 1) if gateway_info else 1
+        max_concurrency = 1
+        if gateway_info and "session_start_limit" in gateway_info:
+            max_concurrency = max(gateway_info["session_start_limit"].get("max_concurrency", 1), 1)
+        self.logger(f"分片数量: {shard_count}, 运行方式: {'进程' if use_process else '线程'}")
+
+        self.shards = [self._make_shard(i, shard_count) for i in range(shard_count)]
+        runners = []
+        for shard in self.shards:
+            if use_process:
+                _r = multiprocessing.get_context("fork").Process(target=shard.start, name=f"bot-shard-{shard.shard_id}")
+            else:
+                _r = Thread(target=shard.start, name=f"bot-shard-{shard.shard_id}")
+            _r.start()
+            runners.append(_r)
+            if (shard.shard_id + 1) % max_concurrency == 0 and shard.shard_id + 1 < shard_count:
+                time.sleep(5)  # 每5秒内最多创建 max_concurrency 个session
+
+        for _r in runners:
+            _r.join()
+
+    def _make_shard(self, shard_id: int, shard_count: int):
+        """
+        复制一个分片实例, 与当前实例共用事件注册表/模块/分发器
+        """
+        shard = copy.copy(self)
+        shard.shard_id = shard_id
+        shard.shard_count = shard_count
+        shard.shards = []
+        shard._parent = self
+        shard.session_id = None
+        shard._d = None
+        shard._verify_sent = False
+        shard._t = None
+        shard.heartbeat_time = -1
+        shard.heartbeat_monitor = heartbeat.HeartbeatMonitor()
+        shard.ws = None
+        shard._on_load_run = self._on_load_run and shard_id == 0  # FUNC_CALL_AFTER_BOT_LOAD 仅在0号分片触发
+        return shard
+
     def _get_connection(self):
         ws = websocket.WebSocketApp(url=self._get_websocket_url(),
                                     on_message=self._on_message,
@@ -103,7 +176,7 @@ class BotApp(inter.BotMessageDistributor):
                 "d": {
                     "token": f'Bot {self.appid}.{self.token}',
                     "session_id": self.session_id,
-                    "seq": 1337
+                    "seq": self._d
                 }
             }
         else:
@@ -112,7 +185,7 @@ class BotApp(inter.BotMessageDistributor):
                 "d": {
                     "token": f'Bot {self.appid}.{self.token}',
                     "intents": self._get_inters_code(),  # 1073741827
-                    "shard": [0, 1],
+                    "shard": [self.shard_id, self.shard_count],
                     "properties": {
                         "$os": "linux",
                         "$browser": "python_sdk",
@@ -123,6 +196,23 @@ class BotApp(inter.BotMessageDistributor):
 
         return rb
 
+    def _send_verify(self, body: dict):
+        """
+        发送 IDENTIFY/RESUME, 发送完成后心跳线程才会发送心跳
+        """
+        self._ws_send(body)
+        self._verify_sent = True
+
+    def _can_resume(self):
+        return self.session_id is not None and self._d is not None
+
+    def _reset_session(self):
+        self.session_id = None
+        self._d = None
+
+    def _ws_send(self, data: dict):
+        self.ws.send(codec.dumps(data))
+
     def _ws_on_error(self, ws, err, *args):
         try:
             raise err
@@ -134,30 +224,25 @@ class BotApp(inter.BotMessageDistributor):
     def _on_message(self, ws, msg):  # 收到ws消息
         try:
             self.logger(msg, debug=True)
-            data = json.loads(msg)
+            data = codec.loads(msg)
             stat_code = data["op"]  # 状态码, 参考: https://bot.q.qq.com/wiki/develop/api/gateway/opcode.html
 
             if stat_code == BCd.QBot.OPCode.Hello:  # 网关下发的第一条消息
                 if "heartbeat_interval" in data["d"]:  # 初始化心跳
+                    self._verify_sent = False
                     self.heartbeat_time = data["d"]["heartbeat_interval"] / 1000
-                    ws.send(json.dumps(self._get_verify_body()))
+                    self.heartbeat_monitor.reset()
+                    if self._can_resume():
+                        self.logger("尝试恢复连接", debug=True, session_id=self.session_id, seq=self._d)
+                    self._send_verify(self._get_verify_body(reconnect=self._can_resume()))
 
             elif stat_code == BCd.QBot.OPCode.Dispatch:  # 服务器主动推送消息
-                self._d = data["s"]
+                if data.get("s") is not None:
+                    self._d = data["s"]
                 if "t" in data:
                     s_type = data["t"]
-
-                    def _send_event(m_dantic, changed_data=None, changed_s_type=None):
-                        """
-                        事件聚合分发
-                        :param m_dantic: 要发送的消息(Basemodel)
-                        :param changed_data: 需要修改的消息, 默认为data["d"]
-                        :param changed_s_type: 需要修改的消息类型, 默认为s_type, 即data["t"]
-                        :return:
-                        """
-                        _send_data = data["d"] if changed_data is None else changed_data
-                        _send_type = s_type if changed_s_type is None else changed_s_type
-                        self._event_handout(_send_type, m_dantic(**_send_data))
+                    if isinstance(data.get("d"), dict):
+                        self._update_entity_cache(s_type, data["d"])
 
                     if s_type == event_types.READY:  # 验证完成
                         self.session_id = data["d"]["session_id"]
@@ -165,52 +250,74 @@ class BotApp(inter.BotMessageDistributor):
                                       is_login=True)
                         self.send_heart_beat()
 
-                    elif s_type == event_types.RESUMED:  # 服务器通知重连
+                    elif s_type == event_types.RESUMED:  # 恢复连接成功
                         self.logger("重连完成, 事件已全部补发")
+                        self.send_heart_beat()
 
                     elif s_type in self.known_events:
                         s_dantic = self.known_events[s_type][1]
-                        if s_dantic is not None:
+                        if s_dantic is not None and self._run_middlewares(s_type, data["d"]):
                             if s_type in [event_types.AT_MESSAGE_CREATE, event_types.MESSAGE_CREATE,
                                           event_types.DIRECT_MESSAGE_CREATE]:
                                 if self.ignore_at_self:
                                     data["d"]["content"] = data["d"]["content"].replace(f"<@!{self.self_id}>",
                                                                                         "").strip()
-                                if s_type == event_types.MESSAGE_CREATE:  # 收到消息(私域)
-                                    if self.EVENT_MESSAGE_CREATE_CALL_AT_MESSAGE_CREATE:  # 普通消息依旧调用艾特消息函数
-                                        _send_event(self.known_events[event_types.AT_MESSAGE_CREATE][1],
-                                                    changed_s_type=event_types.AT_MESSAGE_CREATE)
                                 if s_type in [event_types.MESSAGE_CREATE, event_types.AT_MESSAGE_CREATE]:  # 群消息
                                     data["d"]["message_type_sdk"] = "guild"
                                 elif s_type == event_types.DIRECT_MESSAGE_CREATE:  # 私聊
                                     data["d"]["message_type_sdk"] = "private"
 
-                            _send_event(s_dantic)
+                            handlers = self._select_handlers(s_type, data["d"])
+                            if s_type == event_types.MESSAGE_CREATE and self.EVENT_MESSAGE_CREATE_CALL_AT_MESSAGE_CREATE:
+                                # 普通消息依旧调用艾特消息函数, 与之共用同一个事件对象
+                                handlers = self._select_handlers(event_types.AT_MESSAGE_CREATE, data["d"]) + handlers
+                            self._handout_event(handlers, s_dantic, data["d"])
 
                     # TODO 主题相关事件
 
                     else:
-                        self.logger(f"收到未知或暂不支持的推送消息: {data}", debug=True)
+                        self.logger("收到未知或暂不支持的推送消息: %s", debug=True, args=(data,))
+
 
+            elif stat_code == BCd.QBot.OPCode.Heartbeat_Ack:  # 心跳ACK
+                rtt = self.heartbeat_monitor.on_ack()
+                if rtt is not None:
+                    self.logger("心跳延迟: %.1fms", debug=True, args=(rtt * 1000,))
 
             elif stat_code == BCd.QBot.OPCode.Reconnect:  # 服务器通知重连
                 self.logger("服务器通知重连")
                 self._on_close()
 
-            elif stat_code == BCd.QBot.OPCode.Invalid_Session:  # 验证失败
-                self.logger("连接失败: Invalid Session", error=True)
-                self._on_close(active_close=True)
+            elif stat_code == BCd.QBot.OPCode.Invalid_Session:  # 验证/恢复失败, 重连时重新鉴权
+                self.logger("连接失败: Invalid Session, 将重新鉴权", error=True)
+                self._reset_session()
+                self._on_close()
 
         except Exception as sb:
             self.logger(sb, error=True)
 
+    def _handout_event(self, handlers: t.List[t.Callable], m_dantic, raw: dict):
+        """
+        构造事件对象并分发, 每个事件只构造(校验)一次, 所有处理函数共用同一个对象
+        没有需要调用的函数时不构造事件对象
+        """
+        if not handlers:
+            return
+        event = lazy.LazyModel(m_dantic, raw) if self.lazy_event_model else m_dantic(**raw)
+        self._handout_to(handlers, event)
+
     def _event_handout(self, func_type: str, *args, **kwargs):
-        if func_type in self.bot_events:
-            throw_func = self.bot_events[func_type]
-            if throw_func:
-                for f in throw_func:
-                    _t = Thread(target=f, args=args, kwargs=kwargs)
-                    _t.start()
+        self._handout_to(self.bot_events.get(func_type) or [], *args, **kwargs)
+
+    def _handout_to(self, handlers: t.List[t.Callable], *args, **kwargs):
+        for f in handlers:
+            self.dispatcher.submit(f, *args, **kwargs)
+
+    def get_dispatch_stats(self) -> dict:
+        """
+        获取事件分发统计: 队列深度, 丢弃数量, 各处理函数调用次数及耗时
+        """
+        return self.dispatcher.get_stats()
 
     def _check_files(self):
         pass
@@ -219,37 +326,31 @@ class BotApp(inter.BotMessageDistributor):
         if is_login:
             self.self_id = botid
             self.self_name = botname
+            if self._parent is not None and self._parent.self_id == "":  # 线程分片模式下, 第一个READY的分片设置调用方的bot信息
+                self._parent.self_id = botid
+                self._parent.self_name = botname
             self.logger(f"开始运行:\nBotID: {botid}\nBotName: {botname}\nbot: {isbot}")
             self._check_files()
             if self._on_load_run or self.call_on_load_event_every_reconnect:
                 self._event_handout(BCd.SeverCode.FUNC_CALL_AFTER_BOT_LOAD, self)
                 self._on_load_run = False
         else:
+            self._verify_sent = False
             self.logger("开始尝试连接")
 
     def _on_close(self, *args, active_close=False):
         self.logger(f"on_close {args}", debug=True)
         try:
             self.heartbeat_time = -1
-            self._d = None
+            self._verify_sent = False
             self.ws.close()
         except Exception as sb:
             self.logger(f"关闭连接失败: {sb}", error=True)
 
         if not active_close:
             self.heartbeat_time = -1
-            self._d = None
-            self.logger("连接断开, 尝试重连", warning=True)
+            self.logger("连接断开, 尝试重连", warning=True)  # 重连时若 session_id 有效, 将发送 RESUME
             self.ws.keep_running = False
-            """
-            self.ws = get_connection(url=self._get_websocket_url(),
-                                     on_message=self._on_message,
-                                     on_open=self._on_open,
-                                     on_error=self._ws_on_error,
-                                     on_close=self._on_close)
-            self.ws.run_forever()
-            self.ws.send(json.dumps(self._get_verify_body(reconnect=True)))
-            """
         else:
             self.logger("连接已断开", warning=True)
 
@@ -258,10 +359,15 @@ class BotApp(inter.BotMessageDistributor):
         def _send_heart_beat():
             try:
                 while True:
-                    if self.heartbeat_time != -1 and self._d is not None:
-                        self.logger(f"发送心跳: {self._d}", debug=True)
-
-                        self.ws.send(json.dumps({"op": 1, "d": self._d}))
+                    if self.heartbeat_time != -1 and self._d is not None and self._verify_sent:
+                        if self.heartbeat_monitor.check_zombie():
+                            self.logger("上一次心跳未收到ACK, 连接可能已失效, 尝试重连", warning=True)
+                            self._on_close()
+                            continue
+                        self.logger("发送心跳: %s", debug=True, args=(self._d,))
+
+                        self._ws_send({"op": 1, "d": self._d})
+                        self.heartbeat_monitor.on_send()
                         time.sleep(self.heartbeat_time)
                     else:
                         time.sleep(1)
@@ -278,17 +384,48 @@ class BotApp(inter.BotMessageDistributor):
                 self._t = Thread(target=_send_heart_beat)
                 self._t.start()
 
+    def get_heartbeat_latency(self) -> dict:
+        """
+        获取网关心跳延迟(秒). 线程分片模式下为所有分片的合并统计, 并在 "shards" 中按分片ID给出各分片的统计
+        进程分片模式下各分片在子进程中运行, 无法在此获取
+        :return: {"last": 最近一次, "avg": 平均值, "p99": 99分位, "count": 样本数, "missed": 未收到ACK次数}
+        """
+        if not self.shards:
+            return self.heartbeat_monitor.get_latency()
+        ret = heartbeat.merge_latency(shard.heartbeat_monitor for shard in self.shards)
+        ret["shards"] = {shard.shard_id: shard.heartbeat_monitor.get_latency() for shard in self.shards}
+        return ret
+
     def _get_websocket_url(self):
         url = f"{self.base_api}/gateway"
         headers = {'Authorization': f'Bot {self.appid}.{self.token}'}
-        response = requests.request("GET", url, headers=headers)
+        response = self._request("GET", url, headers=headers)
         try:
-            self.logger(f"获取服务器api: {response.json()['url']}", debug=True)
-            return response.json()["url"]
+            ws_url = codec.loads(response.content)["url"]
+            self.logger("获取服务器api: %s", debug=True, args=(ws_url,))
+            return ws_url
         except Exception as sb:
             self.logger(f"获取服务器API失败 - {response.text}")
             print(sb)
 
+    def _get_gateway_bot(self) -> t.Optional[dict]:
+        """
+        获取带分片信息的网关地址
+        :return: {"url": ..., "shards": ..., "session_start_limit": {...}}, 失败返回None
+        """
+        url = f"{self.base_api}/gateway/bot"
+        headers = {'Authorization': f'Bot {self.appid}.{self.token}'}
+        response = self._request("GET", url, headers=headers)
+        try:
+            data = codec.loads(response.content)
+            self.logger("获取分片信息: %s", debug=True, args=(data,))
+            if "code" in data:
+                raise ValueError(data)
+            return data
+        except Exception as sb:
+            self.logger(f"获取分片信息失败 - {response.text}", error=True)
+            return None
+
     def _get_inters_code(self):
         if type(self.inters) != list:
             self.logger("事件订阅(inters)错误, 将使用默认值", error=True)
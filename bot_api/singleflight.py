@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import typing as t
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: t.Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        合并相同key的并发调用: 同一时刻只执行一次, 其余调用方等待并共享结果(或异常)
+        """
+        self.enabled = True
+        self._calls: t.Dict[t.Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: t.Hashable, func: t.Callable[[], t.Any]):
+        if not self.enabled:
+            return func()
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.shared += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as sb:
+            call.error = sb
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def get_stats(self) -> dict:
+        """
+        :return: calls-调用次数; shared-被合并(未实际执行)的调用次数; in_flight-正在执行的key数量
+        """
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._calls)}
+
+
+class AsyncSingleFlight:
+    def __init__(self):
+        """
+        SingleFlight 的协程版本, 仅在同一个事件循环内使用
+        共享的调用在单独的任务中执行, 任一调用方被取消不会影响其他调用方
+        """
+        self.enabled = True
+        self._calls: t.Dict[t.Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: t.Hashable, func: t.Callable[[], t.Awaitable]):
+        if not self.enabled:
+            return await func()
+        self.calls += 1
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._done(key, task))
+        return await asyncio.shield(task)
+
+    def _done(self, key: t.Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # 调用方均已取消时避免 "exception was never retrieved"
+
+    def get_stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._calls)}
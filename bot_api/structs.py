@@ -334,3 +334,13 @@ class MessageSetting(BaseModel):
     disable_push_msg: t.Optional[str]
     channel_ids: t.Optional[t.List[str]]
     channel_push_max_num: t.Optional[int]
+
+
+class BulkSendResult(BaseModel):  # 批量发送消息的单个目标结果
+    target_id: str  # 子频道ID, 私信时为私信会话的 guild_id
+    is_dms: bool = False
+    ok: bool = False
+    status_code: t.Optional[int]
+    message_id: t.Optional[str]
+    trace_id: t.Optional[str]  # X-Tps-trace-ID
+    error: t.Optional[str]  # 失败时的返回原文或异常信息
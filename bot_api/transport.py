@@ -0,0 +1,78 @@
+import os
+import threading
+import typing as t
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpTransport:
+    def __init__(self, pool_connections=4, pool_maxsize=16, timeout: t.Union[float, t.Tuple[float, float], None] = (5, 30),
+                 keep_alive=True, pool_block=False):
+        """
+        共享的HTTP连接池, 所有REST请求复用同一个 requests.Session
+        :param pool_connections: 缓存的host连接池数量
+        :param pool_maxsize: 每个host连接池的最大连接数
+        :param timeout: 默认超时(秒), 可为 (连接超时, 读取超时), None为不超时
+        :param keep_alive: 是否保持长连接
+        :param pool_block: 连接池已满时是否等待空闲连接, 否则临时新建连接
+        """
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        self._pid = None
+        self._build_session()
+        self.requests = 0
+        self.errors = 0
+
+    def _build_session(self):
+        self._session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=self._pool_connections, pool_maxsize=self._pool_maxsize,
+                                    pool_block=self._pool_block)
+        self._session.mount("https://", self._adapter)
+        self._session.mount("http://", self._adapter)
+        if not self.keep_alive:
+            self._session.headers["Connection"] = "close"
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _ensure_session(self):
+        if self._pid != os.getpid():  # fork 后的子进程不能复用父进程连接池中的socket, 否则响应会互相串扰
+            self._build_session()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        self._ensure_session()
+        if "timeout" not in kwargs:
+            kwargs["timeout"] = self.timeout
+        with self._lock:
+            self.requests += 1
+        try:
+            return self._session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self.errors += 1
+            raise
+
+    def get_stats(self) -> dict:
+        """
+        连接复用统计
+        :return: requests-请求数; new_connections-新建连接数; reused-复用连接的请求数; reuse_rate-复用率; errors-请求异常数
+        """
+        self._ensure_session()
+        new_connections = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                new_connections += pool.num_connections
+
+        reused = max(self.requests - new_connections, 0)
+        return {"requests": self.requests,
+                "new_connections": new_connections,
+                "reused": reused,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+                "errors": self.errors}
+
+    def close(self):
+        self._session.close()
@@ -0,0 +1,152 @@
+import asyncio
+import typing as t
+import bot_api
+from bot_api import codec
+from . import message_convert
+
+try:
+    from aiohttp import web
+except ImportError:  # 仅异步HTTP服务器需要
+    web = None
+
+
+class AsyncHttpServer:
+    def __init__(self, server, host: str, port: int, api: t.Optional[bot_api.AsyncBotApi] = None):
+        """
+        基于 aiohttp 的异步HTTP API服务器, 接口与 BotServer 的 Flask 服务器相同, 调用SDK时不阻塞线程
+        参数可通过 URL query, JSON 请求体或表单传入
+        :param server: BotServer
+        :param host: 监听ip
+        :param port: 监听端口
+        :param api: 异步API客户端, 默认根据 server.bot 创建, 共用限频/重试/熔断策略与缓存
+        """
+        if web is None:
+            raise ImportError("异步HTTP服务器需要安装 aiohttp: pip install aiohttp")
+        self.server = server
+        self.bot = server.bot
+        self.host = host
+        self.port = port
+        self.api = api or bot_api.AsyncBotApi.from_bot(server.bot)
+
+    def make_app(self) -> "web.Application":
+        app = web.Application()
+        for action in self.server.ACTIONS:
+            app.router.add_route("*", f"/{action}", self._view(action))
+        app.router.add_route("*", "/mark_msg_as_read", self._mark_msg_as_read)
+        app.on_cleanup.append(self._close)
+        return app
+
+    async def serve(self):
+        """
+        在当前事件循环中启动服务器
+        """
+        runner = web.AppRunner(self.make_app())
+        await runner.setup()
+        await web.TCPSite(runner, self.host, self.port).start()
+        return runner
+
+    def run(self):
+        """
+        在当前线程中创建事件循环并一直运行
+        """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(self.serve())
+        loop.run_forever()
+
+    async def _close(self, app):
+        await self.api.close()
+
+    @staticmethod
+    async def _params(request: "web.Request") -> dict:
+        params = dict(request.query)
+        if request.method == "POST" and request.can_read_body:
+            if request.content_type == "application/json":
+                try:
+                    body = codec.loads(await request.read())
+                except ValueError:
+                    raise web.HTTPBadRequest(text="invalid json")
+                if isinstance(body, dict):
+                    params.update(body)
+            else:
+                params.update(await request.post())
+        return params
+
+    def _view(self, action: str):
+        async def view(request: "web.Request"):
+            params = await self._params(request)  # 请求格式错误时返回400
+            try:
+                data = await self.call_action(action, params)
+            except Exception as sb:
+                self.bot.logger(f"HTTP API调用失败: {action} {repr(sb)}", error=True)
+                data = message_convert.action_failed(1500, repr(sb))
+            body = data if isinstance(data, (str, bytes)) else codec.dumps_bytes(data)
+            return web.Response(body=body.encode("utf-8") if isinstance(body, str) else body,
+                                content_type="application/json")
+        return view
+
+    @staticmethod
+    async def _mark_msg_as_read(request: "web.Request"):
+        return web.Response(text="ok")
+
+    async def call_action(self, action: str, params) -> t.Union[dict, str, bytes]:
+        """
+        同 BotServer.call_action, 使用异步API
+        """
+        if action not in self.server.ACTIONS:
+            return message_convert.action_failed(1404, f"不支持的API: {action}")
+        return await getattr(self, action)(params)
+
+    async def send_group_msg(self, params):
+        channel_id = params.get("group_id")
+        message = params.get("message")
+        auto_escape = params.get("auto_escape")
+
+        # 解析CQ码时可能下载图片及调用 img_to_url, 放到线程中执行
+        cmsg, reply_msg_id, img_url = await asyncio.get_running_loop().run_in_executor(
+            None, message_convert.cq_to_guild_text, message, self.bot.img_to_url, auto_escape,
+            self.bot.logger)
+        if not self.server.allow_push and reply_msg_id == "":
+            self.bot.logger("不发送允许PUSH消息, 请添加回复id, 或者将\"allow_push\"设置为True", warning=True)
+            return message_convert.action_failed(100, "不允许发送主动推送消息")
+
+        sendmsg = await self.api.api_send_message(channel_id, reply_msg_id, cmsg, img_url, retstr=True)
+        sdata = codec.loads(sendmsg)
+        if "id" in sdata:
+            return {
+                "data": {
+                    "message_id": sdata["id"]
+                },
+                "retcode": 0,
+                "status": "ok"
+            }
+        return sdata
+
+    async def get_self_info(self, params):
+        selfinfo = await self.api.get_self_info(params.get("cache"))
+        return message_convert.self_info_convert_to_json(selfinfo)
+
+    async def get_group_member_info(self, params):
+        group_id = params.get("group_id")
+        member = await self.api.get_guild_user_info(group_id, params.get("user_id"),
+                                                    use_cache=not params.get("no_cache"))
+        return message_convert.guild_member_info_convert(member, group_id)
+
+    async def get_channel_info(self, params):
+        return await self.api.get_channel_info(params.get("channel_id"), retstr=True)
+
+    async def get_channel_list(self, params):
+        return await self.api.get_guild_channel_list(params.get("guild_id"), retstr=True)
+
+    async def get_message(self, params):
+        return await self.api.get_message(params.get("channel_id"), params.get("message_id"), retstr=True)
+
+    async def get_self_guild_list(self, params):
+        before = "" if params.get("before") is None else params.get("before")
+        after = "" if params.get("after") is None else params.get("after")
+        limit = 100 if params.get("limit") is None else params.get("limit")
+        return await self.api.get_self_guilds(before=before, after=after, limit=limit, use_cache=params.get("cache"),
+                                              retstr=True)
+
+    async def get_guild_info(self, params):
+        return await self.api.get_guild_info(params.get("guild_id"), retstr=True)
@@ -0,0 +1,114 @@
+import re
+import typing as t
+from functools import lru_cache
+
+_CQ_CODE = re.compile(r"\[CQ:([^,\[\]]*)([^\[\]]*)]")
+_GUILD_AT = re.compile(r"<@!(\d*)>")
+_WORD = re.compile(r"\w*")
+
+
+class Segment(t.NamedTuple):
+    type: str  # "text" 或 CQ码类型, 如 at, reply, image
+    data: t.Tuple[t.Tuple[str, str], ...]  # CQ码参数
+    raw: str  # 原文
+
+    def get(self, key: str, default=None):
+        for k, v in self.data:
+            if k == key:
+                return v
+        return default
+
+
+def _parse_params(params: str) -> t.Tuple[t.Tuple[str, str], ...]:
+    ret = []
+    for item in params.split(","):
+        if item:
+            key, _, value = item.partition("=")
+            ret.append((key, value))
+    return tuple(ret)
+
+
+def _tokenize(pattern: t.Pattern, text: str, make_segment: t.Callable[[t.Match], Segment]) -> t.Tuple[Segment, ...]:
+    """
+    一次扫描将文本切分为 文本/代码 片段
+    """
+    segments = []
+    pos = 0
+    for m in pattern.finditer(text):
+        if m.start() > pos:
+            segments.append(Segment("text", (), text[pos:m.start()]))
+        segments.append(make_segment(m))
+        pos = m.end()
+    if pos < len(text):
+        segments.append(Segment("text", (), text[pos:]))
+    return tuple(segments)
+
+
+@lru_cache(maxsize=1024)
+def parse_cq(msg: str) -> t.Tuple[Segment, ...]:
+    """
+    解析含CQ码的消息, 结果会被缓存, 请勿修改
+    """
+    return _tokenize(_CQ_CODE, msg, lambda m: Segment(m.group(1), _parse_params(m.group(2)), m.group(0)))
+
+
+@lru_cache(maxsize=1024)
+def parse_guild_text(content: str) -> t.Tuple[Segment, ...]:
+    """
+    解析频道消息内容中的艾特(<@!id>), 结果会被缓存, 请勿修改
+    """
+    return _tokenize(_GUILD_AT, content, lambda m: Segment("at", (("qq", m.group(1)),), m.group(0)))
+
+
+def render_cq(segments: t.Iterable[Segment]) -> str:
+    return "".join(s.raw if s.type == "text" else
+                   "[CQ:" + s.type + "".join(f",{k}={v}" for k, v in s.data) + "]" for s in segments)
+
+
+def _is_word(value: t.Optional[str]) -> bool:
+    return value is not None and _WORD.fullmatch(value) is not None
+
+
+@lru_cache(maxsize=1024)
+def compile_to_guild(msg: str, auto_escape=False) -> t.Tuple[str, str, str, str]:
+    """
+    CQ码消息转频道消息
+    :param msg: 原消息
+    :param auto_escape: 为 True 时除回复外的CQ码均作为文本发送
+    :return: (消息内容, 回复消息id, 图片url, 图片路径). 仅支持一张图片, 不支持的CQ码会被去除
+    """
+    segments = parse_cq(msg)
+    reply = next((s for s in segments if s.type == "reply" and _is_word(s.get("id"))), None)
+    reply_id = "" if reply is None else reply.get("id")
+
+    parts = []
+    image = None
+    for s in segments:
+        if s.type == "text":
+            parts.append(s.raw)
+        elif reply is not None and s.raw == reply.raw:
+            continue
+        elif auto_escape:
+            parts.append(s.raw)
+        elif s.type == "at" and _is_word(s.get("qq")):
+            parts.append(f"<@!{s.get('qq')}>")
+        elif s.type == "image" and image is None:
+            image = s
+    if auto_escape or image is None:
+        return "".join(parts), reply_id, "", ""
+
+    img_url = ""
+    img_path = image.get("file", "")
+    if img_path.startswith("http"):
+        img_url = img_path
+    elif img_path.startswith("file:///"):
+        img_path = img_path[8:]
+    img_url = image.get("url", img_url)
+    return "".join(parts), reply_id, img_url, img_path
+
+
+def guild_text_to_cq(content: str) -> str:
+    """
+    频道消息内容转CQ码消息
+    """
+    return render_cq(parse_guild_text(content))
@@ -0,0 +1,249 @@
+import os
+import hashlib
+import threading
+import typing as t
+from collections import OrderedDict
+from bot_api import cache
+from bot_api import singleflight
+from bot_api import transport
+from . import tools
+
+_CHUNK_SIZE = 64 * 1024
+_EXTENSIONS = {"image/png": ".png", "image/gif": ".gif", "image/webp": ".webp", "image/bmp": ".bmp"}
+
+
+class ImageCache:
+    def __init__(self, directory: str, max_bytes=256 * 1024 * 1024, url_ttl=3600.0, source_ttl=3600.0,
+                 http: t.Optional[transport.HttpTransport] = None):
+        """
+        发送图片用的本地缓存: 网络图片按内容哈希保存, 相同内容只保存一份; img_to_url 的结果按内容缓存, 相同图片不再重复上传
+        :param directory: 缓存目录
+        :param max_bytes: 缓存目录占用上限(字节), 超出后删除最久未使用的文件
+        :param url_ttl: img_to_url 结果的缓存秒数, 0为不缓存
+        :param source_ttl: 图片url对应内容的缓存秒数, 期间相同url不再重新下载, 0为不缓存
+        :param http: 下载使用的HTTP连接池
+        """
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.http = http or transport.HttpTransport(pool_connections=4, pool_maxsize=8, timeout=(5, 60))
+        self._sources = cache.TTLCache(maxsize=4096, ttl=source_ttl)  # 图片url -> 内容哈希
+        self._uploaded = cache.TTLCache(maxsize=4096, ttl=url_ttl)  # 内容哈希 -> img_to_url 的结果
+        self._local = cache.TTLCache(maxsize=4096, ttl=source_ttl)  # (本地路径, 修改时间, 大小) -> 内容哈希
+        self._downloads = singleflight.SingleFlight()  # 同一url同时只下载一次
+        self._files: "OrderedDict[str, int]" = OrderedDict()  # 文件名 -> 大小, 按最近使用排序
+        self._pins: t.Dict[str, int] = {}  # 正在使用(调用 img_to_url)的文件, 不会被淘汰
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.downloads = 0
+        self.evicted = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+            return
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".part"):  # 上次未下载完成的文件
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self.total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _pin(self, name: str) -> bool:
+        """
+        标记文件正在使用, 使用完毕后需调用 _unpin
+        :return: 文件是否存在
+        """
+        with self._lock:
+            if name not in self._files:
+                return False
+            self._files.move_to_end(name)
+            self._pins[name] = self._pins.get(name, 0) + 1
+        try:
+            os.utime(self._path(name))  # 重启后仍按最近使用时间淘汰
+        except OSError:
+            pass
+        return True
+
+    def _unpin(self, name: str):
+        with self._lock:
+            count = self._pins.pop(name) - 1
+            if count:
+                self._pins[name] = count
+            self._evict()
+
+    def _add(self, name: str, size: int):
+        """
+        添加新下载的文件, 并标记为正在使用
+        """
+        with self._lock:
+            if name not in self._files:
+                self._files[name] = size
+                self.total_bytes += size
+            self._files.move_to_end(name)
+            self._pins[name] = self._pins.get(name, 0) + 1
+            self._evict()
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for name in list(self._files):
+            if self.total_bytes <= self.max_bytes or len(self._files) <= 1:
+                break
+            if name in self._pins:
+                continue
+            self.total_bytes -= self._files.pop(name)
+            self.evicted += 1
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+    def _download(self, url: str) -> str:
+        """
+        边下载边计算哈希, 写入临时文件后以 <sha256><扩展名> 命名
+        :return: 文件名, 已标记为正在使用
+        """
+        part = self._path(tools.generate_randstring(16) + ".part")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with self.http.request("GET", url, stream=True) as response:
+                response.raise_for_status()
+                ext = _EXTENSIONS.get(response.headers.get("Content-Type", "").split(";")[0].strip(), ".jpg")
+                with open(part, "wb") as f:
+                    for chunk in response.iter_content(_CHUNK_SIZE):
+                        digest.update(chunk)
+                        f.write(chunk)
+                        size += len(chunk)
+            name = digest.hexdigest() + ext
+            if self._pin(name):  # 内容相同的图片已存在
+                os.remove(part)
+            else:
+                os.replace(part, self._path(name))
+                self._add(name, size)
+        except BaseException:
+            if os.path.exists(part):
+                os.remove(part)
+            raise
+        self.downloads += 1
+        return name
+
+    def _fetch(self, url: str) -> str:
+        """
+        :return: 文件名, 已标记为正在使用
+        """
+        for _ in range(3):
+            name = self._sources.get(url)
+            if name is not None and self._pin(name):
+                return name
+            leader = []
+
+            def download():
+                leader.append(True)
+                return self._download(url)
+            name = self._downloads.do(url, download)
+            self._sources.set(url, name)
+            if leader or self._pin(name):  # 同时等待同一下载的调用需要各自标记
+                return name
+        raise OSError(f"图片缓存空间不足, 下载后立即被淘汰: {url}")
+
+    def fetch(self, url: str) -> str:
+        """
+        获取网络图片的本地缓存文件名, 未缓存时下载
+        """
+        name = self._fetch(url)
+        self._unpin(name)
+        return name
+
+    def _local_key(self, path: str) -> str:
+        stat = os.stat(path)
+        key = (path, stat.st_mtime, stat.st_size)
+        digest = self._local.get(key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                    h.update(chunk)
+            digest = h.hexdigest()
+            self._local.set(key, digest)
+        return digest
+
+    def to_url(self, func_img_to_url: t.Callable[[str], str], img_url="", img_path="") -> str:
+        """
+        将图片转为可发送的url, 相同内容的图片只调用一次 func_img_to_url
+        :param func_img_to_url: 注册的图片转url方法, 参数为本地图片路径
+        :param img_url: 网络图片url
+        :param img_path: 本地图片路径
+        """
+        if img_url != "":
+            name = self._sources.get(img_url)
+            if name is not None:  # 已上传过的图片, 即使本地文件已被淘汰也无需再次下载
+                uploaded = self._uploaded.get(name)
+                if uploaded is not None:
+                    return uploaded
+            name = self._fetch(img_url)
+            try:
+                return self._upload(func_img_to_url, name, self._path(name))
+            finally:
+                self._unpin(name)
+        if img_path != "":
+            try:
+                key = self._local_key(img_path)
+            except OSError:  # 文件不存在等, 交由 func_img_to_url 处理
+                return func_img_to_url(img_path)
+            return self._upload(func_img_to_url, key, img_path)
+        return ""
+
+    def _upload(self, func_img_to_url: t.Callable[[str], str], key: str, path: str) -> str:
+        uploaded = self._uploaded.get(key)
+        if uploaded is None:
+            uploaded = func_img_to_url(path)
+            if uploaded:
+                self._uploaded.set(key, uploaded)
+        return uploaded
+
+    def get_stats(self) -> dict:
+        """
+        :return: files-缓存文件数; bytes-占用字节数; max_bytes-占用上限; downloads-下载次数; evicted-淘汰的文件数;
+                 uploaded_hits-复用 img_to_url 结果的次数
+        """
+        with self._lock:
+            files = len(self._files)
+        return {"files": files, "bytes": self.total_bytes, "max_bytes": self.max_bytes, "downloads": self.downloads,
+                "evicted": self.evicted, "uploaded_hits": self._uploaded.hits}
+
+
+_image_cache: t.Optional[ImageCache] = None
+_image_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageCache:
+    """
+    CQ码发送图片使用的全局图片缓存, 默认位于 server/temp, 占用上限 256MB
+    """
+    global _image_cache
+    if _image_cache is None:
+        with _image_cache_lock:
+            if _image_cache is None:
+                _image_cache = ImageCache(os.path.join(os.path.split(__file__)[0], "temp"))
+    return _image_cache
+
+
+def set_image_cache(image_cache: ImageCache):
+    """
+    替换全局图片缓存, 如 set_image_cache(ImageCache("/data/img", max_bytes=1024 ** 3))
+    """
+    global _image_cache
+    _image_cache = image_cache
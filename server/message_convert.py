@@ -1,11 +1,10 @@
 import time
 from bot_api import structs as msgs
+from bot_api import codec
 import dateutil.parser
-from . import tools
-import re
+from . import cq
+from . import image_cache
 from pydantic import BaseModel
-import os
-import requests
 
 
 def time2timestamp(time_iso8601: str):
@@ -13,61 +12,17 @@ def time2timestamp(time_iso8601: str):
     return int(d)
 
 
-def cq_to_guild_text(msg: str, func_img_to_url, auto_escape=False):
-    rmsg = msg[:]
-    reply = re.findall("\\[CQ:reply,id=\\w*]", msg)
-    if reply:  # 替换回复
-        reply_id = tools.gettext_between(rmsg, "[CQ:reply,id=", "]")
-        rmsg = rmsg.replace(reply[0], "")
-    else:
-        reply_id = ""
-
-    if auto_escape:
-        return (rmsg, reply_id, "")
-
-    at = re.findall("\\[CQ:at,qq=\\w*]", msg)
-    for _a in at:  # 替换艾特
-        rmsg = rmsg.replace(_a, f"<@!{tools.gettext_between(_a, '[CQ:at,qq=', ']')}>")
-
+def cq_to_guild_text(msg: str, func_img_to_url, auto_escape=False, logger=None):
+    rmsg, reply_id, img_url, img_path = cq.compile_to_guild(msg, bool(auto_escape))
 
     ret_img_url = ""
-    spath = os.path.split(__file__)[0]
-    img = re.findall("\\[CQ:image,[^]]*]", rmsg)
-    img_url = ""
-    img_path = ""
-    for im in img:
-        ps = tools.gettext_between(im, "[CQ:image,", "]")
-        _file = re.findall("file=[^,]*", ps)  # 查找file参数
-        if _file:
-            img_path = _file[0][len("file="):-1 if _file[0].endswith(',') else None]
-            if img_path.startswith("http"):
-                img_url = img_path
-            elif img_path.startswith("file:///"):
-                img_path = img_path[8:]
-
-        _url = re.findall("url=[^,]*", ps)  # 查找url参数
-        if _url:
-            img_url = _url[0][len("url="):-1 if _url[0].endswith(',') else None]
-        break  # 仅支持一张图
-
-    for im in img:
-        rmsg = rmsg.replace(im, "", 1)  # 清除图片cq码
-
     if callable(func_img_to_url):
-        if img_url != "":  # 参数为url
-            save_name = tools.generate_randstring() + ".jpg"
-            if not os.path.isdir(f"{spath}/temp"):
-                os.mkdir(f"{spath}/temp")
-            with open(f"{spath}/temp/{save_name}", "wb") as f:
-                f.write(requests.get(img_url).content)
-            ret_img_url = func_img_to_url(f"{spath}/temp/{save_name}")
-
-        elif img_path != "":  # 参数为path
-            ret_img_url = func_img_to_url(img_path)
-
-    others_cq = re.findall("\\[CQ:[^]]*]", rmsg)
-    for ocq in others_cq:
-        rmsg = rmsg.replace(ocq, "", 1)  # 去除其它不受支持的CQ码
+        try:
+            ret_img_url = image_cache.get_image_cache().to_url(func_img_to_url, img_url, img_path)
+        except Exception as sb:  # 图片下载/上传失败时仅发送文字
+            if logger is not None:
+                logger(f"图片处理失败, 将不发送图片: {repr(sb)}", warning=True)
+            ret_img_url = ""
 
     return (rmsg, reply_id, ret_img_url)
 
@@ -81,14 +36,6 @@ def guild_at_msg_to_groupmsg(msg: msgs.Message, selfid) -> dict:
     :return:
     """
 
-    def cq_code_convert(msgcontent: str):
-        retmsg = msgcontent[:]
-        at_msgs = re.findall("<@!\\d*>", msgcontent)
-        for _at in at_msgs:
-            retmsg = retmsg.replace(_at, f"[CQ:at,qq={tools.gettext_between(retmsg, '<@!', '>')}]", 1)
-
-        return retmsg
-
     img_cq = ""
     if msg.attachments is not None:  # 判断图片
         for _im in msg.attachments:
@@ -122,7 +69,7 @@ def guild_at_msg_to_groupmsg(msg: msgs.Message, selfid) -> dict:
         "userguildid": msg.author.id,
         "user_id": msg.author.id,
         "anonymous": None,
-        "message": cq_code_convert(msg.content) + img_cq,
+        "message": cq.guild_text_to_cq(msg.content) + img_cq,
         "raw_message": msg.content,
         "font": -1,
         "sender": {
@@ -219,3 +166,49 @@ def others_event(selfid, post_type, notice_type, sub_type, data: BaseModel, user
     }
 
     return retdata
+
+
+def action_failed(retcode: int, msg: str) -> dict:
+    return {
+        "status": "failed",
+        "retcode": retcode,
+        "data": None,
+        "msg": msg
+    }
+
+
+def action_response(data, echo=None) -> dict:
+    """
+    将API返回的数据转为OneBot响应格式, 用于WebSocket
+    :param data: call_action 的返回值
+    :param echo: 请求中的echo字段
+    """
+    if isinstance(data, (str, bytes)):
+        try:
+            data = codec.loads(data)
+        except ValueError:
+            pass
+    if isinstance(data, dict) and "retcode" in data:
+        retdata = dict(data)
+    elif isinstance(data, dict) and "code" in data and "message" in data and "id" not in data:  # SDK返回的错误信息
+        retdata = action_failed(data["code"], data["message"])
+    else:
+        retdata = {
+            "status": "ok",
+            "retcode": 0,
+            "data": data
+        }
+    if echo is not None:
+        retdata["echo"] = echo
+    return retdata
+
+
+def lifecycle_event(selfid, sub_type="connect") -> dict:
+    retdata = {
+        "time": int(time.time()),
+        "self_id": selfid,
+        "post_type": "meta_event",
+        "meta_event_type": "lifecycle",
+        "sub_type": sub_type
+    }
+    return retdata
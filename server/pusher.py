@@ -0,0 +1,125 @@
+import time
+import threading
+import typing as t
+from collections import deque
+from bot_api import transport
+from bot_api import retry
+
+
+class EventPusher:
+    def __init__(self, url: str, logger: t.Callable[..., t.Any], max_queue=1000, batch_size=1, batch_interval=0.0,
+                 max_retries=5, retry_policy: t.Optional[retry.RetryPolicy] = None,
+                 http: t.Optional[transport.HttpTransport] = None):
+        """
+        事件上报队列: 由一个后台线程按顺序通过同一个长连接POST到上报地址, 上报地址不可用时退避重试
+        :param url: 上报地址
+        :param logger: 日志函数, 同 BotApp.logger
+        :param max_queue: 队列长度上限, 已满时丢弃最早的事件
+        :param batch_size: 每次POST最多包含的事件数. 大于1时请求体为事件的JSON数组, 需要上报端支持
+        :param batch_interval: 每次POST前等待的秒数, 用于收集更多事件
+        :param max_retries: 单次POST的最大重试次数, 超过后丢弃这批事件. None为一直重试
+        :param retry_policy: 退避策略, 默认 0.5 秒起, 最长 30 秒
+        :param http: HTTP连接池, 默认新建一个只保持一个连接的连接池
+        """
+        self.url = url
+        self.logger = logger
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval
+        self.max_retries = max_retries
+        self.retry_policy = retry_policy or retry.RetryPolicy(base_delay=0.5, max_delay=30.0)
+        self.http = http or transport.HttpTransport(pool_connections=1, pool_maxsize=1)
+        self._queue: t.Deque[bytes] = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._sending = False
+        self._worker: t.Optional[threading.Thread] = None
+        self.pushed = 0
+        self.sent = 0
+        self.requests = 0
+        self.retries = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def push(self, msg: bytes):
+        """
+        提交一个已编码的事件, 不阻塞
+        """
+        with self._lock:
+            self.pushed += 1
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 100 == 0:
+                    self.logger(f"推送队列已满, 已丢弃 {self.dropped} 个事件", warning=True)
+            self._queue.append(msg)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="bot-event-pusher", daemon=True)
+                self._worker.start()
+            self._not_empty.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._not_empty.wait_for(lambda: self._queue)
+                self._sending = True
+            if self.batch_interval > 0:
+                time.sleep(self.batch_interval)
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            try:
+                self._post(batch)
+            finally:
+                with self._lock:
+                    self._sending = False
+                    if not self._queue:
+                        self._idle.notify_all()
+
+    def _post(self, batch: t.List[bytes]):
+        if len(batch) == 1:
+            body = batch[0]
+        else:
+            body = b"[" + b",".join(batch) + b"]"
+        self.logger(lambda: f"推送事件: {body.decode('utf-8')}", debug=True)
+
+        attempt = 0
+        while True:
+            self.requests += 1
+            try:
+                response = self.http.request("POST", self.url, data=body, headers={"Content-Type": "application/json"})
+            except Exception as sb:
+                error = sb
+            else:
+                if response.status_code < 500:
+                    self.sent += len(batch)
+                    return
+                error = f"HTTP {response.status_code}"
+
+            if self.max_retries is not None and attempt >= self.max_retries:
+                self.failed += len(batch)
+                self.logger(f"推送事件失败: {error}, 已丢弃 {len(batch)} 个事件", error=True)
+                return
+            delay = self.retry_policy.backoff(attempt)
+            self.logger(f"推送事件失败: {error}, {delay:.1f} 秒后重试", warning=True)
+            self.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def flush(self, timeout: t.Optional[float] = None) -> bool:
+        """
+        等待队列中的事件全部推送完毕
+        :return: 是否在超时前推送完毕
+        """
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._queue and not self._sending, timeout)
+
+    def get_stats(self) -> dict:
+        """
+        :return: pushed-提交的事件数; sent-推送成功的事件数; requests-HTTP请求数; retries-重试次数;
+                 failed-重试耗尽后丢弃的事件数; dropped-队列已满时丢弃的事件数; pending-等待推送的事件数
+        """
+        with self._lock:
+            pending = len(self._queue)
+        return {"pushed": self.pushed, "sent": self.sent, "requests": self.requests, "retries": self.retries,
+                "failed": self.failed, "dropped": self.dropped, "pending": pending}
@@ -1,26 +1,44 @@
-import json
-
+import typing as t
 import bot_api
+from bot_api import codec
 from . import message_convert
-from . import tools
-import requests
+from . import pusher
 
 
 class MessageSender:
-    def __init__(self, bot_app: bot_api.BotApp, ip_call: str, port_call: int):
+    def __init__(self, bot_app: bot_api.BotApp, ip_call: str, port_call: int, push_queue_size=1000,
+                 push_batch_size=1, push_max_retries=5):
+        """
+        :param ip_call: 事件上报ip, 为 None 时不通过HTTP上报(例如只使用WebSocket)
+        :param push_queue_size: 事件上报队列长度上限, 已满时丢弃最早的事件
+        :param push_batch_size: 每次上报最多包含的事件数, 大于1时请求体为事件的JSON数组
+        :param push_max_retries: 上报失败时的最大重试次数, None为一直重试
+        """
         self.bot = bot_app
         self.ip_call = ip_call
         self.port_call = port_call
+        self.pusher = None if ip_call is None else \
+            pusher.EventPusher(f"http://{ip_call}:{port_call}", self.bot.logger, max_queue=push_queue_size,
+                               batch_size=push_batch_size, max_retries=push_max_retries)
+        self._event_sinks: t.List[t.Callable[[bytes], t.Any]] = []
+
+    def add_event_sink(self, sink: t.Callable[[bytes], t.Any]):
+        """
+        添加事件接收方(如WebSocket连接), 每个事件编码后调用一次, 不应阻塞
+        """
+        self._event_sinks.append(sink)
 
+    def _send_request(self, msg: bytes):
+        if self.pusher is not None:
+            self.pusher.push(msg)
+        for sink in self._event_sinks:
+            sink(msg)
 
-    @tools.on_new_thread
-    def _send_request(self, msg: str, method="POST"):
-        try:
-            self.bot.logger(f"推送事件: {msg}", debug=True)
-            headers = {'Content-Type': 'application/json'}
-            requests.request(method=method, url=f"http://{self.ip_call}:{self.port_call}", data=msg, headers=headers)
-        except Exception as sb:
-            self.bot.logger(f"推送事件失败: {sb}", error=True)
+    def get_push_stats(self) -> dict:
+        """
+        事件上报统计, 见 EventPusher.get_stats
+        """
+        return {} if self.pusher is None else self.pusher.get_stats()
 
     def reg_bot_at_message(self):
         """
@@ -93,7 +111,7 @@ class MessageSender:
                                                           sub_type=notice_type,
                                                           user_id="", guiid_id=event.guild_id, channel_id=event.id,
                                                           data=event)
-            self._send_request(json.dumps(converted_json))
+            self._send_request(codec.dumps_bytes(converted_json))
         return send_channel
 
     def _get_guild_change(self, notice_type):
@@ -102,14 +120,14 @@ class MessageSender:
                                                           post_type="notice", notice_type=notice_type,
                                                           sub_type=notice_type,
                                                           user_id="", guiid_id=event.id, channel_id="", data=event)
-            self._send_request(json.dumps(converted_json))
+            self._send_request(codec.dumps_bytes(converted_json))
         return send_guild
 
     def _get_guild_member_change(self, is_useradd: bool):
         def send_member_change(event: bot_api.structs.MemberWithGuildID):
             converted_json = message_convert.guild_member_change_convert(event, self.bot.get_self_info(use_cache=True).id,
                                                                          is_useradd=is_useradd)
-            self._send_request(json.dumps(converted_json))
+            self._send_request(codec.dumps_bytes(converted_json))
         return send_member_change
 
     def _get_at_message(self, chain: bot_api.structs.Message):
@@ -117,4 +135,4 @@ class MessageSender:
                         f"内用户: {chain.author.username}({chain.author.id}) 的消息: {chain.content} ({chain.id})")
 
         converted_json = message_convert.guild_at_msg_to_groupmsg(chain, self.bot.get_self_info(use_cache=True).id)
-        self._send_request(json.dumps(converted_json))
+        self._send_request(codec.dumps_bytes(converted_json))
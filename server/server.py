@@ -1,18 +1,24 @@
-import json
-from flask import Flask, jsonify
+import typing as t
+from flask import Flask, Response
 from flask import request
 from waitress import serve as wserve
 from . import sender
 from . import tools
 from . import message_convert
+from . import ws_transport
+from . import async_server
 import bot_api
+from bot_api import codec
 
 flask = Flask(__name__)
 
 
 class BotServer(sender.MessageSender):
+    ACTIONS = ("send_group_msg", "get_self_info", "get_self_guild_list", "get_group_member_info", "get_channel_info",
+               "get_channel_list", "get_message", "get_guild_info")
+
     def __init__(self, bot_app: bot_api.BotApp, ip_call: str, port_call: int, ip_listen: str, port_listen: int,
-                 allow_push=False):
+                 allow_push=False, push_queue_size=1000, push_batch_size=1, push_max_retries=5):
         """
         启动HTTP上报器
         :param bot_app: BotAPP
@@ -21,84 +27,105 @@ class BotServer(sender.MessageSender):
         :param ip_listen: POST上报ip
         :param port_listen: POST上报端口
         :param allow_push: 是否允许发送主动推送消息(即消息内不含CQ码: [CQ:reply,id=...])
+        :param push_queue_size: Event上报队列长度上限, 已满时丢弃最早的Event
+        :param push_batch_size: 每次上报最多包含的Event数, 大于1时请求体为Event的JSON数组
+        :param push_max_retries: 上报失败时的最大重试次数, None为一直重试
         """
-        super().__init__(bot_app, ip_call, port_call)
+        super().__init__(bot_app, ip_call, port_call, push_queue_size, push_batch_size, push_max_retries)
 
         self.ip_listen = ip_listen
         self.port_listen = port_listen
         self.allow_push = allow_push
-        self.cache = {}
+        self.http_server: t.Optional[async_server.AsyncHttpServer] = None
+
+    def call_action(self, action: str, params) -> t.Union[dict, str, bytes]:
+        """
+        调用API, HTTP 与 WebSocket 共用
+        :param action: API名称, 如 send_group_msg
+        :param params: 参数, dict 或 request.args
+        :return: 返回数据, SDK返回的json文本原样返回
+        """
+        if action not in self.ACTIONS:
+            return message_convert.action_failed(1404, f"不支持的API: {action}")
+        return getattr(self, action)(params)
 
-    def send_group_msg(self):
-        channel_id = request.args.get("group_id")
-        message = request.args.get("message")
-        auto_escape = request.args.get("auto_escape")
+    def send_group_msg(self, params):
+        channel_id = params.get("group_id")
+        message = params.get("message")
+        auto_escape = params.get("auto_escape")
 
-        cmsg, reply_msg_id, img_url = message_convert.cq_to_guild_text(message, self.bot.img_to_url, auto_escape)
+        cmsg, reply_msg_id, img_url = message_convert.cq_to_guild_text(message, self.bot.img_to_url, auto_escape,
+                                                                        self.bot.logger)
         if not self.allow_push and reply_msg_id == "":
             self.bot.logger("不发送允许PUSH消息, 请添加回复id, 或者将\"allow_push\"设置为True", warning=True)
-        else:
-            sendmsg = self.bot.api_send_message(channel_id, reply_msg_id, cmsg, img_url, retstr=True)
-            sdata = json.loads(sendmsg)
-            if "id" in sdata:
-                ret = {
-                    "data": {
-                        "message_id": sdata["id"]
-                    },
-                    "retcode": 0,
-                    "status": "ok"
-                }
-            else:
-                ret = sdata
-
-            return jsonify(ret)
-
-    def get_self_info(self):
-        use_cache = request.args.get("cache")
+            return message_convert.action_failed(100, "不允许发送主动推送消息")
+
+        sendmsg = self.bot.api_send_message(channel_id, reply_msg_id, cmsg, img_url, retstr=True)
+        sdata = codec.loads(sendmsg)
+        if "id" in sdata:
+            return {
+                "data": {
+                    "message_id": sdata["id"]
+                },
+                "retcode": 0,
+                "status": "ok"
+            }
+        return sdata
+
+    def get_self_info(self, params):
+        use_cache = params.get("cache")
         selfinfo = self.bot.get_self_info(use_cache)
-        return jsonify(message_convert.self_info_convert_to_json(selfinfo))
-
-    def get_group_member_info(self):
-        group_id = request.args.get("group_id")
-        user_id = request.args.get("user_id")
-        no_cache = request.args.get("no_cache")
-
-        if not no_cache and f"get_group_member_info_{group_id}_{user_id}" in self.cache:
-            data = self.cache[f"get_group_member_info_{group_id}_{user_id}"]
-        else:
-            data = message_convert.guild_member_info_convert(self.bot.get_guild_user_info(group_id, user_id), group_id)
-            self.cache[f"get_group_member_info_{group_id}_{user_id}"] = data
-        return jsonify(data)
-
-    def get_channel_info(self):
-        channel_id = request.args.get("channel_id")
-        data = self.bot.get_channel_info(channel_id, retstr=True)
-        return jsonify(json.loads(data))
-
-    def get_channel_list(self):
-        guild_id = request.args.get("guild_id")
-        data = self.bot.get_guild_channel_list(guild_id, retstr=True)
-        return jsonify(json.loads(data))
-
-    def get_message(self):
-        channel_id = request.args.get("channel_id")
-        message_id = request.args.get("message_id")
-        data = self.bot.get_message(channel_id, message_id, retstr=True)
-        return jsonify(json.loads(data))
-
-    def get_self_guild_list(self):
-        cache = request.args.get("cache")
-        before = "" if request.args.get("before") is None else request.args.get("before")
-        after = "" if request.args.get("after") is None else request.args.get("before")
-        limit = 100 if request.args.get("limit") is None else request.args.get("limit")
-        data = self.bot.get_self_guilds(before=before, after=after, limit=limit, use_cache=cache, retstr=True)
-        return jsonify(json.loads(data))
-
-    def get_guild_info(self):
-        guild_id = request.args.get("guild_id")
-        data = self.bot.get_guild_info(guild_id, retstr=True)
-        return jsonify(json.loads(data))
+        return message_convert.self_info_convert_to_json(selfinfo)
+
+    def get_group_member_info(self, params):
+        group_id = params.get("group_id")
+        user_id = params.get("user_id")
+        no_cache = params.get("no_cache")
+
+        member = self.bot.get_guild_user_info(group_id, user_id, use_cache=not no_cache)
+        return message_convert.guild_member_info_convert(member, group_id)
+
+    def get_channel_info(self, params):
+        return self.bot.get_channel_info(params.get("channel_id"), retstr=True)
+
+    def get_channel_list(self, params):
+        return self.bot.get_guild_channel_list(params.get("guild_id"), retstr=True)
+
+    def get_message(self, params):
+        return self.bot.get_message(params.get("channel_id"), params.get("message_id"), retstr=True)
+
+    def get_self_guild_list(self, params):
+        cache = params.get("cache")
+        before = "" if params.get("before") is None else params.get("before")
+        after = "" if params.get("after") is None else params.get("after")
+        limit = 100 if params.get("limit") is None else params.get("limit")
+        return self.bot.get_self_guilds(before=before, after=after, limit=limit, use_cache=cache, retstr=True)
+
+    def get_guild_info(self, params):
+        return self.bot.get_guild_info(params.get("guild_id"), retstr=True)
+
+    def _flask_view(self, action: str):
+        def view():
+            params = request.args.to_dict()
+            if request.method == "POST":
+                body = request.get_json(silent=True)
+                params.update(body if isinstance(body, dict) else request.form.to_dict())
+            try:
+                data = self.call_action(action, params)
+            except Exception as sb:
+                self.bot.logger(f"HTTP API调用失败: {action} {repr(sb)}", error=True)
+                data = message_convert.action_failed(1500, repr(sb))
+            return self._json_response(data)
+        view.__name__ = action
+        return view
 
+    @staticmethod
+    def _json_response(data) -> Response:
+        """
+        API返回的json文本直接原样返回, 不再解析后重新编码
+        """
+        body = data if isinstance(data, (str, bytes)) else codec.dumps_bytes(data)
+        return Response(body, mimetype="application/json")
 
     @staticmethod
     @flask.route("/mark_msg_as_read")
@@ -106,17 +133,48 @@ class BotServer(sender.MessageSender):
         return "ok"
 
     @tools.on_new_thread
-    def listening_server_start(self):
-        flask.route("/send_group_msg", methods=["GET", "POST"])(self.send_group_msg)
-        flask.route("/get_self_info", methods=["GET", "POST"])(self.get_self_info)
-        flask.route("/get_self_guild_list", methods=["GET", "POST"])(self.get_self_guild_list)
-        flask.route("/get_group_member_info", methods=["GET", "POST"])(self.get_group_member_info)
-        flask.route("/get_channel_info", methods=["GET", "POST"])(self.get_channel_info)
-        flask.route("/get_channel_list", methods=["GET", "POST"])(self.get_channel_list)
-        flask.route("/get_message", methods=["GET", "POST"])(self.get_message)
-        flask.route("/get_guild_info", methods=["GET", "POST"])(self.get_guild_info)
+    def listening_server_start(self, async_mode=False):
+        """
+        启动HTTP API服务器
+        :param async_mode: 使用 aiohttp 异步服务器代替 Flask + waitress, 调用SDK时不占用工作线程, 需要安装 aiohttp
+        """
+        if async_mode:
+            self.http_server = async_server.AsyncHttpServer(self, self.ip_listen, self.port_listen)
+            if self.ip_call is not None:
+                self.bot.logger(f"Event回报地址: {self.ip_call}:{self.port_call}")
+            self.bot.logger(f"异步POST上报器启动: {self.ip_listen}:{self.port_listen}")
+            self.http_server.run()
+            return
+
+        for action in self.ACTIONS:
+            flask.route(f"/{action}", methods=["GET", "POST"])(self._flask_view(action))
 
         # flask.run(self.ip_listen, self.port_listen)
-        self.bot.logger(f"Event回报地址: {self.ip_call}:{self.port_call}")
+        if self.ip_call is not None:
+            self.bot.logger(f"Event回报地址: {self.ip_call}:{self.port_call}")
         self.bot.logger(f"POST上报器启动: {self.ip_listen}:{self.port_listen}")
         wserve(flask, host=self.ip_listen, port=self.port_listen)
+
+    def reverse_ws_start(self, url: str, access_token: t.Optional[str] = None, reconnect_interval=3.0):
+        """
+        启动反向WebSocket, 连接到 url 推送Event并接收API调用
+        :param url: 如 ws://127.0.0.1:8080/onebot/v11/ws
+        :param access_token: 鉴权token
+        :param reconnect_interval: 断开后重连间隔(秒)
+        """
+        client = ws_transport.ReverseWebSocket(self, url, access_token, reconnect_interval)
+        self.add_event_sink(client.send_event)
+        client.start()
+        return client
+
+    def forward_ws_start(self, ip: str, port: int, access_token: t.Optional[str] = None):
+        """
+        启动正向WebSocket服务器, 需要安装 aiohttp
+        :param ip: 监听ip
+        :param port: 监听端口
+        :param access_token: 鉴权token
+        """
+        ws_server = ws_transport.ForwardWebSocketServer(self, ip, port, access_token)
+        self.add_event_sink(ws_server.send_event)
+        ws_server.start()
+        return ws_server
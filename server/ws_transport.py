@@ -0,0 +1,241 @@
+import time
+import asyncio
+import threading
+import typing as t
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import websocket
+from bot_api import codec
+from . import message_convert
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:  # 仅正向WebSocket需要
+    aiohttp = None
+    web = None
+
+
+def _self_id(server) -> str:
+    info = server.bot.get_self_info(use_cache=True)
+    return "" if info is None else info.id
+
+
+def _handle_frame(server, frame) -> dict:
+    """
+    处理一个API调用帧: {"action": ..., "params": {...}, "echo": ...}
+    """
+    if not isinstance(frame, dict):
+        return message_convert.action_failed(1400, "请求格式错误")
+    echo = frame.get("echo")
+    try:
+        data = server.call_action(str(frame.get("action", "")), frame.get("params") or {})
+    except Exception as sb:
+        server.bot.logger(f"WebSocket API调用失败: {repr(sb)}", error=True)
+        return message_convert.action_response(message_convert.action_failed(1500, repr(sb)), echo)
+    return message_convert.action_response(data, echo)
+
+
+class ReverseWebSocket:
+    def __init__(self, server, url: str, access_token: t.Optional[str] = None, reconnect_interval=3.0,
+                 max_queue=1000, workers=8):
+        """
+        反向WebSocket: 主动连接到上报端(Universal), 同一个连接上推送事件和接收API调用, 断开后自动重连
+        :param server: BotServer
+        :param url: 上报端地址, 如 ws://127.0.0.1:8080/onebot/v11/ws
+        :param access_token: 鉴权token, 以 Authorization: Bearer 发送
+        :param reconnect_interval: 断开后重连间隔(秒)
+        :param max_queue: 未连接时缓存的事件数上限, 已满时丢弃最早的事件
+        :param workers: 处理API调用的线程数
+        """
+        self.server = server
+        self.url = url
+        self.access_token = access_token
+        self.reconnect_interval = reconnect_interval
+        self._pending: t.Deque[str] = deque(maxlen=max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bot-ws-action")
+        self._lock = threading.Lock()
+        self._ws: t.Optional[websocket.WebSocketApp] = None
+        self._connected = False
+
+    def start(self):
+        threading.Thread(target=self._run_forever, name="bot-ws-reverse", daemon=True).start()
+
+    def _run_forever(self):
+        while True:
+            headers = {"X-Self-ID": str(_self_id(self.server)), "X-Client-Role": "Universal"}
+            if self.access_token:
+                headers["Authorization"] = f"Bearer {self.access_token}"
+            ws = websocket.WebSocketApp(self.url, header=headers, on_open=self._on_open,
+                                        on_message=self._on_message, on_error=self._on_error)
+            self._ws = ws
+            ws.run_forever()
+            with self._lock:
+                self._connected = False
+            self.server.bot.logger(f"反向WebSocket连接断开, {self.reconnect_interval} 秒后重连", warning=True)
+            time.sleep(self.reconnect_interval)
+
+    def _on_open(self, ws: websocket.WebSocketApp):
+        self.server.bot.logger(f"反向WebSocket已连接: {self.url}")
+        with self._lock:
+            ws.send(codec.dumps(message_convert.lifecycle_event(_self_id(self.server))))
+            while self._pending:  # 按顺序补发断开期间的事件
+                ws.send(self._pending.popleft())
+            self._connected = True
+
+    def _on_error(self, ws: websocket.WebSocketApp, error):
+        self.server.bot.logger(f"反向WebSocket错误: {error}", error=True)
+
+    def _on_message(self, ws: websocket.WebSocketApp, message):
+        try:
+            frame = codec.loads(message)
+        except ValueError:
+            ws.send(codec.dumps(message_convert.action_failed(1400, "请求格式错误")))
+            return
+        self._executor.submit(self._reply, ws, frame)
+
+    def _reply(self, ws: websocket.WebSocketApp, frame):
+        response = codec.dumps(_handle_frame(self.server, frame))
+        try:
+            ws.send(response)
+        except Exception as sb:
+            self.server.bot.logger(f"WebSocket API响应发送失败: {repr(sb)}", error=True)
+
+    def send_event(self, msg: bytes):
+        text = msg.decode("utf-8")
+        with self._lock:
+            if self._connected:
+                try:
+                    self._ws.send(text)
+                    return
+                except Exception as sb:
+                    self._connected = False
+                    self.server.bot.logger(f"反向WebSocket推送事件失败: {repr(sb)}", error=True)
+            self._pending.append(text)
+
+
+class ForwardWebSocketServer:
+    def __init__(self, server, host: str, port: int, access_token: t.Optional[str] = None, max_queue=1000, workers=8):
+        """
+        正向WebSocket服务器, 路径: / (事件和API), /api (仅API), /event (仅事件)
+        :param server: BotServer
+        :param host: 监听ip
+        :param port: 监听端口
+        :param access_token: 鉴权token, 客户端通过 Authorization 请求头或 access_token 参数传入
+        :param max_queue: 每个连接等待发送的事件数上限, 以及启动完成前/没有事件连接时缓存的事件数上限, 已满时丢弃最早的事件
+        :param workers: 处理API调用的线程数
+        """
+        if aiohttp is None:
+            raise ImportError("正向WebSocket需要安装 aiohttp: pip install aiohttp")
+        self.server = server
+        self.host = host
+        self.port = port
+        self.access_token = access_token
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bot-ws-action")
+        self._loop: t.Optional[asyncio.AbstractEventLoop] = None
+        self._clients: t.Set[asyncio.Queue] = set()
+        self._pending: t.Deque[str] = deque(maxlen=max_queue)  # 没有事件连接时的事件, 发送给第一个连接
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._serve, name="bot-ws-forward", daemon=True).start()
+
+    def _serve(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = web.Application()
+        app.router.add_get("/", self._universal)
+        app.router.add_get("/api", self._api)
+        app.router.add_get("/event", self._event)
+        runner = web.AppRunner(app)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, self.host, self.port).start())
+        with self._lock:  # 此后 _pending 只在事件循环线程中访问
+            self._loop = loop
+        self.server.bot.logger(f"正向WebSocket服务器启动: {self.host}:{self.port}")
+        loop.run_forever()
+
+    def _authorized(self, request: "web.Request") -> bool:
+        if not self.access_token:
+            return True
+        token = request.headers.get("Authorization", "")
+        for prefix in ("Bearer ", "Token "):
+            if token.startswith(prefix):
+                token = token[len(prefix):]
+        return token == self.access_token or request.query.get("access_token") == self.access_token
+
+    async def _universal(self, request: "web.Request"):
+        return await self._handle(request, api=True, event=True)
+
+    async def _api(self, request: "web.Request"):
+        return await self._handle(request, api=True, event=False)
+
+    async def _event(self, request: "web.Request"):
+        return await self._handle(request, api=False, event=True)
+
+    async def _handle(self, request: "web.Request", api: bool, event: bool):
+        if not self._authorized(request):
+            return web.Response(status=401)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        queue = None
+        writer = None
+        if event:
+            queue = asyncio.Queue()
+            writer = asyncio.ensure_future(self._write_events(ws, queue))
+            writer.add_done_callback(self._log_task_error)
+            self_id = await self._loop.run_in_executor(self._executor, _self_id, self.server)
+            queue.put_nowait(codec.dumps(message_convert.lifecycle_event(self_id)))
+            while self._pending:  # 按顺序补发之前缓存的事件
+                queue.put_nowait(self._pending.popleft())
+            self._clients.add(queue)
+        try:
+            async for msg in ws:
+                if api and msg.type == aiohttp.WSMsgType.TEXT:
+                    asyncio.ensure_future(self._reply(ws, msg.data)).add_done_callback(self._log_task_error)
+        finally:
+            if queue is not None:
+                self._clients.discard(queue)
+                writer.cancel()
+        return ws
+
+    async def _reply(self, ws: "web.WebSocketResponse", text: str):
+        try:
+            frame = codec.loads(text)
+        except ValueError:
+            response = message_convert.action_failed(1400, "请求格式错误")
+        else:
+            response = await self._loop.run_in_executor(self._executor, _handle_frame, self.server, frame)
+        if not ws.closed:
+            await ws.send_str(codec.dumps(response))
+
+    @staticmethod
+    async def _write_events(ws: "web.WebSocketResponse", queue: asyncio.Queue):
+        while not ws.closed:
+            await ws.send_str(await queue.get())
+
+    def _log_task_error(self, task: asyncio.Future):
+        if task.cancelled() or task.exception() is None:
+            return
+        self.server.bot.logger(f"正向WebSocket发送失败: {repr(task.exception())}", error=True)
+
+    def _broadcast(self, text: str):
+        if not self._clients:
+            self._pending.append(text)
+            return
+        for queue in self._clients:
+            if queue.qsize() >= self.max_queue:
+                queue.get_nowait()
+            queue.put_nowait(text)
+
+    def send_event(self, msg: bytes):
+        """
+        可在任意线程调用
+        """
+        text = msg.decode("utf-8")
+        with self._lock:
+            if self._loop is None:  # 服务器尚未启动完成
+                self._pending.append(text)
+                return
+        self._loop.call_soon_threadsafe(self._broadcast, text)
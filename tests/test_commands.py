@@ -0,0 +1,54 @@
+from bot_api.commands import CommandRouter
+
+
+def _route(router, text):
+    routed = router.route(text)
+    return None if routed is None else (routed[0].__name__, routed[1], routed[2])
+
+
+def test_numbered_backreference_still_matches():
+    router = CommandRouter()
+
+    @router.pattern(r"(\w+)!")
+    def shout(event, *groups):
+        pass
+
+    @router.pattern(r"(\w+)\s+\1")
+    def repeat(event, *groups):
+        pass
+
+    assert _route(router, "yo!") == ("shout", ("yo",), {})
+    assert _route(router, "hey hey") == ("repeat", ("hey",), {})
+    assert _route(router, "hey you") is None
+
+
+def test_registration_order_across_pattern_kinds():
+    router = CommandRouter()
+
+    @router.pattern(r"(\d)\1")
+    def double(event, *groups):
+        pass
+
+    @router.pattern(r"\d+")
+    def number(event, *groups):
+        pass
+
+    assert _route(router, "112")[0] == "double"
+    assert _route(router, "12")[0] == "number"
+
+
+def test_case_insensitive_prefix_uses_original_offsets():
+    router = CommandRouter(case_sensitive=False)
+
+    @router.command("/İnfo")
+    def info(event, args):
+        pass
+
+    @router.command("/ΟΔΟΣ")
+    def road(event, args):
+        pass
+
+    assert _route(router, "/İNFO some Args") == ("info", ("some Args",), {})
+    assert _route(router, "/İnfoX") is None
+    assert _route(router, "/οδοσ 1") == ("road", ("1",), {})
+    assert _route(router, "/ΟΔΟΣ") == ("road", ("",), {})
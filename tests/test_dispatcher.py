@@ -0,0 +1,55 @@
+import threading
+import time
+import pytest
+from bot_api import dispatcher
+
+
+def test_base_dispatcher_is_abstract():
+    with pytest.raises(TypeError):
+        dispatcher.BaseDispatcher()
+
+
+def _blocked_pool(**kwargs):
+    pool = dispatcher.create_dispatcher(dispatcher.DispatchMode.POOL, workers=1, queue_size=1, **kwargs)
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+    pool.submit(block)
+    started.wait()
+    pool.submit(lambda: None)  # 占满队列
+    return pool, release
+
+
+def test_full_queue_drops_without_blocking():
+    pool, release = _blocked_pool()
+    start = time.perf_counter()
+    pool.submit(lambda: None)
+    pool.submit_nowait(lambda: None)
+    assert time.perf_counter() - start < 0.5
+    assert pool.get_stats()["dropped"] == 2
+    release.set()
+    pool.shutdown()
+
+
+def test_put_timeout_waits_but_submit_nowait_does_not():
+    pool, release = _blocked_pool(put_timeout=0.2)
+    start = time.perf_counter()
+    pool.submit(lambda: None)
+    assert time.perf_counter() - start >= 0.2
+    start = time.perf_counter()
+    pool.submit_nowait(lambda: None)
+    assert time.perf_counter() - start < 0.1
+    assert pool.get_stats()["dropped"] == 2
+    release.set()
+    pool.shutdown()
+
+
+def test_thread_dispatcher_counts_submits():
+    d = dispatcher.create_dispatcher(dispatcher.DispatchMode.THREAD)
+    done = threading.Event()
+    d.submit(done.set)
+    assert done.wait(1)
+    assert d.get_stats()["submitted"] == 1
@@ -0,0 +1,55 @@
+import random
+from bot_api import filters
+
+
+def _index(*event_filters):
+    index = filters.FilterIndex()
+    for flt in event_filters:
+        index.add(flt)
+    return index
+
+
+def test_no_filters_selects_all():
+    assert _index(None, filters.EventFilter()).select({"guild_id": "g1"}) is None
+
+
+def test_keyed_filters_are_intersected_in_registration_order():
+    index = _index(filters.EventFilter(guild_id="g1"),
+                   None,
+                   filters.EventFilter(guild_id=["g1", "g2"], channel_id="c1"),
+                   filters.EventFilter(author_id=10),
+                   filters.EventFilter(guild_id="g2", author_id="10"))
+    assert index.select({"guild_id": "g1", "channel_id": "c1", "author": {"id": "10"}}) == [0, 1, 2, 3]
+    assert index.select({"guild_id": "g2", "channel_id": "c2", "author": {"id": "10"}}) == [1, 3, 4]
+    assert index.select({"guild_id": "g3", "user": {"id": "10"}}) == [1, 3]
+    assert index.select({"guild_id": "g3"}) == [1]
+
+
+def test_content_filters_only_checked_for_candidates():
+    index = _index(filters.EventFilter(prefix=["/echo", "/say"]),
+                   filters.EventFilter(guild_id="g2", regex=r"\d+"),
+                   filters.EventFilter(guild_id="g1"))
+    assert index.select({"guild_id": "g1", "content": "/echo hi"}) == [0, 2]
+    assert index.select({"guild_id": "g1", "content": "hello 123"}) == [2]
+    assert index.select({"guild_id": "g2", "content": "/say 123"}) == [0, 1]
+    assert index.select({"guild_id": "g2"}) == []
+
+
+def test_index_matches_filter_scan():
+    rnd = random.Random(0)
+    values = ["1", "2", "3"]
+
+    def pick():
+        return rnd.choice([None, rnd.choice(values), rnd.sample(values, 2)])
+
+    event_filters = [None if rnd.random() < 0.1 else
+                     filters.EventFilter(guild_id=pick(), channel_id=pick(), author_id=pick(),
+                                         prefix=rnd.choice([None, "/", ["/a", "!"]]),
+                                         regex=rnd.choice([None, r"\d"]))
+                     for _ in range(200)]
+    index = _index(*event_filters)
+    for _ in range(500):
+        data = {"guild_id": rnd.choice(values), "channel_id": rnd.choice(values),
+                "author": {"id": rnd.choice(values)}, "content": rnd.choice(["/a1", "!x", "hi", "/2"])}
+        expected = [i for i, flt in enumerate(event_filters) if flt is None or flt.match(data)]
+        assert index.select(data) == expected
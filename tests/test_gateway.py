@@ -0,0 +1,54 @@
+import asyncio
+import json
+import bot_api
+
+HELLO = json.dumps({"op": 10, "d": {"heartbeat_interval": 10}})
+
+
+def _reconnecting(bot):
+    bot.session_id = "s1"
+    bot._d = 5
+    bot.heartbeat_time = 41.25  # 上一个连接的心跳间隔
+    bot._verify_sent = True
+    bot._on_open()  # 新连接建立, 尚未收到 Hello
+
+
+def test_heartbeat_waits_for_resume_after_reconnect():
+    bot = bot_api.BotApp(1, "t", "s", is_sandbox=True, inters=[], output_log=False)
+    sent = []
+    bot._ws_send = sent.append
+    _reconnecting(bot)
+    assert not bot._verify_sent
+    bot._on_message(None, HELLO)
+    assert [frame["op"] for frame in sent] == [6]
+    assert bot._verify_sent
+
+
+class _FakeWS:
+    closed = False
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_str(self, text):
+        self.sent.append(json.loads(text)["op"])
+
+
+def test_async_heartbeat_starts_after_resume_is_sent():
+    bot = bot_api.AsyncBotApp(1, "t", "s", is_sandbox=True, inters=[], output_log=False)
+
+    async def run():
+        bot._loop = asyncio.get_running_loop()
+        bot._aws = ws = _FakeWS()
+        _reconnecting(bot)
+        bot.send_heart_beat()
+        await asyncio.sleep(0.05)
+        assert ws.sent == []
+        bot._on_message(ws, HELLO)
+        await asyncio.sleep(1.1)
+        bot._stop_heartbeat()
+        return ws.sent
+
+    sent = asyncio.run(run())
+    assert sent[0] == 6
+    assert 1 in sent
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import pytest
+from bot_api import models
+from bot_api.api import BotApi
+from bot_api.async_api import AsyncBotApi
+
+
+class _Response:
+    def __init__(self, body, status_code=200):
+        self.text = json.dumps(body)
+        self.status_code = status_code
+        self.headers = {}
+
+
+def _pages(total, limit, fail_at=None):
+    def request(method, url, **kwargs):
+        after = url.split("after=")[1].split("&")[0] if "after=" in url else ""
+        start = int(after) + 1 if after else 0
+        if fail_at is not None and start >= fail_at:
+            return _Response({"code": 11281, "message": "error"}, status_code=500)
+        return _Response([{"id": str(i), "name": f"g{i}"} for i in range(start, min(start + limit, total))])
+    return request
+
+
+def _api(cls=BotApi):
+    return cls(1, "t", "s", debug=False, sandbox=False, output_log=False)
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_iterates_all_pages(prefetch):
+    api = _api()
+    api._request = _pages(total=7, limit=3)
+    assert [g["id"] for g in api.iter_self_guilds(limit=3, prefetch=prefetch)] == [str(i) for i in range(7)]
+
+
+def test_failed_page_raises_instead_of_truncating():
+    api = _api()
+    api._request = _pages(total=7, limit=3, fail_at=3)
+    seen = []
+    with pytest.raises(models.BotCallingAPIError):
+        for guild in api.iter_self_guilds(limit=3):
+            seen.append(guild["id"])
+    assert seen == ["0", "1", "2"]
+
+
+def test_async_failed_page_raises():
+    api = _api(AsyncBotApi)
+
+    async def request(method, url, **kwargs):
+        return _pages(total=7, limit=3, fail_at=3)(method, url)
+    api._request = request
+
+    async def run():
+        return [g["id"] async for g in api.iter_self_guilds(limit=3)]
+    with pytest.raises(models.BotCallingAPIError):
+        asyncio.run(run())
+
+
+def test_pages_are_cached_in_bounded_cache_and_dropped_on_guild_events():
+    api = _api()
+    calls = []
+    request = _pages(total=2, limit=100)
+    api._request = lambda method, url, **kwargs: calls.append(url) or request(method, url)
+    api.get_self_guilds(use_cache=True, retstr=True)
+    api.get_self_guilds(use_cache=True, retstr=True)
+    assert len(calls) == 1
+    assert api._cache == {}
+    api._update_entity_cache("GUILD_CREATE", {"id": "9"})
+    api.get_self_guilds(use_cache=True, retstr=True)
+    assert len(calls) == 2
@@ -0,0 +1,99 @@
+import os
+import threading
+import pytest
+import requests
+from server import image_cache
+from server import message_convert
+
+
+class _Response:
+    def __init__(self, body: bytes, status=200):
+        self.body = body
+        self.status = status
+        self.headers = {"Content-Type": "image/png"}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status} Error")
+
+    def iter_content(self, size):
+        for i in range(0, len(self.body), size):
+            yield self.body[i:i + size]
+
+
+class _Http:
+    def __init__(self, images: dict):
+        self.images = images
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            self.calls.append(url)
+        if url not in self.images:
+            return _Response(b"", status=404)
+        return _Response(self.images[url])
+
+
+def _cache(tmp_path, images, max_bytes=1024):
+    return image_cache.ImageCache(str(tmp_path), max_bytes=max_bytes, http=_Http(images))
+
+
+def test_same_content_is_stored_and_uploaded_once(tmp_path):
+    cache = _cache(tmp_path, {"http://a/1": b"x" * 100, "http://a/2": b"x" * 100})
+    uploads = []
+
+    def img_to_url(path):
+        uploads.append(path)
+        return "https://img/" + os.path.basename(path)
+
+    assert cache.to_url(img_to_url, img_url="http://a/1") == cache.to_url(img_to_url, img_url="http://a/2")
+    assert len(uploads) == 1
+    assert cache.get_stats()["files"] == 1
+
+
+def test_evicts_least_recently_used_within_budget(tmp_path):
+    cache = _cache(tmp_path, {f"http://a/{i}": bytes([i]) * 400 for i in range(4)})
+    names = [cache.fetch(f"http://a/{i}") for i in range(4)]
+    assert cache.total_bytes <= cache.max_bytes
+    assert not os.path.exists(os.path.join(str(tmp_path), names[0]))
+    assert os.path.exists(os.path.join(str(tmp_path), names[3]))
+
+
+def test_file_in_use_is_not_evicted(tmp_path):
+    cache = _cache(tmp_path, {"http://a/big": b"b" * 800, "http://a/other": b"o" * 800})
+    exists = []
+
+    def img_to_url(path):
+        if not exists:  # 上传期间另一张图片被下载, 超出缓存上限
+            exists.append(True)
+            cache.to_url(img_to_url, img_url="http://a/other")
+        exists.append(os.path.exists(path))
+        return "https://img/" + os.path.basename(path)
+
+    cache.to_url(img_to_url, img_url="http://a/big")
+    assert exists == [True, True, True]
+    assert cache.total_bytes <= cache.max_bytes
+
+
+def test_download_error_drops_image(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_cache, "_image_cache", _cache(tmp_path, {}))
+    logs = []
+    text, reply_id, img_url = message_convert.cq_to_guild_text(
+        "hi[CQ:image,file=http://a/missing]", lambda path: "unused",
+        logger=lambda msg, **kwargs: logs.append(msg))
+    assert (text, img_url) == ("hi", "")
+    assert logs
+
+
+def test_fetch_raises_on_download_error(tmp_path):
+    cache = _cache(tmp_path, {})
+    with pytest.raises(requests.exceptions.HTTPError):
+        cache.fetch("http://a/missing")
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,110 @@
+import copy
+import json
+import pickle
+import threading
+import pytest
+from pydantic import ValidationError
+import bot_api
+from bot_api import structs
+from bot_api import lazy
+from bot_api.lazy import LazyModel
+
+
+def _message_raw(**kwargs):
+    raw = {"id": "m1", "channel_id": "c1", "guild_id": "g1", "timestamp": "t", "content": "hi",
+           "mention_everyone": "true", "author": {"id": "u1", "username": "name", "avatar": "a", "bot": False}}
+    raw.update(kwargs)
+    return raw
+
+
+def test_fields_are_validated_like_the_model():
+    event = LazyModel(structs.Message, _message_raw())
+    assert event.mention_everyone is True
+    assert isinstance(event.author, structs.User)
+    assert event.dict() == structs.Message(**_message_raw()).dict()
+
+
+def test_read_values_are_not_copied_over_the_model():
+    event = LazyModel(structs.Message, _message_raw())
+    assert event.mention_everyone is True
+    assert event.to_model().mention_everyone is True
+    assert event.dict()["mention_everyone"] is True
+
+
+def test_writes_are_applied_to_the_model_without_touching_raw():
+    raw = _message_raw()
+    event = LazyModel(structs.Message, raw)
+    event.content = "changed"
+    assert event.content == "changed"
+    assert event.dict()["content"] == "changed"
+    assert raw["content"] == "hi"
+
+
+def test_missing_required_field_raises():
+    with pytest.raises(ValidationError):
+        LazyModel(structs.MemberWithGuildID, {"guild_id": "g1", "roles": []})
+
+
+def test_isinstance():
+    assert isinstance(LazyModel(structs.Message, _message_raw()), structs.Message)
+
+
+@pytest.mark.parametrize("clone", [copy.copy, copy.deepcopy, lambda e: pickle.loads(pickle.dumps(e))])
+def test_copy_and_pickle(clone):
+    event = LazyModel(structs.Message, _message_raw())
+    event.content = "changed"
+    cloned = clone(event)
+    assert cloned.content == "changed"
+    assert cloned.author.username == "name"
+    assert cloned.to_model() == event.to_model()
+
+
+def _message_bot(lazy_event_model: bool):
+    bot = bot_api.BotApp(1, "t", "s", is_sandbox=True, inters=[], output_log=False, lazy_event_model=lazy_event_model)
+    bot.EVENT_MESSAGE_CREATE_CALL_AT_MESSAGE_CREATE = True
+    received = []
+    bot._handout_to = lambda handlers, *args: received.extend(args * len(handlers))
+    codes = structs.Codes.SeverCode
+    for event_type in (codes.AT_MESSAGE_CREATE, codes.MESSAGE_CREATE, codes.MESSAGE_CREATE):
+        bot.receiver(event_type)(lambda event: None)
+    return bot, received
+
+
+def _message_frame(bot):
+    bot._on_message(None, json.dumps({"op": 0, "s": 1, "t": "MESSAGE_CREATE", "d": _message_raw()}))
+
+
+def test_lazy_event_is_validated_once_per_frame(monkeypatch):
+    validated = []
+    validate = lazy._validate
+    monkeypatch.setattr(lazy, "_validate", lambda model, info, name, value: validated.append(name) or
+                        validate(model, info, name, value))
+    bot, received = _message_bot(lazy_event_model=True)
+    _message_frame(bot)
+    assert len(received) == 3
+    assert len({id(e) for e in received}) == 1
+    for event in received:
+        assert event.author.username == "name"
+        assert event.mention_everyone is True
+    assert sorted(validated) == ["author", "mention_everyone"]
+
+
+def test_eager_event_is_built_once_per_frame():
+    bot, received = _message_bot(lazy_event_model=False)
+    built = []
+    codes = structs.Codes.SeverCode
+    bot.known_events[codes.MESSAGE_CREATE][1] = lambda **raw: built.append(raw) or structs.Message(**raw)
+    _message_frame(bot)
+    assert len(received) == 3
+    assert len(built) == 1
+
+
+def test_concurrent_reads_share_one_value():
+    event = LazyModel(structs.Message, _message_raw())
+    authors = []
+    threads = [threading.Thread(target=lambda: authors.append(event.author)) for _ in range(8)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert len({id(a) for a in authors}) == 1
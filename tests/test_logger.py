@@ -0,0 +1,38 @@
+from bot_api import logger
+
+
+class _Logger(logger.BotLogger):
+    def __init__(self, debug: bool):
+        self.lines = []
+        super().__init__(debug=debug, write_out_log=False)
+
+    def _printout(self, content, *args, **kwargs):
+        self.lines.append(content)
+
+
+def test_positional_levels_keep_their_meaning():
+    log = _Logger(debug=False)
+    log.lines.clear()
+    log.logger("hidden", True)
+    log.logger("warn", False, True)
+    log.logger("err", False, False, True)
+    assert len(log.lines) == 2
+    assert "[WARNING] warn" in log.lines[0]
+    assert "[ERROR] err" in log.lines[1]
+
+
+def test_positional_debug_is_printed_in_debug_mode():
+    log = _Logger(debug=True)
+    log.logger("shown", True)
+    assert "[DEBUG] shown" in log.lines[-1]
+
+
+def test_lazy_messages_are_not_formatted_when_disabled():
+    log = _Logger(debug=False)
+    log.lines.clear()
+    calls = []
+    log.logger(lambda: calls.append(1) or "x", debug=True)
+    log.logger("%s %d", debug=True, args=("a", 1))
+    assert not calls and not log.lines
+    log.logger("%s %d", args=("a", 1), k="v")
+    assert log.lines[-1].endswith("a 1 k=v")
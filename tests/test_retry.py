@@ -0,0 +1,98 @@
+import asyncio
+import time
+import pytest
+import requests
+from bot_api import retry
+from bot_api.api import BotApi
+from bot_api.async_api import AsyncBotApi
+
+URL = "https://api.sgroup.qq.com/users/@me"
+
+
+def _open(breaker: retry.CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+
+
+def test_opens_after_threshold_and_allows_one_probe():
+    breaker = retry.CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    assert breaker.allow()
+    _open(breaker)
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == breaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = retry.CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    _open(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow()
+
+
+def test_released_probe_allows_next_probe():
+    breaker = retry.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    _open(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_stale_probe_expires():
+    breaker = retry.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    _open(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def _half_open(api):
+    api.circuit_breakers = retry.CircuitBreakerGroup(failure_threshold=1, reset_timeout=0.05)
+    breaker = api.circuit_breakers.get("GET /users/@me")
+    _open(breaker)
+    time.sleep(0.06)
+    return breaker
+
+
+def test_unexpected_exception_during_probe_does_not_wedge_breaker():
+    api = BotApi(1, "t", "s", debug=False, sandbox=False, output_log=False)
+    breaker = _half_open(api)
+
+    def broken(*args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError("broken body")
+    api.transport.request = broken
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        api._send_request("GET", URL)
+    assert breaker.state == breaker.OPEN
+    assert not breaker._probing
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_cancelled_async_probe_releases_breaker():
+    api = AsyncBotApi(1, "t", "s", debug=False, sandbox=False, output_log=False)
+    breaker = _half_open(api)
+    api.rate_limiter.reserve = lambda method, url: 10.0
+
+    async def run():
+        task = asyncio.ensure_future(api._send_request("GET", URL))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert breaker.state == breaker.HALF_OPEN
+    assert breaker.allow()
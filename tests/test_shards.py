@@ -0,0 +1,36 @@
+import bot_api
+
+
+def _sharded_bot(count=2):
+    bot = bot_api.BotApp(1, "t", "s", is_sandbox=True, inters=[], output_log=False)
+    bot.shards = [bot._make_shard(i, count) for i in range(count)]
+    return bot
+
+
+def test_first_ready_shard_sets_parent_self_id():
+    bot = _sharded_bot()
+    bot.shards[1]._on_open("111", "me", True, is_login=True)
+    bot.shards[0]._on_open("111", "me", True, is_login=True)
+    assert (bot.self_id, bot.self_name) == ("111", "me")
+    assert bot.shards[0].self_id == "111"
+
+
+def test_heartbeat_latency_is_collected_from_shards():
+    bot = _sharded_bot()
+    for shard in bot.shards:
+        shard.heartbeat_monitor.on_send()
+        shard.heartbeat_monitor.on_ack()
+    bot.shards[1].heartbeat_monitor.on_send()
+    bot.shards[1].heartbeat_monitor.check_zombie()
+
+    latency = bot.get_heartbeat_latency()
+    assert latency["count"] == 2
+    assert latency["missed"] == 1
+    assert latency["last"] is not None
+    assert set(latency["shards"]) == {0, 1}
+    assert latency["shards"][1]["missed"] == 1
+
+
+def test_unsharded_latency_is_unchanged():
+    bot = bot_api.BotApp(1, "t", "s", is_sandbox=True, inters=[], output_log=False)
+    assert bot.get_heartbeat_latency() == {"last": None, "avg": None, "p99": None, "count": 0, "missed": 0}